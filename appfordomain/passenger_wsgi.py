@@ -1,6 +1,9 @@
 import os
 import sys
-# Añade el directorio de la aplicación a la ruta de Python
-sys.path.insert(0, os.path.dirname(__file__))
-# Importa la instancia de la aplicación
-from app import app as application
+# Passenger arranca desde esta carpeta; la aplicación está en la raíz del repositorio.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# lottery.db, archive/ y snapshots/ son rutas relativas a la raíz.
+os.chdir(ROOT)
+# Importa la instancia de la aplicación (app.create_app, perfil APP_PROFILE)
+from wsgi import app as application
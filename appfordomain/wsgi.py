@@ -1,4 +0,0 @@
-from app import app
-
-if __name__ == "__main__":
-    app.run()
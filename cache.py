@@ -0,0 +1,89 @@
+"""TTL caches for data that is read far more often than it changes.
+
+The default backend lives in process memory, so each waitress/gunicorn worker
+keeps its own copy. Setting CACHE_URL to a Redis URL switches to a shared
+backend; MemoryBackend has the same interface and doubles as its local
+stand-in during development.
+"""
+import os
+import pickle
+import threading
+import time
+
+
+class MemoryBackend:
+    """Per-process backend: a dict of key -> (expires_at, value)."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class RedisBackend:
+    """Shared backend; values are pickled so rows with datetimes survive the round-trip."""
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed when CACHE_URL is set
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*keys)
+
+
+def backend_from_env():
+    url = os.environ.get('CACHE_URL')
+    if url:
+        return RedisBackend(url)
+    return MemoryBackend()
+
+
+class Cache:
+    def __init__(self, backend=None, ttl=60, prefix='lotoweb:'):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Returns the cached value for key, calling loader() on a miss."""
+        value = self.backend.get(self.prefix + key)
+        if value is None:
+            value = loader()
+            self.backend.set(self.prefix + key, value, ttl or self.ttl)
+        return value
+
+    def get(self, key):
+        return self.backend.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(self.prefix + key, value, ttl or self.ttl)
+
+    def invalidate(self, *keys):
+        self.backend.delete(*(self.prefix + key for key in keys))
@@ -0,0 +1,76 @@
+"""A change counter in shared memory, so worker processes notice writes at once.
+
+ResourceVersions reads it on every get(). A write that bumps a resource
+increments it after committing, and every worker on the host then reloads
+the resource_versions table on its next request, which drops the caches
+tied to the changed resources (see ResourceVersions.on_change). Without the
+signal, workers only notice other workers' writes every
+VERSION_REFRESH_SECONDS.
+
+The counter is 8 bytes in a file mapped by every process. It lives in
+/dev/shm where that exists, named after the database, so every worker of
+one deployment shares it; CHANGE_SIGNAL_PATH overrides the file and
+CHANGE_SIGNAL=0 turns it off. Workers on other hosts (PostgreSQL
+deployments) are not reached and fall back to the refresh interval.
+Platforms without fcntl (Windows, where waitress runs a single process)
+do without it.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_COUNTER = struct.Struct('<Q')
+
+
+class ChangeSignal:
+    def __init__(self, path):
+        self.path = path
+        # Kept open for the record lock; the mapping is shared across fork().
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < _COUNTER.size:
+            os.ftruncate(self._fd, _COUNTER.size)
+        self._map = mmap.mmap(self._fd, _COUNTER.size)
+        self._lock = threading.Lock()
+        self._seen = self.value()
+
+    def value(self):
+        return _COUNTER.unpack_from(self._map)[0]
+
+    def notify(self):
+        """Tells every process, this one included, that something changed."""
+        # lockf locks are per process, so the thread lock orders this process's writers.
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                _COUNTER.pack_into(self._map, 0, self.value() + 1)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def changed(self):
+        """True once for every change notified since the previous call."""
+        value = self.value()
+        if value == self._seen:
+            return False
+        self._seen = value
+        return True
+
+
+def default_path():
+    database = os.environ.get('DATABASE_URL') or os.path.abspath(os.environ.get('SQLITE_PATH', 'lottery.db'))
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, f'lotoweb-{hashlib.sha1(database.encode()).hexdigest()[:12]}.signal')
+
+
+def from_env():
+    """The deployment's ChangeSignal, or None when it is off or unsupported."""
+    if fcntl is None or os.environ.get('CHANGE_SIGNAL', '1') != '1':
+        return None
+    return ChangeSignal(os.environ.get('CHANGE_SIGNAL_PATH') or default_path())
@@ -0,0 +1,140 @@
+"""In-memory prefix index over clients for the typeahead search API.
+
+Each index keeps a sorted list of (key, client_id) pairs, where the keys are
+the normalized first name, last name, full name and phone digits of every
+client. A prefix lookup is a bisect into that list followed by a short scan,
+so it stays well under a millisecond even for sellers with thousands of
+clients. Clients are added/updated one at a time when they change instead of
+rebuilding the whole index.
+"""
+import bisect
+import threading
+import time
+import unicodedata
+
+
+def normalize(text):
+    """Lowercases and strips accents so 'José' matches 'jose'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower().strip()
+
+
+def _keys_for(client):
+    name = normalize(client['name'])
+    last_name = normalize(client['last_name'])
+    keys = {name, last_name, f'{name} {last_name}'.strip()}
+    keys.update(name.split())
+    keys.update(last_name.split())
+    phone = ''.join(ch for ch in (client['phone'] or '') if ch.isdigit())
+    if phone:
+        keys.add(phone)
+    keys.discard('')
+    return keys
+
+
+class ClientIndex:
+    def __init__(self, clients=()):
+        self._entries = []  # sorted (key, client_id)
+        self._clients = {}  # client_id -> client dict
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+        for client in clients:
+            self._clients[client['id']] = client
+            self._entries.extend((key, client['id']) for key in _keys_for(client))
+        self._entries.sort()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __contains__(self, client_id):
+        return client_id in self._clients
+
+    def get(self, client_id):
+        return self._clients.get(client_id)
+
+    def upsert(self, client):
+        """Adds a client or replaces its previous entries."""
+        with self._lock:
+            self._remove(client['id'])
+            self._clients[client['id']] = client
+            for key in _keys_for(client):
+                bisect.insort(self._entries, (key, client['id']))
+
+    def remove(self, client_id):
+        with self._lock:
+            self._remove(client_id)
+
+    def _remove(self, client_id):
+        old = self._clients.pop(client_id, None)
+        if old is None:
+            return
+        for key in _keys_for(old):
+            pos = bisect.bisect_left(self._entries, (key, client_id))
+            if pos < len(self._entries) and self._entries[pos] == (key, client_id):
+                del self._entries[pos]
+
+    def search(self, query, limit=10):
+        """Returns up to `limit` clients with a key starting with the query."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        # upsert/remove shift the list in place from other request threads.
+        with self._lock:
+            entries = self._entries
+            pos = bisect.bisect_left(entries, (prefix,))
+            while pos < len(entries) and len(results) < limit:
+                key, client_id = entries[pos]
+                if not key.startswith(prefix):
+                    break
+                if client_id not in seen:
+                    seen.add(client_id)
+                    client = self._clients.get(client_id)
+                    if client is not None:
+                        results.append(client)
+                pos += 1
+        return results
+
+
+class ClientIndexes:
+    """Lazily built indexes keyed by seller id (None = every client, for admins).
+
+    Writes in this process update the indexes in place, and clients_changed()
+    applies the writes of other worker processes. An index older than max_age
+    seconds is rebuilt on its next use all the same.
+    """
+
+    def __init__(self, loader, max_age=300):
+        self._loader = loader  # seller_id -> iterable of client dicts
+        self._max_age = max_age
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, seller_id=None):
+        index = self._indexes.get(seller_id)
+        if index is None or time.monotonic() - index.built_at > self._max_age:
+            index = ClientIndex(self._loader(seller_id))
+            with self._lock:
+                self._indexes[seller_id] = index
+        return index
+
+    def client_changed(self, client, old_seller_id=None):
+        """Applies a created/edited client to every index that is already built."""
+        if old_seller_id is not None and old_seller_id != client['seller_id']:
+            index = self._indexes.get(old_seller_id)
+            if index is not None:
+                index.remove(client['id'])
+        for key in (client['seller_id'], None):
+            index = self._indexes.get(key)
+            if index is not None:
+                index.upsert(client)
+
+    def clients_changed(self, clients):
+        """Applies clients saved by any process, which may have moved to another seller."""
+        for client in clients:
+            for seller_id, index in list(self._indexes.items()):
+                if seller_id is None or seller_id == client['seller_id']:
+                    index.upsert(client)
+                elif client['id'] in index:
+                    index.remove(client['id'])
@@ -0,0 +1,131 @@
+"""gzip/brotli compression of the app's responses.
+
+On by default; COMPRESSION=0 turns it off (e.g. behind a proxy that already
+compresses). A response is compressed when:
+
+* the client accepts br or gzip (br needs the optional brotli package);
+* it is text: HTML, JSON, CSS, JavaScript, SVG...;
+* it is not encoded yet and is not a file sent with send_file (the static
+  build ships its files precompressed, see static_assets.py);
+* it has at least COMPRESS_MIN_SIZE bytes. Below that, the encoding
+  overhead and the CPU time outweigh the bytes saved.
+
+Streamed responses have no size up front and are always compressed. The
+compressor is flushed after every chunk, so the client still gets the first
+bytes as soon as the view yields them.
+
+Every content-coding is a representation of its own, so a compressed
+response's strong ETag gets the coding's suffix ("tag-gz", "tag-br"). The
+versioned endpoints (data_access.versioned, mobile_asgi.py) accept any of
+those forms in If-None-Match and answer 304 with the one the client sent.
+"""
+import importlib.util
+import os
+import zlib
+
+from flask import request
+
+enabled = os.environ.get('COMPRESSION', '1') == '1'
+
+MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+# Brotli's top qualities are for build-time compression; 4 is fast enough per request.
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/manifest+json',
+                      'application/xml', 'image/svg+xml')
+
+ENCODINGS = ('br', 'gzip') if importlib.util.find_spec('brotli') is not None else ('gzip',)
+# Appended to the strong ETag of a body in that content-coding.
+ETAG_SUFFIXES = {'br': '-br', 'gzip': '-gz'}
+
+
+class Compressor:
+    """One response's compression stream; compress() and flush() return the bytes ready so far."""
+
+    def __init__(self, encoding):
+        if encoding == 'br':
+            import brotli  # optional dependency
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits 31: zlib stream with a gzip header and trailer.
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def flush(self):
+        return self._brotli.flush() if self._brotli else self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+
+def compress(data, encoding):
+    compressor = Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def _stream(chunks, source, encoding):
+    compressor = Compressor(encoding)
+    try:
+        for chunk in chunks:
+            if chunk:
+                out = compressor.compress(chunk) + compressor.flush()
+                if out:
+                    yield out
+        yield compressor.finish()
+    finally:
+        # The server closes the response's new iterable; pass that on to the view's.
+        if hasattr(source, 'close'):
+            source.close()
+
+
+def etag_variants(etag):
+    """The ETag of each encoding of a body tagged etag, the identity one first."""
+    return [etag] + [etag + suffix for suffix in ETAG_SUFFIXES.values()]
+
+
+def matching_etag(etag):
+    """The form of etag named by the request's If-None-Match, or None."""
+    if request.if_none_match.star_tag:
+        return etag
+    return next((tag for tag in etag_variants(etag) if tag in request.if_none_match), None)
+
+
+def _compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def compress_response(response):
+    if (response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or not _compressible(response) or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        source = response.response
+        response.response = _stream(response.iter_encoded(), source, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag + ETAG_SUFFIXES[encoding])
+    return response
+
+
+def init_app(app):
+    if enabled:
+        app.after_request(compress_response)
@@ -0,0 +1,390 @@
+"""Data access shared by the blueprints in views/.
+
+Holds the process-wide caches (raffle list, resource versions, client search
+indexes) and the reads and writes more than one blueprint needs. The views
+keep their page-specific queries; anything two of them share lives here, so
+every process type reads and invalidates the same way whichever blueprints
+it serves. Nothing here needs a request except versioned().
+"""
+import datetime
+import logging
+import os
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+import cache
+import change_signal
+import compression
+import prizes
+import queries
+import raffle_snapshots
+import raffle_stats
+import sync
+from client_index import ClientIndexes
+from database import after_commit, archived_raffle_ids, get_cursor, get_db_connection, write
+from versions import ResourceVersions
+
+logger = logging.getLogger('lotoweb')
+
+# Open raffle list for the sale forms. Per-process by default; set CACHE_URL
+# (e.g. redis://localhost:6379/0) to share entries and invalidations between workers.
+data_cache = cache.Cache(cache.backend_from_env(), ttl=int(os.environ.get('CACHE_TTL', 60)))
+
+# Change counters for the ETags of the read-only JSON endpoints. They also
+# tell every worker which of its caches another worker's write made stale.
+resource_versions = ResourceVersions(refresh_interval=float(os.environ.get('VERSION_REFRESH_SECONDS', 5)),
+                                     signal=change_signal.from_env())
+
+
+# --- ETags ---
+def versioned(etag_for):
+    """Adds a strong ETag to a JSON endpoint and answers If-None-Match with 304.
+
+    etag_for(*args, **kwargs) builds the tag from resource_versions only, so a
+    matching request is answered before the view runs any query. It may
+    return None to skip caching (e.g. for a bad request).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = etag_for(*args, **kwargs)
+            if etag is None:
+                return f(*args, **kwargs)
+            # The client may hold the tag of a compressed body (compression.py).
+            matched = compression.matching_etag(etag)
+            if matched is not None:
+                response = current_app.response_class(status=304)
+                response.set_etag(matched)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+            # Clients may keep the body but must revalidate it on every use.
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+
+def sorteos_etag():
+    return f"raffles-{resource_versions.get('raffles')}"
+
+
+def winner_payments_etag(seller_id):
+    sorteo_id = request.args.get('sorteo_id', type=int)
+    if sorteo_id is None:
+        return None
+    return winner_payments_tag(sorteo_id, seller_id)
+
+
+def winner_payments_tag(sorteo_id, seller_id):
+    """ETag of a raffle's winner payments for a seller; shared with mobile_asgi.py."""
+    return (f"winners-{sorteo_id}-{resource_versions.get(f'winners:{sorteo_id}')}"
+            f"-c{resource_versions.get('clients')}-s{seller_id}")
+
+
+# --- Cached form data ---
+def _load_search_clients(seller_id):
+    # Loaded versions first, so _clients_changed sees every change this index misses.
+    resource_versions.get('clients')
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    if seller_id is None:
+        rows = queries.fetch_all(cur, 'client.search_rows_all')
+    else:
+        rows = queries.fetch_all(cur, 'client.search_rows_for_seller', (seller_id,))
+    cur.close()
+    conn.close()
+    return [row._asdict() for row in rows]
+
+
+# Per-seller prefix indexes behind /api/clients/search (None holds every client, for admins).
+client_indexes = ClientIndexes(_load_search_clients, max_age=int(os.environ.get('CLIENT_INDEX_MAX_AGE', 300)))
+
+
+def client_index(seller_id):
+    """A seller's search index, with the clients other workers saved applied."""
+    resource_versions.get('clients')
+    return client_indexes.get(seller_id)
+
+
+def _clients_changed(previous, current):
+    # Clients saved since the previous reload, found by their sync sequence.
+    if 'sync' not in previous:
+        return
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    rows = queries.fetch_all(cur, 'client.search_rows_changed', (previous['sync'], current.get('sync', 0)))
+    cur.close()
+    conn.close()
+    client_indexes.clients_changed([row._asdict() for row in rows])
+
+
+resource_versions.on_change('clients', _clients_changed)
+
+
+def client_saved(cur, client_id, old_seller_id=None):
+    """Pushes a created/edited client into the in-process search indexes once committed."""
+    client = queries.fetch_one(cur, 'client.search_row_by_id', (client_id,))
+    if client is not None:
+        after_commit(lambda: client_indexes.client_changed(client._asdict(), old_seller_id))
+
+
+def open_raffles(now=None):
+    """Raffles still open for sales, cached until a raffle is created or its results are entered."""
+    def load():
+        conn = get_db_connection()
+        cur = get_cursor(conn)
+        rows = queries.fetch_all(cur, 'raffle.pending')
+        cur.close()
+        conn.close()
+        return [row._asdict() for row in rows]
+    # Checks for other workers' changes first (see change_signal.py).
+    resource_versions.get('raffles')
+    # The cache holds every raffle without results; closing by date is applied on read.
+    now = now or datetime.datetime.now()
+    return [raffle for raffle in data_cache.get_or_load('raffles:pending', load) if raffle['raffle_date'] > now]
+
+
+resource_versions.on_change('raffles', lambda previous, current: data_cache.invalidate('raffles:pending'))
+
+
+# --- Invoices ---
+def rows_from_archives(raffle_ids, sql, params=()):
+    """Runs a read query against the archive of each given raffle."""
+    rows = []
+    for raffle_id in raffle_ids:
+        conn = get_db_connection(raffle_id)
+        cur = get_cursor(conn)
+        rows.extend(queries.execute_sql(cur, sql, params).fetchall())
+        cur.close()
+        conn.close()
+    return rows
+
+
+def invoice_with_items(invoice_id, seller_id=None):
+    """(invoice, items), or (None, None) if missing or, with seller_id, not that seller's.
+
+    Invoices of closed raffles come from the raffle snapshot when there is one.
+    """
+    found = raffle_snapshots.store.find_invoice(invoice_id, snapshot_names)
+    if found is not None:
+        invoice, items = found
+        if seller_id is not None and invoice.seller_id != seller_id:
+            return None, None
+        return invoice, items
+
+    # Archived raffles normally have a snapshot; without one, their archives are searched.
+    for raffle_id in [None] + archived_raffle_ids():
+        conn = get_db_connection(raffle_id)
+        cur = get_cursor(conn)
+        if seller_id is not None:
+            invoice = queries.fetch_one(cur, 'invoice.detail_for_seller', (invoice_id, seller_id))
+        else:
+            invoice = queries.fetch_one(cur, 'invoice.detail', (invoice_id,))
+        items = queries.fetch_all(cur, 'invoice_item.by_invoice', (invoice_id,)) if invoice is not None else None
+        cur.close()
+        conn.close()
+        if invoice is not None:
+            break
+    return invoice, items
+
+
+# --- Winners ---
+# Ids per DELETE ... IN (...), well under SQLite's bound-parameter limit.
+_ID_CHUNK = 500
+
+
+def _winner_rows(raffle_id, items, table):
+    rows = []
+    for item in items:
+        for p_type, amount in table.get(item.number, ()):
+            rows.append((raffle_id, item.invoice_id, item.client_id, item.seller_id, item.number,
+                         p_type, amount, item.quantity, item.quantity * amount))
+    return rows
+
+
+def calculate_winners_for_raffle(raffle_id, p1, p2, p3, incremental=True):
+    """Stores the winners of a raffle for the given results.
+
+    When the raffle already had results (a correction), only the numbers whose
+    payouts differ between the old and new prize tables are deleted and
+    re-inserted; everything runs in one write transaction. Returns the
+    number of winner rows written.
+    """
+    count = write(lambda cur: _store_winners(cur, raffle_id, p1, p2, p3, incremental), raffle_id)
+    conn = get_db_connection(raffle_id)
+    cur = get_cursor(conn)
+    try:
+        raffle_snapshots.write_snapshot(cur, raffle_id)
+    except Exception:
+        # Views fall back to SQL when there is no snapshot.
+        logger.exception('Could not write the snapshot of raffle %s', raffle_id)
+    cur.close()
+    conn.close()
+    return count
+
+
+def _store_winners(cur, raffle_id, p1, p2, p3, incremental):
+    raffle = queries.fetch_one(cur, 'raffle.by_id', (raffle_id,))
+    new_table = prizes.compile_prize_table(p1, p2, p3)
+
+    # Only items matching some prize-rule key are read, through the
+    # prefix/suffix indexes; the prize table decides which of them win.
+    params = []
+    for keys in prizes.lookup_keys(p1, p2, p3):
+        params.extend((raffle_id, *keys))
+    items = queries.fetch_all(cur, 'invoice_item.prize_candidates', params)
+    if incremental and raffle is not None and raffle.results_entered and raffle.first_prize:
+        old_table = prizes.compile_prize_table(raffle.first_prize, raffle.second_prize, raffle.third_prize)
+        changed = prizes.changed_numbers(old_table, new_table)
+        stale_ids = [w.id for w in queries.fetch_all(cur, 'winner.numbers_by_raffle', (raffle_id,))
+                     if w.winning_number in changed]
+        for start in range(0, len(stale_ids), _ID_CHUNK):
+            chunk = stale_ids[start:start + _ID_CHUNK]
+            # raffle_id lets PostgreSQL prune to the raffle's partition.
+            queries.execute_sql(cur, f"DELETE FROM winners WHERE raffle_id = %s AND id IN ({', '.join(['%s'] * len(chunk))})",
+                                [raffle_id, *chunk])
+        rows = _winner_rows(raffle_id, [item for item in items if item.number in changed], new_table)
+    else:
+        queries.execute(cur, 'winner.delete_by_raffle', (raffle_id,))
+        rows = _winner_rows(raffle_id, items, new_table)
+
+    for row in rows:
+        queries.execute(cur, 'winner.insert', row)
+    raffle_stats.refresh_payouts(cur, raffle_id)
+
+    queries.execute(cur, 'raffle.set_results', (p1, p2, p3, sync.next_seq(cur), raffle_id))
+    resource_versions.bump(cur, 'raffles', f'winners:{raffle_id}')
+    return len(rows)
+
+
+def winner_payments(sorteo_id, seller_id=None):
+    """Winner payouts for a raffle grouped by client, optionally limited to one seller."""
+    snapshot = raffle_snapshots.store.get(int(sorteo_id)) if str(sorteo_id).isdigit() else None
+    if snapshot is not None:
+        return snapshot.winner_payments(seller_id, snapshot_names(snapshot.raffle_id))
+
+    conn = get_db_connection(sorteo_id)
+    cur = get_cursor(conn)
+    if seller_id is None:
+        rows = queries.fetch_all(cur, 'winner.payments_by_client', (sorteo_id,))
+    else:
+        rows = queries.fetch_all(cur, 'winner.payments_by_client_for_seller', (sorteo_id, seller_id))
+
+    results = []
+    for row in rows:
+        client_name = ((row.name or '') + ' ' + (row.last_name or '')).strip() or 'Cliente'
+
+        # Fetch distinct invoice ids for that client and raffle
+        if seller_id is None:
+            invoice_rows = queries.fetch_all(cur, 'winner.invoices_for_client', (sorteo_id, row.client_id))
+        else:
+            invoice_rows = queries.fetch_all(cur, 'winner.invoices_for_client_for_seller', (sorteo_id, row.client_id, seller_id))
+        facturas = [{'id': inv.invoice_id} for inv in invoice_rows]
+
+        results.append({'cliente': client_name, 'pago': row.total_payout, 'facturas': facturas})
+    cur.close()
+    conn.close()
+    return results
+
+
+def _load_snapshot_names(raffle_id):
+    conn = get_db_connection(raffle_id)
+    cur = get_cursor(conn)
+    clients = {row.id: [row.name, row.last_name] for row in queries.fetch_all(cur, 'client.names_by_raffle', (raffle_id,))}
+    sellers = {row.id: row.name for row in queries.fetch_all(cur, 'seller.options')}
+    cur.close()
+    conn.close()
+    return raffle_snapshots.Names(clients, sellers)
+
+
+def snapshot_names(raffle_id):
+    """Current client and seller names for the readers of a raffle snapshot.
+
+    The snapshot's own names date from when the results were entered;
+    these follow later edits through the 'clients' and 'sellers' versions.
+    """
+    key = f"snapshot-names:{raffle_id}-c{resource_versions.get('clients')}-s{resource_versions.get('sellers')}"
+    return data_cache.get_or_load(key, lambda: _load_snapshot_names(raffle_id))
+
+
+def snapshot_archived_raffles():
+    """Rewrites missing snapshots of archived raffles (at prewarm; archiving writes them too)."""
+    if not raffle_snapshots.enabled():
+        return
+    for raffle_id in archived_raffle_ids():
+        if raffle_snapshots.store.get(raffle_id) is not None:
+            continue
+        conn = get_db_connection(raffle_id)
+        cur = get_cursor(conn)
+        raffle_snapshots.write_snapshot(cur, raffle_id)
+        cur.close()
+        conn.close()
+
+
+def closed_raffle_totals():
+    """[(raffle_id, raffle_date, {seller_id: (sales, winnings)})] the reports do not sum with SQL.
+
+    That is every closed raffle with a snapshot, and every archived raffle:
+    the main database no longer has its invoices, so without a snapshot
+    (RAFFLE_SNAPSHOT_DIR='' or a missing file) it is summed from its archive.
+    """
+    totals = {}
+    for raffle_id in raffle_snapshots.store.raffle_ids():
+        snapshot = raffle_snapshots.store.get(raffle_id)
+        if snapshot is not None:
+            totals[raffle_id] = (raffle_id, snapshot.raffle_date, snapshot.seller_totals)
+    for raffle_id in archived_raffle_ids():
+        if raffle_id not in totals:
+            # Archived raffles only change when their results are corrected.
+            version = resource_versions.get(f'winners:{raffle_id}')
+            raffle_date, seller_totals = data_cache.get_or_load(
+                f'archive-totals:{raffle_id}-{version}', lambda: _archive_totals(raffle_id))
+            totals[raffle_id] = (raffle_id, raffle_date, seller_totals)
+    return [totals[raffle_id] for raffle_id in sorted(totals)]
+
+
+def _archive_totals(raffle_id):
+    conn = get_db_connection(raffle_id)
+    cur = get_cursor(conn)
+    raffle = queries.fetch_one(cur, 'raffle.by_id', (raffle_id,))
+    seller_totals = {}
+    for row in queries.fetch_all(cur, 'report.raffle_seller_sales', (raffle_id,)):
+        seller_totals[row.seller_id] = (float(row.total or 0), 0.0)
+    for row in queries.fetch_all(cur, 'report.raffle_seller_winnings', (raffle_id,)):
+        seller_totals[row.seller_id] = (seller_totals.get(row.seller_id, (0.0, 0.0))[0], float(row.total or 0))
+    cur.close()
+    conn.close()
+    return raffle.raffle_date if raffle is not None else None, seller_totals
+
+
+# --- Prewarming (see app.create_app) ---
+def prewarm_client_indexes():
+    """Builds the admin index and every seller's, as the first searches would."""
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    seller_ids = [row.id for row in queries.fetch_all(cur, 'seller.options')]
+    cur.close()
+    conn.close()
+    for seller_id in [None] + seller_ids:
+        client_indexes.get(seller_id)
+
+
+def prewarm_prize_tables():
+    """Compiles the prize tables of the latest closed raffles (result corrections reuse them)."""
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    closed = queries.fetch_all(cur, 'raffle.with_results')
+    cur.close()
+    conn.close()
+    for raffle in closed[:prizes.compile_prize_table.cache_info().maxsize]:
+        if raffle.first_prize:
+            prizes.compile_prize_table(raffle.first_prize, raffle.second_prize, raffle.third_prize)
+
+
+def prewarm_snapshots():
+    """Opens the snapshots of closed raffles and indexes their invoice ranges."""
+    raffle_snapshots.store.find_invoice(0)
@@ -1,17 +1,264 @@
 import sqlite3
 import os
-import psycopg2
+import re
+import threading
+import collections
+import functools
 from werkzeug.security import generate_password_hash
 
-def get_db_connection():
-    """Creates a database connection."""
+import instrumentation
+from sqlite_writer import GroupCommitWriter
+
+# SQLite file used when DATABASE_URL is not set. Benchmarks point this at a
+# generated database so the tracked lottery.db is left alone.
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'lottery.db')
+
+# SQLite deployments move closed raffles out of the main file into one archive
+# database per raffle (scripts/archive_raffles.py). Each archive holds that
+# raffle's rows of these tables, with the same schema as the main file.
+ARCHIVE_DIR = os.environ.get('SQLITE_ARCHIVE_DIR', 'archive')
+ARCHIVED_TABLES = ('invoices', 'invoice_items', 'winners')
+_ARCHIVE_NAME = re.compile(r'^raffle_(\d+)\.db$')
+
+# On PostgreSQL these tables are partitioned by raffle_id instead.
+PARTITIONED_TABLES = ('invoice_items', 'winners')
+
+# Production profile for SQLite (SQLITE_TUNING=1): WAL journal, so readers
+# never block the writer and commits append to the log instead of rewriting
+# pages; synchronous=NORMAL, so only checkpoints fsync (a power loss can drop
+# the last commits but never corrupts the file); a larger page cache; and
+# memory-mapped reads. The busy timeout applies in every mode.
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING') == '1'
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_CACHE_MB = int(os.environ.get('SQLITE_CACHE_MB', '64'))
+SQLITE_MMAP_MB = int(os.environ.get('SQLITE_MMAP_MB', '256'))
+
+# With the tuning profile all writes go through one writer thread that
+# commits concurrent writes together (see sqlite_writer.py). SQLITE_WRITER=0
+# keeps a connection per write.
+SQLITE_WRITER = SQLITE_TUNING and os.environ.get('SQLITE_WRITER', '1') == '1'
+SQLITE_WRITER_WINDOW_MS = float(os.environ.get('SQLITE_WRITER_WINDOW_MS', '2'))
+SQLITE_WRITER_MAX_BATCH = int(os.environ.get('SQLITE_WRITER_MAX_BATCH', '100'))
+# Whether the writer merges combinable jobs (new sales) into multi-row statements.
+SQLITE_WRITER_COMBINE = os.environ.get('SQLITE_WRITER_COMBINE', '1') == '1'
+
+
+def get_db_connection(raffle_id=None):
+    """Creates a database connection.
+
+    Handlers that work on a single raffle pass its id: if that raffle was
+    archived, the connection is opened on the archive file with the main
+    database attached, so invoices/invoice_items/winners resolve to the
+    archive, every other table to the main database, and the same SQL works
+    unchanged.
+    """
+    if instrumentation.enabled:
+        with instrumentation.timed('conn'):
+            return _connect(raffle_id)
+    return _connect(raffle_id)
+
+
+def _connect(raffle_id=None):
     if 'DATABASE_URL' in os.environ:
+        # psycopg2 is only imported by PostgreSQL deployments; SQLite ones never load it.
+        import psycopg2
         conn = psycopg2.connect(os.environ['DATABASE_URL'])
     else:
-        conn = sqlite3.connect('lottery.db')
+        archived = is_archived(raffle_id)
+        # PARSE_DECLTYPES turns TIMESTAMP columns into datetime objects, the same
+        # type psycopg2 returns, so handlers and templates see one row shape.
+        conn = sqlite3.connect(archive_path(raffle_id) if archived else SQLITE_PATH,
+                               detect_types=sqlite3.PARSE_DECLTYPES,
+                               timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
         conn.row_factory = sqlite3.Row
+        if archived:
+            # Unqualified names are looked up in main (the archive) first, then
+            # in attached databases.
+            conn.execute('ATTACH DATABASE ? AS live', (SQLITE_PATH,))
+        if SQLITE_TUNING:
+            _tune(conn)
     return conn
 
+
+_wal_files = set()
+
+
+def _tune(conn):
+    """Applies the SQLite production profile to a new connection.
+
+    journal_mode is stored in the database file, so it is set once per file
+    and process; the other pragmas only last for the connection.
+    """
+    for _, schema, path in conn.execute('PRAGMA database_list').fetchall():
+        if path and path not in _wal_files:
+            conn.execute(f'PRAGMA {schema}.journal_mode = WAL')
+            _wal_files.add(path)
+        conn.execute(f'PRAGMA {schema}.synchronous = NORMAL')
+        conn.execute(f'PRAGMA {schema}.cache_size = {-SQLITE_CACHE_MB * 1024}')
+        conn.execute(f'PRAGMA {schema}.mmap_size = {SQLITE_MMAP_MB * 1024 * 1024}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+
+# --- Writes ---
+_write_state = threading.local()
+
+
+def _writer_connect():
+    conn = _connect()
+    # The writer issues BEGIN IMMEDIATE itself; autocommit mode stops sqlite3
+    # from opening transactions behind its back.
+    conn.isolation_level = None
+    return conn, get_cursor(conn)
+
+
+writer = GroupCommitWriter(_writer_connect, window=SQLITE_WRITER_WINDOW_MS / 1000,
+                           max_batch=SQLITE_WRITER_MAX_BATCH, combine=SQLITE_WRITER_COMBINE)
+
+
+def _run_job(job, cur):
+    _write_state.after_commit = []
+    try:
+        return job(cur), _write_state.after_commit
+    finally:
+        _write_state.after_commit = None
+
+
+def write(job, raffle_id=None):
+    """Runs job(cur) in a write transaction, commits and returns its result.
+
+    The job must not commit. An exception raised by the job rolls back its
+    changes and is re-raised here. With SQLITE_WRITER the job runs on the
+    writer thread, batched with other writes; archived raffles (a separate
+    file) and PostgreSQL use a connection of their own.
+    """
+    if SQLITE_WRITER and 'DATABASE_URL' not in os.environ and not is_archived(raffle_id):
+        if getattr(job, 'combine', None) is not None:
+            # Combinable jobs are submitted as they are so the writer can
+            # group them; they do not register after-commit callbacks.
+            return writer.submit(job)
+        result, callbacks = writer.submit(lambda cur: _run_job(job, cur))
+    else:
+        conn = get_db_connection(raffle_id)
+        cur = get_cursor(conn)
+        try:
+            result, callbacks = _run_job(job, cur)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+    for callback in callbacks:
+        callback()
+    return result
+
+
+def in_write():
+    return getattr(_write_state, 'after_commit', None) is not None
+
+
+def after_commit(callback):
+    """Runs callback once the current write has committed (now, outside a write)."""
+    if in_write():
+        _write_state.after_commit.append(callback)
+    else:
+        callback()
+
+
+def archive_path(raffle_id):
+    return os.path.join(ARCHIVE_DIR, f'raffle_{int(raffle_id)}.db')
+
+
+def is_archived(raffle_id):
+    """True when a raffle's rows live in an archive file (SQLite only)."""
+    if raffle_id is None or 'DATABASE_URL' in os.environ:
+        return False
+    try:
+        return os.path.exists(archive_path(raffle_id))
+    except (TypeError, ValueError):
+        return False
+
+
+def archived_raffle_ids():
+    """Ids of the archived raffles, sorted."""
+    if 'DATABASE_URL' in os.environ or not os.path.isdir(ARCHIVE_DIR):
+        return []
+    matches = (_ARCHIVE_NAME.match(name) for name in os.listdir(ARCHIVE_DIR))
+    return sorted(int(m.group(1)) for m in matches if m)
+
+
+def lock_writers(cur, table):
+    """Makes writers of table wait until the current write commits; call first in a write job.
+
+    Reads that follow see a state no other write can change before the
+    commit. SQLite locks the whole database: the group-commit writer already
+    runs its jobs inside BEGIN IMMEDIATE, and a connection of its own starts
+    one here (sqlite3 would otherwise only begin at the first change).
+    PostgreSQL locks the table against every other writer.
+    """
+    if dialect_of(cur) == 'postgres':
+        cur.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+    elif not cur.connection.in_transaction:
+        cur.execute('BEGIN IMMEDIATE')
+
+
+def create_raffle_partitions(cur, raffle_id):
+    """Creates the partitions of a new raffle on PostgreSQL; no-op on SQLite.
+
+    Deployments whose tables were not converted yet (see
+    scripts/migrate_schema.py) are left alone.
+    """
+    if dialect_of(cur) != 'postgres':
+        return
+    raffle_id = int(raffle_id)
+    for table in PARTITIONED_TABLES:
+        cur.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', (table,))
+        if cur.fetchone() is None:
+            continue
+        cur.execute(f'CREATE TABLE IF NOT EXISTS {table}_r{raffle_id} PARTITION OF {table} FOR VALUES IN ({raffle_id})')
+
+
+def is_unique_violation(exc):
+    """True for a unique constraint error from sqlite3, psycopg2 or asyncpg."""
+    if isinstance(exc, sqlite3.IntegrityError):
+        return str(exc).startswith('UNIQUE constraint failed')
+    # SQLSTATE 23505, read without importing either PostgreSQL driver.
+    return getattr(exc, 'pgcode', None) == '23505' or getattr(exc, 'sqlstate', None) == '23505'
+
+
+def dialect_of(cur):
+    """Returns 'sqlite' or 'postgres' for a cursor (or anything exposing .connection)."""
+    if isinstance(cur.connection, sqlite3.Connection):
+        return 'sqlite'
+    return 'postgres'
+
+
+@functools.lru_cache(maxsize=256)
+def _row_class(description):
+    return collections.namedtuple('Row', [col[0] for col in description], rename=True)
+
+
+def namedtuple_row(cursor, row):
+    """sqlite3 row factory producing the same namedtuple rows as psycopg2's NamedTupleCursor."""
+    return _row_class(cursor.description)._make(row)
+
+
+def get_cursor(conn):
+    """Returns a cursor whose rows are namedtuples on both SQLite and PostgreSQL.
+
+    Rows support attribute access (row.id), positional access (row[0]) and,
+    inside Jinja templates, item access (row['id']).
+    """
+    if isinstance(conn, sqlite3.Connection):
+        cur = conn.cursor()
+        cur.row_factory = namedtuple_row
+    else:
+        import psycopg2.extras
+        cur = conn.cursor(cursor_factory=psycopg2.extras.NamedTupleCursor)
+    # Timed proxy when INSTRUMENTATION=1, the raw cursor otherwise.
+    return instrumentation.wrap_cursor(cur)
+
 def init_db():
     """Initializes the database from the schema file and adds default users."""
     conn = get_db_connection()
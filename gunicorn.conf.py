@@ -0,0 +1,50 @@
+"""Multi-process deployment profile. Run from the repository root:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+A single process serves one core at a time (the GIL), and the app spends
+much of its time in Python: PDFs, winner calculation, page rendering.
+Whether more processes pay off depends on the host; scripts/load_workers.py
+measures it. run.py (waitress) stays the single-process option, and the
+only one on Windows. This profile runs:
+
+* workers: one process per core (WEB_CONCURRENCY overrides), except with
+  the SQLite group-commit writer (SQLITE_TUNING=1, SQLITE_WRITER not 0):
+  the writer is a thread of its process, so every worker would run its
+  own and they would compete for the database lock instead of committing
+  together (see sqlite_writer.py). That setup defaults to one worker and
+  refuses more; SQLite deployments that want several workers set
+  SQLITE_WRITER=0 and write with a connection each, under the busy
+  timeout. PostgreSQL has no such limit.
+* threads: GUNICORN_THREADS per worker (gthread, default 4), enough to
+  overlap database waits without a worker's threads queueing on its GIL.
+  scripts/load_workers.py measures other counts.
+* preload_app: the app is imported and prewarmed (PREWARM=1, see
+  app.create_app) once, in the master, and the workers fork with modules,
+  templates and caches already loaded, sharing those pages copy-on-write.
+
+Workers tell each other about writes through resource_versions and the
+change signal (change_signal.py): a raffle created, a client saved or a
+token revoked in one worker is seen by every worker on its next request.
+CACHE_URL (Redis) also shares the cached entries themselves. APP_PROFILE
+works as with any other server, e.g. one pool per process type.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+# Same condition as database.SQLITE_WRITER, which is not imported here.
+_sqlite_writer = ('DATABASE_URL' not in os.environ and os.environ.get('SQLITE_TUNING') == '1'
+                  and os.environ.get('SQLITE_WRITER', '1') == '1')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1 if _sqlite_writer else multiprocessing.cpu_count()))
+if _sqlite_writer and workers > 1:
+    raise SystemExit(f'WEB_CONCURRENCY={workers} with the SQLite group-commit writer would start one writer per '
+                     'worker; use one worker, set SQLITE_WRITER=0 or run on PostgreSQL.')
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+timeout = 60
+keepalive = 5
+
+# Prewarm in the master, before forking, unless PREWARM says otherwise.
+os.environ.setdefault('PREWARM', '1')
@@ -0,0 +1,245 @@
+"""Request timing and query instrumentation.
+
+Enabled with INSTRUMENTATION=1 (or QUERY_LOG=1, see query_log.py). When enabled:
+
+* cursors from database.get_cursor are wrapped so every statement records its
+  fingerprint (SQL with literals and placeholders normalized), duration and
+  row count;
+* connection opens, template rendering and timed() blocks (e.g. PDF builds)
+  are added to the request's phases;
+* each response carries a Server-Timing header, and per-route durations feed
+  rolling windows exposed in Prometheus text format by /metrics.
+
+When disabled, get_cursor returns the raw cursor and no request hooks are
+registered, so the only cost is a module-level flag check.
+"""
+import collections
+import contextlib
+import functools
+import os
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+
+enabled = os.environ.get('INSTRUMENTATION', '0') == '1' or os.environ.get('QUERY_LOG', '0') == '1'
+
+WINDOW_SIZE = int(os.environ.get('INSTRUMENTATION_WINDOW', 1000))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+# route -> deque of recent request durations (seconds)
+_route_durations = collections.defaultdict(lambda: collections.deque(maxlen=WINDOW_SIZE))
+_route_counts = collections.Counter()
+# fingerprint -> [calls, total seconds, rows]
+_query_stats = collections.defaultdict(lambda: [0, 0.0, 0])
+
+# Extra per-query hooks: callables taking (fingerprint, sql, params, seconds, rows, cursor).
+query_listeners = []
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Normalizes a statement so the same query with different values groups together."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def add_timing(phase, seconds):
+    """Adds time spent in a phase (db, conn, render, pdf, ...) to the current request."""
+    if has_request_context():
+        timings = g.setdefault('_timings', {})
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+@contextlib.contextmanager
+def _timed(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(phase, time.perf_counter() - start)
+
+
+def timed(phase):
+    """Context manager timing a block as `phase`; a no-op when instrumentation is off."""
+    if not enabled:
+        return contextlib.nullcontext()
+    return _timed(phase)
+
+
+def _record_query(cursor, sql, params, seconds, rows):
+    fp = fingerprint(sql)
+    with _lock:
+        stats = _query_stats[fp]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += rows
+    if has_request_context():
+        add_timing('db', seconds)
+        g.setdefault('_queries', []).append((fp, seconds, rows))
+    for listener in query_listeners:
+        listener(fp, sql, params, seconds, rows, cursor)
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times execute() and counts fetched rows."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._pending = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _flush(self, rows):
+        if self._pending is not None:
+            sql, params, seconds = self._pending
+            self._pending = None
+            _record_query(self._cursor, sql, params, seconds, rows)
+
+    def execute(self, sql, params=()):
+        self._flush(max(self._cursor.rowcount, 0))
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            # Recorded on the next fetch/execute/close so the row count is known.
+            self._pending = (sql, params, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._add_fetch_time(time.perf_counter() - start)
+        self._flush(0 if row is None else 1)
+        return row
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._add_fetch_time(time.perf_counter() - start)
+        self._flush(len(rows))
+        return rows
+
+    def _add_fetch_time(self, seconds):
+        if self._pending is not None:
+            sql, params, elapsed = self._pending
+            self._pending = (sql, params, elapsed + seconds)
+
+    def close(self):
+        self._flush(max(self._cursor.rowcount, 0))
+        return self._cursor.close()
+
+
+def wrap_cursor(cursor):
+    return InstrumentedCursor(cursor) if enabled else cursor
+
+
+# --- Flask integration ---
+def _route_name():
+    rule = request.url_rule
+    return rule.rule if rule is not None else '<unmatched>'
+
+
+def _before_request():
+    g._request_start = time.perf_counter()
+
+
+def _before_render(sender, template, context, **extra):
+    g._render_start = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    start = g.pop('_render_start', None)
+    if start is not None:
+        add_timing('render', time.perf_counter() - start)
+
+
+def _after_request(response):
+    start = g.get('_request_start')
+    if start is None:
+        return response
+    total = time.perf_counter() - start
+    route = _route_name()
+    with _lock:
+        _route_durations[route].append(total)
+        _route_counts[route] += 1
+
+    parts = []
+    queries = g.get('_queries', [])
+    for phase, seconds in g.get('_timings', {}).items():
+        desc = f';desc="{len(queries)} queries"' if phase == 'db' else ''
+        parts.append(f'{phase};dur={seconds * 1000:.2f}{desc}')
+    parts.append(f'total;dur={total * 1000:.2f}')
+    response.headers['Server-Timing'] = ', '.join(parts)
+    return response
+
+
+def init_app(app):
+    if not enabled:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+
+# --- Prometheus exposition ---
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def render_prometheus():
+    with _lock:
+        routes = {route: sorted(values) for route, values in _route_durations.items()}
+        counts = dict(_route_counts)
+        query_stats = {fp: list(stats) for fp, stats in _query_stats.items()}
+
+    lines = [
+        '# HELP lotoweb_request_duration_seconds Request duration over the last '
+        f'{WINDOW_SIZE} requests per route.',
+        '# TYPE lotoweb_request_duration_seconds summary',
+    ]
+    for route, values in sorted(routes.items()):
+        label = _escape(route)
+        for q in QUANTILES:
+            lines.append(f'lotoweb_request_duration_seconds{{route="{label}",quantile="{q}"}} {_quantile(values, q):.6f}')
+        lines.append(f'lotoweb_request_duration_seconds_sum{{route="{label}"}} {sum(values):.6f}')
+        lines.append(f'lotoweb_request_duration_seconds_count{{route="{label}"}} {len(values)}')
+    lines.append('# HELP lotoweb_requests_total Requests handled per route since start.')
+    lines.append('# TYPE lotoweb_requests_total counter')
+    for route, count in sorted(counts.items()):
+        lines.append(f'lotoweb_requests_total{{route="{_escape(route)}"}} {count}')
+
+    lines.append('# HELP lotoweb_query_calls_total Statements executed per fingerprint.')
+    lines.append('# TYPE lotoweb_query_calls_total counter')
+    for fp, (calls, _, _) in sorted(query_stats.items()):
+        lines.append(f'lotoweb_query_calls_total{{query="{_escape(fp)}"}} {calls}')
+    lines.append('# HELP lotoweb_query_seconds_total Time spent per fingerprint.')
+    lines.append('# TYPE lotoweb_query_seconds_total counter')
+    for fp, (_, seconds, _) in sorted(query_stats.items()):
+        lines.append(f'lotoweb_query_seconds_total{{query="{_escape(fp)}"}} {seconds:.6f}')
+    lines.append('# HELP lotoweb_query_rows_total Rows returned or affected per fingerprint.')
+    lines.append('# TYPE lotoweb_query_rows_total counter')
+    for fp, (_, _, rows) in sorted(query_stats.items()):
+        lines.append(f'lotoweb_query_rows_total{{query="{_escape(fp)}"}} {rows}')
+    return '\n'.join(lines) + '\n'
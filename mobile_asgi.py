@@ -0,0 +1,291 @@
+"""ASGI variant of the mobile API, with the Flask app mounted behind it.
+
+The /api/mobile/* JSON endpoints spend most of their time waiting on the
+database. On the WSGI server each waiting request holds a worker thread. Here
+they run on an event loop: on PostgreSQL with an asyncpg pool, so one worker
+process keeps many slow requests in flight. Every other path is handed to
+the Flask app unchanged. Run it with
+
+    uvicorn mobile_asgi:app --host 0.0.0.0 --port 5000
+
+Tokens are the same HS256 JWTs as security.py (same secret, claims, revocation
+list and verified-token cache), so clients can switch servers without logging
+in again. ETags come from the same resource_versions.
+
+SQLite has no asynchronous I/O to wait on: there the handlers run the
+synchronous queries in Starlette's thread pool, and sales still go through
+the group-commit writer (database.write). Token checks, ETags and snapshot
+reads run in the thread pool on both databases: they may reload
+resource_versions or the revocation list, or read a snapshot file, all of
+which block.
+"""
+import contextlib
+import datetime
+import os
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+from werkzeug.security import check_password_hash
+
+import app as flask_app
+import compression
+import data_access
+import queries
+import raffle_snapshots
+import raffle_stats
+import sales
+import security
+from database import get_db_connection, get_cursor, is_unique_violation
+
+POOL_MIN = int(os.environ.get('MOBILE_DB_POOL_MIN', 2))
+POOL_MAX = int(os.environ.get('MOBILE_DB_POOL_MAX', 20))
+
+# asyncpg pool; None on SQLite.
+_pool = None
+
+
+# --- Data access ---
+def _fetch_sync(name, params, raffle_id=None):
+    conn = get_db_connection(raffle_id)
+    cur = get_cursor(conn)
+    rows = [row._asdict() for row in queries.fetch_all(cur, name, params)]
+    cur.close()
+    conn.close()
+    return rows
+
+
+async def fetch(name, *params, raffle_id=None):
+    """Rows of a registered statement as dicts; raffle_id routes to an archived raffle (SQLite)."""
+    if _pool is not None:
+        return [dict(row) for row in await _pool.fetch(queries.sql_for(name, 'asyncpg'), *params)]
+    return await run_in_threadpool(_fetch_sync, name, params, raffle_id)
+
+
+async def fetch_one(name, *params):
+    rows = await fetch(name, *params)
+    return rows[0] if rows else None
+
+
+async def save_sale(sale):
+    """Inserts a sales.SaleJob; returns its invoice id, or None when the raffle is closed."""
+    if _pool is None:
+        return await run_in_threadpool(sales.save, sale)
+    try:
+        return await _insert_sale(sale)
+    except Exception as exc:
+        # A concurrent upload of the same sale committed first (see sales.save).
+        if sale.client_ref is None or not is_unique_violation(exc):
+            raise
+    return await _pool.fetchval(queries.sql_for('invoice.by_client_ref', 'asyncpg'), sale.client_ref, sale.seller_id)
+
+
+async def _insert_sale(sale):
+    async with _pool.acquire() as conn:
+        async with conn.transaction():
+            if sale.client_ref is not None:
+                saved = await conn.fetchval(queries.sql_for('invoice.by_client_ref', 'asyncpg'),
+                                            sale.client_ref, sale.seller_id)
+                if saved is not None:
+                    return saved
+            if await conn.fetchrow(queries.sql_for('raffle.open_by_id', 'asyncpg'), sale.raffle_id, sale.now) is None:
+                return None
+            seq = await conn.fetchval(queries.sql_for('version.bump', 'asyncpg'), 'sync')
+            invoice_id = await conn.fetchval(queries.sql_for('invoice.insert', 'asyncpg'),
+                                             sale.raffle_id, sale.client_id, sale.seller_id, sale.total_amount,
+                                             seq, sale.client_ref)
+            await conn.executemany(queries.sql_for('invoice_item.insert', 'asyncpg'), [
+                (invoice_id, sale.raffle_id, sale.seller_id, sale.client_id, item['number'], item['item_type'],
+                 item['quantity'], item['price_per_unit'], item['sub_total'])
+                for item in sale.items
+            ])
+            await conn.execute(queries.sql_for('raffle_stats.add', 'asyncpg'),
+                               *raffle_stats.sale_delta(sale.raffle_id, sale.seller_id, sale.total_amount, sale.items))
+    return invoice_id
+
+
+# --- Helpers ---
+async def _claims(request):
+    """Seller claims of the request's bearer token, or None."""
+    auth = request.headers.get('authorization', '')
+    if not auth.startswith('Bearer '):
+        return None
+    token = auth.split(' ', 1)[1]
+    # Can reload resource_versions and the revocation list (database reads).
+    data = await run_in_threadpool(security.verify_jwt, token)
+    if data and data.get('role') == 'seller':
+        return token, data
+    return None
+
+
+def _unauthorized():
+    return JSONResponse({'error': 'Unauthorized'}, status_code=401)
+
+
+def _matching_etag(request, etag):
+    """The form of etag named by If-None-Match, or None (see compression.matching_etag)."""
+    header = request.headers.get('if-none-match', '')
+    tags = [tag.strip() for tag in header.split(',')]
+    if '*' in tags:
+        return etag
+    return next((tag for tag in compression.etag_variants(etag) if f'"{tag}"' in tags), None)
+
+
+def _versioned(request, response, etag):
+    # Same headers as data_access.versioned. GZipMiddleware compresses the
+    # body on the same conditions as below, so the tag gets the gzip suffix.
+    if (compression.enabled and response.status_code == 200 and len(response.body) >= compression.MIN_SIZE
+            and 'gzip' in request.headers.get('accept-encoding', '')):
+        etag += compression.ETAG_SUFFIXES['gzip']
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# --- Endpoints ---
+async def mobile_login(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        body = {}
+    username = body.get('username') if isinstance(body, dict) else None
+    password = body.get('password') if isinstance(body, dict) else None
+    if not username or not password:
+        return JSONResponse({'error': 'username and password required'}, status_code=400)
+
+    user = await fetch_one('user.by_username', username)
+    # The hash check is CPU work; keep it off the event loop.
+    if not user or not await run_in_threadpool(check_password_hash, user['password'], password):
+        return JSONResponse({'error': 'invalid credentials'}, status_code=401)
+    if user['role'] != 'seller':
+        return JSONResponse({'error': 'user is not a seller'}, status_code=403)
+
+    token = security.generate_jwt({'user_id': user['id'], 'username': username, 'role': user['role']})
+    return JSONResponse({'token': token, 'user': {'id': user['id'], 'username': username, 'name': user['name']}})
+
+
+async def mobile_logout(request):
+    claims = await _claims(request)
+    if claims is None:
+        return _unauthorized()
+    # A database write; keep it off the event loop.
+    await run_in_threadpool(security.revoke_jwt, *claims)
+    return JSONResponse({'ok': True})
+
+
+async def mobile_get_sorteos(request):
+    if await _claims(request) is None:
+        return _unauthorized()
+    etag = await run_in_threadpool(data_access.sorteos_etag)
+    matched = _matching_etag(request, etag)
+    if matched is not None:
+        return _versioned(request, Response(status_code=304), matched)
+    rows = await fetch('raffle.options')
+    return _versioned(request, JSONResponse([{'id': row['id'], 'date': row['raffle_date'].strftime('%Y-%m-%d %H:%M')}
+                                             for row in rows]), etag)
+
+
+async def _winner_payments(sorteo_id, seller_id):
+    snapshot = await run_in_threadpool(raffle_snapshots.store.get, sorteo_id)
+    if snapshot is not None:
+        names = await run_in_threadpool(data_access.snapshot_names, sorteo_id)
+        return snapshot.winner_payments(seller_id, names)
+    rows = await fetch('winner.payments_by_client_for_seller', sorteo_id, seller_id, raffle_id=sorteo_id)
+    invoices = {}
+    for row in await fetch('winner.invoices_for_seller', sorteo_id, seller_id, raffle_id=sorteo_id):
+        invoices.setdefault(row['client_id'], []).append({'id': row['invoice_id']})
+    return [{'cliente': ((row['name'] or '') + ' ' + (row['last_name'] or '')).strip() or 'Cliente',
+             'pago': row['total_payout'], 'facturas': invoices.get(row['client_id'], [])}
+            for row in rows]
+
+
+async def mobile_winner_payments(request):
+    claims = await _claims(request)
+    if claims is None:
+        return _unauthorized()
+    seller_id = claims[1].get('user_id')
+    try:
+        sorteo_id = int(request.query_params['sorteo_id'])
+    except (KeyError, ValueError):
+        return JSONResponse({'error': 'sorteo_id is required'}, status_code=400)
+    etag = await run_in_threadpool(data_access.winner_payments_tag, sorteo_id, seller_id)
+    matched = _matching_etag(request, etag)
+    if matched is not None:
+        return _versioned(request, Response(status_code=304), matched)
+    return _versioned(request, JSONResponse(await _winner_payments(sorteo_id, seller_id)), etag)
+
+
+async def mobile_create_sale(request):
+    claims = await _claims(request)
+    if claims is None:
+        return _unauthorized()
+    seller_id = claims[1].get('user_id')
+    try:
+        body = await request.json()
+        sale = sales.sale_from_json(body if isinstance(body, dict) else {}, seller_id, datetime.datetime.now())
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    if await fetch_one('client.by_id_for_seller', sale.client_id, seller_id) is None:
+        return JSONResponse({'error': 'client not found'}, status_code=404)
+    invoice_id = await save_sale(sale)
+    if invoice_id is None:
+        return JSONResponse({'error': 'raffle is not open for sales'}, status_code=409)
+    return JSONResponse({'invoice_id': invoice_id}, status_code=201)
+
+
+# --- Application ---
+@contextlib.asynccontextmanager
+async def _lifespan(app):
+    global _pool
+    if 'DATABASE_URL' in os.environ:
+        import asyncpg
+        _pool = await asyncpg.create_pool(os.environ['DATABASE_URL'], min_size=POOL_MIN, max_size=POOL_MAX)
+    yield
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def _cors_origins():
+    # Same CORS_ORIGINS setting as app.py.
+    origins = os.environ.get('CORS_ORIGINS', '*')
+    if origins.strip() == '*':
+        return ['*']
+    return [o.strip() for o in origins.split(',') if o.strip()]
+
+
+class _ApiCors:
+    """CORS for /api/* only, like the Flask-Cors resources in app.py."""
+
+    def __init__(self, app, **options):
+        self.app = app
+        self.cors = CORSMiddleware(app, **options)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].startswith('/api/'):
+            await self.cors(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+middleware = [Middleware(_ApiCors, allow_origins=_cors_origins(), allow_methods=['*'], allow_headers=['*'])]
+if compression.enabled:
+    # gzip for the endpoints served here; responses from the Flask app arrive
+    # already compressed by compression.py and pass through untouched.
+    middleware.append(Middleware(GZipMiddleware, minimum_size=compression.MIN_SIZE, compresslevel=compression.GZIP_LEVEL))
+
+app = Starlette(routes=[
+    Route('/api/mobile/login', mobile_login, methods=['POST']),
+    Route('/api/mobile/logout', mobile_logout, methods=['POST']),
+    Route('/api/mobile/sorteos', mobile_get_sorteos),
+    Route('/api/mobile/winner-payments', mobile_winner_payments),
+    Route('/api/mobile/sales', mobile_create_sale, methods=['POST']),
+    # Everything else, including any mobile endpoint not served here.
+    Mount('/', app=WSGIMiddleware(flask_app.app)),
+], middleware=middleware, lifespan=_lifespan)
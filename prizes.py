@@ -0,0 +1,104 @@
+"""Compiled prize tables.
+
+The payout rules (see calculo-premios.txt) only depend on the three winning
+numbers, so for a given (p1, p2, p3) they are evaluated once for every
+chance (00-99) and every billete that could match a rule, and kept as a
+table of number -> prizes. Winner calculation is then a dictionary lookup per item,
+and comparing the tables of two results tells exactly which numbers'
+payouts changed. lookup_keys gives the prefix/suffix keys that select the
+items worth looking up in the first place.
+"""
+import functools
+
+
+def _chance_prizes(num, p1, p2, p3):
+    p1_chance = p1[2:4]
+    p2_chance = p2 if len(p2) == 2 else p2[2:4]
+    p3_chance = p3 if len(p3) == 2 else p3[2:4]
+    prizes = []
+    if num == p1_chance: prizes.append(('Chance - 2 Ultimas (1er P)', 14))
+    if num == p2_chance: prizes.append(('Chance - 2 Ultimas (2do P)', 3))
+    if num == p3_chance: prizes.append(('Chance - 2 Ultimas (3er P)', 2))
+    return tuple(prizes)
+
+
+def _billete_prize(num, p1, p2, p3):
+    # A billete wins at most one prize: the first rule that matches.
+    p1_chance = p1[2:4]
+    p2_chance = p2 if len(p2) == 2 else p2[2:4]
+    p3_chance = p3 if len(p3) == 2 else p3[2:4]
+    if num == p1: return ('1er Premio - Billete', 2000)
+    elif len(p2) == 4 and num == p2: return ('2do Premio - Billete', 600)
+    elif len(p3) == 4 and num == p3: return ('3er Premio - Billete', 300)
+    elif num[0:3] == p1[0:3] or num[1:4] == p1[1:4]: return ('3 Cifras (1er P)', 50)
+    elif len(p2) == 4 and (num[0:3] == p2[0:3] or num[1:4] == p2[1:4]): return ('3 Cifras (2do P)', 20)
+    elif len(p3) == 4 and (num[0:3] == p3[0:3] or num[1:4] == p3[1:4]): return ('3 Cifras (3er P)', 10)
+    elif num[0:2] == p1[0:2] and num[3] == p1[3]: return ('2 Primeras y Ultima Cifra (1er P)', 4)
+    elif num[0:2] == p1[0:2] or num[2:4] == p1_chance: return ('2 Primeras o 2 Ultimas Cifras (1er P)', 3)
+    elif len(p2) == 4 and num[2:4] == p2_chance: return ('2 Ultimas Cifras (2do P)', 2)
+    elif num[3] == p1[3]: return ('Ultima Cifra (1er P)', 1)
+    elif len(p3) == 4 and num[2:4] == p3_chance: return ('2 Ultimas Cifras (3er P)', 1)
+    return None
+
+
+_DIGITS = '0123456789'
+_TWO_DIGITS = [f'{n:02d}' for n in range(100)]
+_THREE_DIGITS = [f'{n:03d}' for n in range(1000)]
+
+
+def _billete_candidates(p1, p2, p3):
+    """Every billete that can match some rule: a superset of the winners."""
+    candidates = set()
+    for prize in (p1, p2, p3):
+        if len(prize) == 4:
+            candidates.update(prize[:3] + d for d in _DIGITS)
+            candidates.update(d + prize[1:] for d in _DIGITS)
+        candidates.update(x + prize[-2:] for x in _TWO_DIGITS)
+    candidates.update(p1[:2] + x for x in _TWO_DIGITS)
+    candidates.update(x + p1[3] for x in _THREE_DIGITS)
+    return candidates
+
+
+@functools.lru_cache(maxsize=64)
+def compile_prize_table(p1, p2, p3):
+    """Returns {number: ((prize_type, amount), ...)} for every winning number.
+
+    Chances (2 digits) can win several prizes; billetes (4 digits) at most one.
+    Numbers that win nothing are left out.
+    """
+    table = {}
+    for num in _TWO_DIGITS:
+        prizes = _chance_prizes(num, p1, p2, p3)
+        if prizes:
+            table[num] = prizes
+    for num in _billete_candidates(p1, p2, p3):
+        prize = _billete_prize(num, p1, p2, p3)
+        if prize is not None:
+            table[num] = (prize,)
+    return table
+
+
+def _padded(keys, size=3):
+    return tuple(keys) + (None,) * (size - len(keys))
+
+
+def lookup_keys(p1, p2, p3):
+    """Keys for invoice_item.prize_candidates, padded with None.
+
+    (chance numbers, prefix3s, suffix3s, prefix2, suffix2s, last1): every item
+    that can win for these results matches at least one of them.
+    """
+    billete_prizes = [p for p in (p1, p2, p3) if len(p) == 4]
+    return (
+        tuple(p[-2:] for p in (p1, p2, p3)),
+        _padded([int(p[:3]) for p in billete_prizes]),
+        _padded([int(p[1:]) for p in billete_prizes]),
+        (int(p1[:2]),),
+        _padded([int(p[2:]) for p in billete_prizes]),
+        (int(p1[3]),),
+    )
+
+
+def changed_numbers(old_table, new_table):
+    """Numbers whose prizes differ between two compiled tables."""
+    return {num for num in old_table.keys() | new_table.keys() if old_table.get(num) != new_table.get(num)}
@@ -0,0 +1,234 @@
+"""On-demand request profiling for reproducing slow pages on real data.
+
+An admin arms a route from /admin/profiling to capture its next N requests,
+or sends a single request with the X-Profile header (from an admin session,
+or with X-Profile set to PROFILE_TOKEN for API clients). Each capture is
+written to PROFILE_DIR as a cProfile .prof file, or as pyinstrument HTML when
+format "html" is chosen and pyinstrument is installed. Only the newest
+PROFILE_MAX_CAPTURES files are kept.
+
+Armed routes are kept in a file in PROFILE_DIR, so with several worker
+processes (gunicorn) the N requests are counted across all of them,
+whichever worker serves each one. Workers on other hosts only share them
+if PROFILE_DIR is shared too.
+
+Each process profiles one request at a time; requests arriving while a
+capture is running are served normally.
+"""
+import contextlib
+import cProfile
+import datetime
+import importlib.util
+import io
+import json
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows, where waitress runs a single process
+    fcntl = None
+
+from flask import g, request, session
+
+PROFILE_DIR = os.path.abspath(os.environ.get('PROFILE_DIR', 'profiles'))
+MAX_CAPTURES = int(os.environ.get('PROFILE_MAX_CAPTURES', 20))
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+HEADER = 'X-Profile'
+FORMATS = ('prof', 'html')
+
+_lock = threading.Lock()
+_busy = threading.Lock()  # held while a capture is running
+# route rule or path -> [remaining requests, format], shared by every worker.
+ARMED_PATH = os.path.join(PROFILE_DIR, '.armed.json')
+_armed_cache = (None, {})  # (file identity, routes) last read by this process
+
+_SAFE_NAME = re.compile(r'^[\w.-]+\.(prof|html)$')
+
+
+def html_available():
+    return importlib.util.find_spec('pyinstrument') is not None
+
+
+def arm(route, count, fmt='prof'):
+    if fmt not in FORMATS:
+        raise ValueError(f'Formato desconocido: {fmt}')
+    if fmt == 'html' and not html_available():
+        raise ValueError('pyinstrument no está instalado; use el formato .prof.')
+    with _updating_armed() as routes:
+        routes[route] = [max(1, int(count)), fmt]
+
+
+def disarm(route):
+    with _updating_armed() as routes:
+        routes.pop(route, None)
+
+
+def armed():
+    return {route: tuple(entry) for route, entry in _armed_routes().items()}
+
+
+def _armed_routes():
+    """Armed routes as last written by any process; the file is re-read only when replaced."""
+    global _armed_cache
+    try:
+        stat = os.stat(ARMED_PATH)
+    except OSError:
+        return {}
+    identity = (stat.st_ino, stat.st_mtime_ns)
+    if _armed_cache[0] != identity:
+        try:
+            with open(ARMED_PATH, encoding='utf-8') as f:
+                _armed_cache = (identity, json.load(f))
+        except (OSError, ValueError):
+            return {}
+    return _armed_cache[1]
+
+
+@contextlib.contextmanager
+def _updating_armed():
+    """Yields the armed routes to change; other processes wait until they are written back."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with _lock, open(ARMED_PATH + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.lockf(lock_file, fcntl.LOCK_EX)
+        try:
+            with open(ARMED_PATH, encoding='utf-8') as f:
+                routes = json.load(f)
+        except (OSError, ValueError):
+            routes = {}
+        yield routes
+        if not routes:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(ARMED_PATH)
+            return
+        # Replaced, not rewritten, so unlocked readers never see half a file.
+        fd, tmp = tempfile.mkstemp(dir=PROFILE_DIR, prefix='.armed_')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(routes, f)
+        os.replace(tmp, ARMED_PATH)
+
+
+def _take_armed():
+    """Returns the format if this request should be profiled by an armed route."""
+    routes = _armed_routes()
+    if not routes:
+        return None
+    rule = request.url_rule.rule if request.url_rule is not None else None
+    keys = [key for key in (rule, request.path) if key in routes]
+    if not keys:
+        return None
+    # Counted down under the lock: another worker may have taken the last one.
+    with _updating_armed() as routes:
+        for key in keys:
+            entry = routes.get(key)
+            if entry is not None:
+                entry[0] -= 1
+                if entry[0] <= 0:
+                    del routes[key]
+                return entry[1]
+    return None
+
+
+def _requested_format():
+    value = request.headers.get(HEADER)
+    if value is not None:
+        allowed = session.get('user_role') == 'admin' or (PROFILE_TOKEN and value == PROFILE_TOKEN)
+        if allowed:
+            return 'html' if value == 'html' and html_available() else 'prof'
+    return _take_armed()
+
+
+class _HtmlProfiler:
+    def __init__(self):
+        from pyinstrument import Profiler  # optional dependency
+        self._profiler = Profiler()
+
+    def enable(self):
+        self._profiler.start()
+
+    def disable(self):
+        self._profiler.stop()
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self._profiler.output_html())
+
+
+class _CProfiler(cProfile.Profile):
+    def save(self, path):
+        self.dump_stats(path)
+
+
+def _before_request():
+    fmt = _requested_format()
+    if fmt is None or not _busy.acquire(blocking=False):
+        return
+    profiler = _HtmlProfiler() if fmt == 'html' else _CProfiler()
+    g._profile = (profiler, fmt, time.perf_counter())
+    profiler.enable()
+
+
+def _teardown_request(exc):
+    capture = g.pop('_profile', None)
+    if capture is None:
+        return
+    profiler, fmt, start = capture
+    try:
+        profiler.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        endpoint = re.sub(r'[^\w-]', '_', request.endpoint or 'unmatched')
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.save(os.path.join(PROFILE_DIR, f'{stamp}_{endpoint}_{elapsed_ms:.0f}ms.{fmt}'))
+        _prune()
+    finally:
+        _busy.release()
+
+
+def _prune():
+    for capture in captures()[MAX_CAPTURES:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, capture['name']))
+        except OSError:
+            pass
+
+
+def captures():
+    """Stored captures, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    result = []
+    for name in os.listdir(PROFILE_DIR):
+        if _SAFE_NAME.match(name):
+            stat = os.stat(os.path.join(PROFILE_DIR, name))
+            result.append({'name': name, 'size': stat.st_size,
+                           'created': datetime.datetime.fromtimestamp(stat.st_mtime)})
+    result.sort(key=lambda c: c['name'], reverse=True)
+    return result
+
+
+def capture_path(name):
+    """Absolute path of a stored capture, or None for unknown/unsafe names."""
+    if not _SAFE_NAME.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def stats_text(path, limit=60):
+    """Top functions of a .prof capture by cumulative time, with file:line."""
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.sort_stats('cumulative').print_stats(limit)
+    stats.sort_stats('tottime').print_stats(limit)
+    return out.getvalue()
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
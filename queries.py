@@ -0,0 +1,418 @@
+"""Named SQL statements shared by the views/ blueprints, data_access.py and scripts.
+
+Statements are written once with psycopg2-style ``%s`` placeholders and
+rendered for every supported dialect when they are registered, so a request
+only does a dictionary lookup instead of building SQL strings or retrying a
+query with a different placeholder style.
+"""
+import functools
+
+from database import dialect_of
+
+# 'asyncpg' is PostgreSQL through asyncpg (the ASGI mobile API), which
+# numbers its placeholders.
+DIALECTS = ('sqlite', 'postgres', 'asyncpg')
+
+# dialect -> statement name -> rendered SQL
+_RENDERED = {dialect: {} for dialect in DIALECTS}
+
+
+def render(sql, dialect):
+    """Renders a ``%s`` statement for the given dialect."""
+    if dialect == 'sqlite':
+        return sql.replace('%s', '?')
+    if dialect == 'asyncpg':
+        parts = sql.split('%s')
+        return parts[0] + ''.join(f'${n}{part}' for n, part in enumerate(parts[1:], 1))
+    return sql
+
+
+def register(name, sql):
+    """Registers a named statement and renders it for every dialect."""
+    for dialect in DIALECTS:
+        _RENDERED[dialect][name] = render(sql, dialect)
+
+
+@functools.lru_cache(maxsize=512)
+def _render_adhoc(sql, dialect):
+    return render(sql, dialect)
+
+
+def sql_for(name, dialect):
+    """The rendered text of a registered statement, for drivers without a DB-API cursor."""
+    return _RENDERED[dialect][name]
+
+
+def execute(cur, name, params=()):
+    """Executes a registered statement and returns the cursor."""
+    cur.execute(_RENDERED[dialect_of(cur)][name], params)
+    return cur
+
+
+def fetch_one(cur, name, params=()):
+    return execute(cur, name, params).fetchone()
+
+
+def fetch_all(cur, name, params=()):
+    return execute(cur, name, params).fetchall()
+
+
+def execute_sql(cur, sql, params=()):
+    """Executes a statement built at runtime (e.g. optional filters).
+
+    The rendered text is cached, so repeated filter combinations are only
+    translated once per dialect.
+    """
+    cur.execute(_render_adhoc(sql, dialect_of(cur)), params)
+    return cur
+
+
+# Bound parameters per multi-row statement; under SQLite's historical limit of 999.
+MAX_PARAMS = 999
+
+
+def insert_many(cur, table, columns, rows, returning=None):
+    """INSERT ... VALUES (...), (...) in as few statements as the parameter limit allows.
+
+    Returns the RETURNING rows of every statement, in one list.
+    """
+    per_statement = max(1, MAX_PARAMS // len(columns))
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    returned = []
+    for start in range(0, len(rows), per_statement):
+        chunk = rows[start:start + per_statement]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([placeholders] * len(chunk))}"
+        if returning:
+            sql += f' RETURNING {returning}'
+        execute_sql(cur, sql, [value for row in chunk for value in row])
+        if returning:
+            returned.extend(cur.fetchall())
+    return returned
+
+
+# --- Users / sellers ---
+register('user.by_username', 'SELECT id, username, password, role, name FROM users WHERE username = %s')
+register('user.password_by_id', 'SELECT id, password FROM users WHERE id = %s')
+register('user.update_password', 'UPDATE users SET password = %s WHERE id = %s')
+register('user.commission_by_id', 'SELECT commission_percentage FROM users WHERE id = %s')
+register('seller.list', '''
+    SELECT id, username, name, phone, province, commission_percentage, join_date
+    FROM users WHERE role = 'seller' ORDER BY name
+''')
+register('seller.commission_rates', "SELECT id, name, commission_percentage FROM users WHERE role = 'seller'")
+register('seller.options', "SELECT id, name FROM users WHERE role = 'seller' ORDER BY name")
+register('seller.by_id', "SELECT * FROM users WHERE id = %s AND role = 'seller'")
+register('seller.insert', '''
+    INSERT INTO users (username, password, role, name, phone, province, commission_percentage)
+    VALUES (%s, %s, 'seller', %s, %s, %s, %s)
+''')
+register('seller.update', 'UPDATE users SET name = %s, phone = %s, province = %s, commission_percentage = %s WHERE id = %s')
+
+# --- Raffles ---
+register('raffle.list', 'SELECT * FROM raffles ORDER BY raffle_date DESC')
+register('raffle.options', 'SELECT id, raffle_date FROM raffles ORDER BY raffle_date DESC')
+register('raffle.latest_id', 'SELECT id FROM raffles ORDER BY raffle_date DESC LIMIT 1')
+register('raffle.by_id', 'SELECT * FROM raffles WHERE id = %s')
+register('raffle.with_results', 'SELECT * FROM raffles WHERE results_entered = true ORDER BY raffle_date DESC')
+register('raffle.pending', 'SELECT id, raffle_date FROM raffles WHERE results_entered = false ORDER BY raffle_date')
+register('raffle.open_by_id', 'SELECT id FROM raffles WHERE id = %s AND raffle_date > %s AND results_entered = false')
+register('raffle.insert', 'INSERT INTO raffles (raffle_date, change_seq) VALUES (%s, %s) RETURNING id')
+register('raffle.set_results', '''
+    UPDATE raffles SET first_prize = %s, second_prize = %s, third_prize = %s, results_entered = true, change_seq = %s
+    WHERE id = %s
+''')
+
+# --- Clients ---
+register('client.list_all_page', '''
+    SELECT c.id, c.name, c.last_name, c.phone, c.address, u.name as seller_name
+    FROM clients c JOIN users u ON c.seller_id = u.id
+    ORDER BY c.name LIMIT %s
+''')
+register('client.list_for_seller_page', 'SELECT * FROM clients WHERE seller_id = %s ORDER BY name LIMIT %s')
+_CLIENT_SEARCH_ROWS = '''
+    SELECT c.id, c.name, c.last_name, c.phone, c.address, c.seller_id, u.name as seller_name
+    FROM clients c JOIN users u ON c.seller_id = u.id
+'''
+register('client.search_rows_all', _CLIENT_SEARCH_ROWS)
+register('client.search_rows_for_seller', _CLIENT_SEARCH_ROWS + ' WHERE c.seller_id = %s')
+register('client.search_row_by_id', _CLIENT_SEARCH_ROWS + ' WHERE c.id = %s')
+register('client.search_rows_changed', _CLIENT_SEARCH_ROWS + ' WHERE c.change_seq > %s AND c.change_seq <= %s')
+register('client.options_all', 'SELECT id, name, last_name FROM clients ORDER BY name')
+register('client.options_for_seller', 'SELECT id, name, last_name FROM clients WHERE seller_id = %s ORDER BY name')
+register('client.names_by_raffle', '''
+    SELECT DISTINCT c.id, c.name, c.last_name
+    FROM clients c JOIN invoices i ON i.client_id = c.id
+    WHERE i.raffle_id = %s
+''')
+register('client.by_id', 'SELECT * FROM clients WHERE id = %s')
+register('client.by_id_for_seller', 'SELECT * FROM clients WHERE id = %s AND seller_id = %s')
+register('client.insert', '''
+    INSERT INTO clients (name, last_name, phone, address, seller_id, change_seq)
+    VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
+''')
+register('client.update', '''
+    UPDATE clients SET name = %s, last_name = %s, phone = %s, address = %s, seller_id = %s, change_seq = %s
+    WHERE id = %s
+''')
+
+# --- Invoices ---
+_INVOICE_DETAIL = '''
+    SELECT i.id, i.total_amount, i.creation_date,
+           r.raffle_date,
+           c.name as client_name, c.last_name as client_last_name,
+           u.name as seller_name
+    FROM invoices i
+    JOIN raffles r ON i.raffle_id = r.id
+    JOIN clients c ON i.client_id = c.id
+    JOIN users u ON i.seller_id = u.id
+    WHERE i.id = %s
+'''
+register('invoice.detail', _INVOICE_DETAIL)
+register('invoice.detail_for_seller', _INVOICE_DETAIL + ' AND i.seller_id = %s')
+register('invoice.for_delete', '''
+    SELECT i.id, i.seller_id, r.raffle_date, r.results_entered
+    FROM invoices i JOIN raffles r ON i.raffle_id = r.id
+    WHERE i.id = %s
+''')
+register('invoice.for_edit', '''
+    SELECT i.id, i.seller_id, i.client_id, i.raffle_id, r.raffle_date, r.results_entered,
+           c.name as client_name, c.last_name as client_last_name
+    FROM invoices i
+    JOIN raffles r ON i.raffle_id = r.id
+    JOIN clients c ON i.client_id = c.id
+    WHERE i.id = %s AND i.seller_id = %s
+''')
+register('invoice.by_raffle', '''
+    SELECT id, client_id, seller_id, total_amount, creation_date
+    FROM invoices WHERE raffle_id = %s ORDER BY id
+''')
+register('invoice.insert', '''
+    INSERT INTO invoices (raffle_id, client_id, seller_id, total_amount, change_seq, client_ref)
+    VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
+''')
+register('invoice.by_client_ref', 'SELECT id FROM invoices WHERE client_ref = %s AND seller_id = %s')
+register('invoice.update', 'UPDATE invoices SET raffle_id = %s, client_id = %s, total_amount = %s, change_seq = %s WHERE id = %s')
+register('invoice.delete', 'DELETE FROM invoices WHERE id = %s')
+register('invoice_item.by_invoice', 'SELECT * FROM invoice_items WHERE invoice_id = %s')
+register('invoice_item.insert', '''
+    INSERT INTO invoice_items (invoice_id, raffle_id, seller_id, client_id, number, item_type, quantity, price_per_unit, sub_total)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+''')
+register('invoice_item.book_by_raffle', '''
+    SELECT number, item_type, quantity, invoice_id, client_id, seller_id
+    FROM invoice_items WHERE raffle_id = %s
+''')
+register('invoice_item.full_by_raffle', '''
+    SELECT * FROM invoice_items
+    WHERE raffle_id = %s
+    ORDER BY invoice_id, id
+''')
+# Items that may win for a set of results: one indexed lookup per prize-rule
+# key (raffle_id is repeated in every branch so each one can use its own
+# index). Parameters: raffle_id followed by the keys of each branch, in the
+# order of prizes.lookup_keys.
+_PRIZE_LOOKUPS = ('number IN (%s, %s, %s)', 'prefix3 IN (%s, %s, %s)', 'suffix3 IN (%s, %s, %s)',
+                  'prefix2 = %s', 'suffix2 IN (%s, %s, %s)', 'last1 = %s')
+register('invoice_item.prize_candidates', '''
+    SELECT id, number, item_type, quantity, client_id, seller_id, invoice_id
+    FROM invoice_items
+    WHERE ''' + '\n       OR '.join(f'(raffle_id = %s AND {lookup})' for lookup in _PRIZE_LOOKUPS) + '\n    ORDER BY id')
+register('invoice_item.delete_by_invoice', 'DELETE FROM invoice_items WHERE invoice_id = %s')
+register('invoice_item.by_raffle', '''
+    SELECT id, number, item_type, quantity, client_id, seller_id, invoice_id
+    FROM invoice_items WHERE raffle_id = %s
+''')
+
+# --- Winners ---
+register('winner.delete_by_raffle', 'DELETE FROM winners WHERE raffle_id = %s')
+register('winner.numbers_by_raffle', 'SELECT id, winning_number FROM winners WHERE raffle_id = %s')
+register('winner.insert', '''
+    INSERT INTO winners
+        (raffle_id, invoice_id, client_id, seller_id, winning_number, prize_type, amount_won, quantity, total_payout)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+''')
+_WINNER_LIST = '''
+    SELECT w.*, c.name as client_name, u.name as seller_name, r.raffle_date
+    FROM winners w
+    JOIN clients c ON w.client_id = c.id
+    JOIN users u ON w.seller_id = u.id
+    JOIN raffles r ON w.raffle_id = r.id
+    WHERE w.raffle_id = %s
+'''
+register('winner.list', _WINNER_LIST + ' ORDER BY u.name, c.name')
+register('winner.list_for_seller', _WINNER_LIST + ' AND w.seller_id = %s ORDER BY c.name')
+register('winner.payments_by_client', '''
+    SELECT w.client_id, c.name, c.last_name, SUM(w.total_payout) as total_payout
+    FROM winners w JOIN clients c ON w.client_id = c.id
+    WHERE w.raffle_id = %s
+    GROUP BY w.client_id, c.name, c.last_name
+''')
+register('winner.payments_by_client_for_seller', '''
+    SELECT w.client_id, c.name, c.last_name, SUM(w.total_payout) as total_payout
+    FROM winners w JOIN clients c ON w.client_id = c.id
+    WHERE w.raffle_id = %s AND w.seller_id = %s
+    GROUP BY w.client_id, c.name, c.last_name
+''')
+register('winner.invoices_for_client', 'SELECT DISTINCT invoice_id FROM winners WHERE raffle_id = %s AND client_id = %s')
+register('winner.invoices_for_client_for_seller', 'SELECT DISTINCT invoice_id FROM winners WHERE raffle_id = %s AND client_id = %s AND seller_id = %s')
+register('winner.invoices_for_seller', '''
+    SELECT DISTINCT client_id, invoice_id FROM winners
+    WHERE raffle_id = %s AND seller_id = %s ORDER BY client_id, invoice_id
+''')
+
+# --- Reports ---
+# {filter} lets callers exclude raffles served from snapshots (see raffle_snapshots.py).
+SELLER_COMMISSIONS_SQL = '''
+    SELECT
+        r.id as raffle_id, r.raffle_date,
+        COALESCE(SUM(i.total_amount), 0) as total_sales,
+        (SELECT COALESCE(SUM(w.total_payout), 0) FROM winners w WHERE w.seller_id = %s AND w.raffle_id = r.id) as total_winnings
+    FROM raffles r
+    LEFT JOIN invoices i ON r.id = i.raffle_id AND i.seller_id = %s
+    WHERE r.results_entered = true{filter}
+    GROUP BY r.id
+    ORDER BY r.raffle_date DESC
+'''
+register('report.seller_commissions', SELLER_COMMISSIONS_SQL.format(filter=''))
+# Per-seller totals of one archived raffle, read on its archive connection
+# when it has no snapshot (see data_access.closed_raffle_totals).
+register('report.raffle_seller_sales',
+         'SELECT seller_id, SUM(total_amount) AS total FROM invoices WHERE raffle_id = %s GROUP BY seller_id')
+register('report.raffle_seller_winnings',
+         'SELECT seller_id, SUM(total_payout) AS total FROM winners WHERE raffle_id = %s GROUP BY seller_id')
+
+# --- Resource versions (ETags) ---
+register('version.create_table', '''
+    CREATE TABLE IF NOT EXISTS resource_versions (
+        resource TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+''')
+register('version.all', 'SELECT resource, version FROM resource_versions')
+register('version.bump', '''
+    INSERT INTO resource_versions (resource, version) VALUES (%s, 1)
+    ON CONFLICT (resource) DO UPDATE SET version = resource_versions.version + 1
+    RETURNING version
+''')
+
+# --- Revoked mobile tokens (see security.py) ---
+register('token.create_table', '''
+    CREATE TABLE IF NOT EXISTS revoked_tokens (
+        token_key TEXT PRIMARY KEY,
+        expires_at INTEGER NOT NULL
+    )
+''')
+register('token.active', 'SELECT token_key, expires_at FROM revoked_tokens WHERE expires_at > %s')
+register('token.revoke', 'INSERT INTO revoked_tokens (token_key, expires_at) VALUES (%s, %s) ON CONFLICT (token_key) DO NOTHING')
+register('token.purge_expired', 'DELETE FROM revoked_tokens WHERE expires_at <= %s')
+
+# --- Delta sync (see sync.py) ---
+register('sync.version', "SELECT version FROM resource_versions WHERE resource = 'sync'")
+register('sync.record_deletion', 'INSERT INTO sync_deletions (seq, table_name, row_id, seller_id) VALUES (%s, %s, %s, %s)')
+# The change_seq > %s AND change_seq <= %s window is (since, version].
+register('sync.clients', '''
+    SELECT id, name, last_name, phone, address FROM clients
+    WHERE seller_id = %s AND change_seq > %s AND change_seq <= %s
+''')
+register('sync.raffles', '''
+    SELECT id, raffle_date, results_entered FROM raffles
+    WHERE change_seq > %s AND change_seq <= %s
+''')
+register('sync.raffles_open', '''
+    SELECT id, raffle_date, results_entered FROM raffles
+    WHERE results_entered = false AND change_seq <= %s
+''')
+SYNC_INVOICES_SQL = '''
+    SELECT i.id, i.raffle_id, i.client_id, i.total_amount, i.creation_date, i.client_ref
+    FROM invoices i{join}
+    WHERE i.seller_id = %s AND i.change_seq > %s AND i.change_seq <= %s{filter}
+'''
+SYNC_ITEMS_SQL = '''
+    SELECT ii.invoice_id, ii.number, ii.item_type, ii.quantity, ii.sub_total
+    FROM invoice_items ii JOIN invoices i ON ii.invoice_id = i.id{join}
+    WHERE i.seller_id = %s AND i.change_seq > %s AND i.change_seq <= %s{filter}
+    ORDER BY ii.invoice_id, ii.id
+'''
+_OPEN_RAFFLE = dict(join=' JOIN raffles r ON i.raffle_id = r.id', filter=' AND r.results_entered = false')
+register('sync.invoices', SYNC_INVOICES_SQL.format(join='', filter=''))
+register('sync.invoice_items', SYNC_ITEMS_SQL.format(join='', filter=''))
+# Full copies only carry the invoices of raffles still open.
+register('sync.invoices_open', SYNC_INVOICES_SQL.format(**_OPEN_RAFFLE))
+register('sync.invoice_items_open', SYNC_ITEMS_SQL.format(**_OPEN_RAFFLE))
+register('sync.deletions', '''
+    SELECT table_name, row_id FROM sync_deletions
+    WHERE seller_id = %s AND seq > %s AND seq <= %s
+''')
+
+# --- Raffle dashboard totals (see raffle_stats.py) ---
+register('raffle_stats.add', '''
+    INSERT INTO raffle_stats (raffle_id, seller_id, invoice_count, sales_total, billete_units, chance_units)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (raffle_id, seller_id) DO UPDATE SET
+        invoice_count = raffle_stats.invoice_count + excluded.invoice_count,
+        sales_total = raffle_stats.sales_total + excluded.sales_total,
+        billete_units = raffle_stats.billete_units + excluded.billete_units,
+        chance_units = raffle_stats.chance_units + excluded.chance_units
+''')
+register('raffle_stats.invoice_totals', '''
+    SELECT i.raffle_id, i.seller_id, i.total_amount,
+        COALESCE(SUM(CASE WHEN ii.item_type = 'billete' THEN ii.quantity END), 0) AS billete_units,
+        COALESCE(SUM(CASE WHEN ii.item_type = 'chance' THEN ii.quantity END), 0) AS chance_units
+    FROM invoices i LEFT JOIN invoice_items ii ON ii.invoice_id = i.id AND ii.raffle_id = i.raffle_id
+    WHERE i.id = %s
+    GROUP BY i.id, i.raffle_id, i.seller_id, i.total_amount
+''')
+register('raffle_stats.reset_payouts', 'UPDATE raffle_stats SET payouts_total = 0 WHERE raffle_id = %s')
+register('raffle_stats.set_payouts', '''
+    INSERT INTO raffle_stats (raffle_id, seller_id, payouts_total) VALUES (%s, %s, %s)
+    ON CONFLICT (raffle_id, seller_id) DO UPDATE SET payouts_total = excluded.payouts_total
+''')
+register('raffle_stats.put', '''
+    INSERT INTO raffle_stats (raffle_id, seller_id, invoice_count, sales_total, billete_units, chance_units, payouts_total)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (raffle_id, seller_id) DO UPDATE SET
+        invoice_count = excluded.invoice_count, sales_total = excluded.sales_total,
+        billete_units = excluded.billete_units, chance_units = excluded.chance_units,
+        payouts_total = excluded.payouts_total
+''')
+register('raffle_stats.delete', 'DELETE FROM raffle_stats WHERE raffle_id = %s AND seller_id = %s')
+register('raffle_stats.all', 'SELECT * FROM raffle_stats')
+register('raffle_stats.for_raffle', 'SELECT * FROM raffle_stats WHERE raffle_id = %s')
+# Commissions use the seller's current rate, like the commission report.
+register('raffle_stats.summaries', '''
+    SELECT r.id AS raffle_id, r.raffle_date, r.results_entered,
+        COALESCE(SUM(s.invoice_count), 0) AS invoice_count,
+        COALESCE(SUM(s.sales_total), 0) AS sales_total,
+        COALESCE(SUM(s.billete_units), 0) AS billete_units,
+        COALESCE(SUM(s.chance_units), 0) AS chance_units,
+        COALESCE(SUM(s.sales_total * COALESCE(u.commission_percentage, 0) / 100.0), 0) AS commissions,
+        COALESCE(SUM(s.payouts_total), 0) AS payouts_total
+    FROM raffles r
+    LEFT JOIN raffle_stats s ON s.raffle_id = r.id
+    LEFT JOIN users u ON u.id = s.seller_id
+    GROUP BY r.id, r.raffle_date, r.results_entered
+    ORDER BY r.raffle_date DESC
+''')
+# The same totals recomputed from the base tables, for the consistency check.
+RAFFLE_STATS_ACTUAL_SQL = {
+    'invoices': '''
+        SELECT raffle_id, seller_id, COUNT(*) AS invoice_count, SUM(total_amount) AS sales_total
+        FROM invoices{filter} GROUP BY raffle_id, seller_id
+    ''',
+    'items': '''
+        SELECT raffle_id, seller_id,
+            SUM(CASE WHEN item_type = 'billete' THEN quantity ELSE 0 END) AS billete_units,
+            SUM(CASE WHEN item_type = 'chance' THEN quantity ELSE 0 END) AS chance_units
+        FROM invoice_items{filter} GROUP BY raffle_id, seller_id
+    ''',
+    'winners': '''
+        SELECT raffle_id, seller_id, SUM(total_payout) AS payouts_total
+        FROM winners{filter} GROUP BY raffle_id, seller_id
+    ''',
+}
+register('raffle_stats.actual_invoices', RAFFLE_STATS_ACTUAL_SQL['invoices'].format(filter=''))
+register('raffle_stats.actual_items', RAFFLE_STATS_ACTUAL_SQL['items'].format(filter=''))
+register('raffle_stats.actual_winners', RAFFLE_STATS_ACTUAL_SQL['winners'].format(filter=''))
+register('raffle_stats.actual_invoices_for_raffle', RAFFLE_STATS_ACTUAL_SQL['invoices'].format(filter=' WHERE raffle_id = %s'))
+register('raffle_stats.actual_items_for_raffle', RAFFLE_STATS_ACTUAL_SQL['items'].format(filter=' WHERE raffle_id = %s'))
+register('raffle_stats.actual_winners_for_raffle', RAFFLE_STATS_ACTUAL_SQL['winners'].format(filter=' WHERE raffle_id = %s'))
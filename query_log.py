@@ -0,0 +1,118 @@
+"""Slow-query log and N+1 detector built on the cursor instrumentation.
+
+Enabled with QUERY_LOG=1 (which also turns on instrumentation). Findings are
+written as one JSON object per line to a rotating log for offline analysis:
+
+* "slow_query": a statement that took longer than SLOW_QUERY_MS, with its
+  EXPLAIN plan;
+* "n_plus_one": a request that ran the same query fingerprint more than
+  N_PLUS_ONE_THRESHOLD times.
+
+QUERY_LOG_PATH (default logs/queries.jsonl), QUERY_LOG_MAX_BYTES and
+QUERY_LOG_BACKUPS control the log file.
+"""
+import collections
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import sqlite3
+
+from flask import g, has_request_context, request
+
+import instrumentation
+
+enabled = os.environ.get('QUERY_LOG', '0') == '1'
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+LOG_PATH = os.environ.get('QUERY_LOG_PATH', os.path.join('logs', 'queries.jsonl'))
+LOG_MAX_BYTES = int(os.environ.get('QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024))
+LOG_BACKUPS = int(os.environ.get('QUERY_LOG_BACKUPS', 5))
+
+logger = logging.getLogger('lotoweb.queries')
+logger.propagate = False
+
+
+def _configure_logger():
+    if logger.handlers:
+        return
+    directory = os.path.dirname(LOG_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def _write(finding):
+    finding['ts'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    if has_request_context():
+        finding.setdefault('method', request.method)
+        finding.setdefault('path', request.path)
+    logger.info(json.dumps(finding, default=str))
+
+
+def explain(cursor, sql, params):
+    """Returns the query plan of a SELECT as a list of lines, or None."""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    conn = cursor.connection
+    is_sqlite = isinstance(conn, sqlite3.Connection)
+    prefix = 'EXPLAIN QUERY PLAN ' if is_sqlite else 'EXPLAIN '
+    plan_cur = conn.cursor()  # raw cursor, so the EXPLAIN itself is not recorded
+    try:
+        plan_cur.execute(prefix + sql, params)
+        rows = plan_cur.fetchall()
+    except Exception as exc:
+        return [f'EXPLAIN failed: {exc}']
+    finally:
+        plan_cur.close()
+    if is_sqlite:
+        # (id, parent, notused, detail)
+        return [row[3] for row in rows]
+    return [row[0] for row in rows]
+
+
+def _on_query(fp, sql, params, seconds, rows, cursor):
+    if seconds * 1000 < SLOW_QUERY_MS:
+        return
+    _write({
+        'type': 'slow_query',
+        'fingerprint': fp,
+        'duration_ms': round(seconds * 1000, 3),
+        'rows': rows,
+        'plan': explain(cursor, sql, params),
+    })
+
+
+def _check_n_plus_one(response):
+    queries = g.get('_queries')
+    if not queries:
+        return response
+    counts = collections.Counter()
+    durations = collections.Counter()
+    for fp, seconds, _ in queries:
+        counts[fp] += 1
+        durations[fp] += seconds
+    for fp, count in counts.items():
+        if count > N_PLUS_ONE_THRESHOLD:
+            rule = request.url_rule
+            _write({
+                'type': 'n_plus_one',
+                'route': rule.rule if rule is not None else None,
+                'fingerprint': fp,
+                'count': count,
+                'total_ms': round(durations[fp] * 1000, 3),
+            })
+    return response
+
+
+def init_app(app):
+    if not enabled:
+        return
+    _configure_logger()
+    instrumentation.query_listeners.append(_on_query)
+    app.after_request(_check_n_plus_one)
@@ -0,0 +1,169 @@
+"""Columnar in-memory view of all items sold for one raffle.
+
+A RaffleBook keeps a raffle's invoice items as NumPy arrays instead of lists
+of rows, which takes a fraction of the memory and lets analyses (exposure per
+number, sales per seller, payouts for a set of results) run as vectorized
+operations:
+
+    number      uint16  the number as an integer (0-9999)
+    is_chance   bool    True for 2-digit chances, False for 4-digit billetes
+    quantity    int32
+    invoice_id, client_id, seller_id   int32
+
+Closed raffles never change, so their books can be saved as one .npy file per
+column under RAFFLE_BOOK_DIR and memory-mapped on the next load.
+
+NumPy is an optional dependency (pip install numpy); app.py does not import
+this module.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import numpy as np
+
+import queries
+from database import get_cursor
+
+RAFFLE_BOOK_DIR = os.environ.get('RAFFLE_BOOK_DIR', os.path.join('snapshots', 'books'))
+FETCH_SIZE = 10000
+
+COLUMNS = {
+    'number': np.uint16,
+    'is_chance': np.bool_,
+    'quantity': np.int32,
+    'invoice_id': np.int32,
+    'client_id': np.int32,
+    'seller_id': np.int32,
+}
+PRICE_BILLETE = 1.0
+PRICE_CHANCE = 0.25
+
+
+def _group_sum(keys, weights):
+    """Returns (unique keys, summed weights) - a vectorized GROUP BY ... SUM."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=weights, minlength=len(unique))
+
+
+class RaffleBook:
+    def __init__(self, raffle_id, columns, mmapped=False):
+        self.raffle_id = raffle_id
+        self.mmapped = mmapped
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.number)
+
+    # --- Loading ---
+    @classmethod
+    def from_db(cls, conn, raffle_id):
+        """Loads the raffle's items with one query, fetched in batches."""
+        # Plain tuple rows; the namedtuple factory is not needed for column unpacking.
+        if isinstance(conn, sqlite3.Connection):
+            cur = conn.cursor()
+        else:
+            cur = conn.cursor(name=f'raffle_book_{raffle_id}')  # server-side cursor: rows are streamed
+        chunks = {name: [] for name in COLUMNS}
+        queries.execute(cur, 'invoice_item.book_by_raffle', (raffle_id,))
+        while True:
+            rows = cur.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            number, item_type, quantity, invoice_id, client_id, seller_id = zip(*rows)
+            chunks['number'].append(np.array(number, dtype=np.int64).astype(np.uint16))
+            chunks['is_chance'].append(np.array(item_type) == 'chance')
+            chunks['quantity'].append(np.array(quantity, dtype=np.int32))
+            chunks['invoice_id'].append(np.array(invoice_id, dtype=np.int32))
+            chunks['client_id'].append(np.array(client_id, dtype=np.int32))
+            chunks['seller_id'].append(np.array(seller_id, dtype=np.int32))
+        cur.close()
+        columns = {name: np.concatenate(parts) if parts else np.empty(0, dtype=COLUMNS[name])
+                   for name, parts in chunks.items()}
+        return cls(raffle_id, columns)
+
+    @classmethod
+    def snapshot_path(cls, raffle_id, directory=None):
+        return os.path.join(directory or RAFFLE_BOOK_DIR, f'raffle_{int(raffle_id)}')
+
+    @classmethod
+    def from_snapshot(cls, raffle_id, directory=None):
+        """Memory-maps a saved book, or returns None when there is no snapshot."""
+        path = cls.snapshot_path(raffle_id, directory)
+        if not os.path.isdir(path):
+            return None
+        columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in COLUMNS}
+        return cls(raffle_id, columns, mmapped=True)
+
+    @classmethod
+    def load(cls, conn, raffle_id, directory=None):
+        """Uses the snapshot if there is one; closed raffles are snapshotted on first load."""
+        book = cls.from_snapshot(raffle_id, directory)
+        if book is not None:
+            return book
+        book = cls.from_db(conn, raffle_id)
+        cur = get_cursor(conn)
+        raffle = queries.fetch_one(cur, 'raffle.by_id', (raffle_id,))
+        cur.close()
+        if raffle is not None and raffle.results_entered:  # the book can no longer change
+            book.save(directory)
+        return book
+
+    def save(self, directory=None):
+        """Writes one .npy per column; the directory is swapped in atomically."""
+        path = self.snapshot_path(self.raffle_id, directory)
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent, prefix='.tmp_')
+        try:
+            for name in COLUMNS:
+                np.save(os.path.join(tmp, f'{name}.npy'), getattr(self, name))
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.rename(tmp, path)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return path
+
+    # --- Derived columns ---
+    @property
+    def amount(self):
+        """Sale amount per item (quantity x unit price)."""
+        return self.quantity * np.where(self.is_chance, PRICE_CHANCE, PRICE_BILLETE)
+
+    def payouts(self, p1, p2, p3):
+        """Payout per item for the given results, using the compiled prize table."""
+        from prizes import compile_prize_table
+        billete = np.zeros(10000)
+        chance = np.zeros(100)
+        for number, prizes in compile_prize_table(p1, p2, p3).items():
+            target = chance if len(number) == 2 else billete
+            target[int(number)] = sum(amount for _, amount in prizes)
+        numbers = self.number.astype(np.intp)
+        per_unit = np.where(self.is_chance, chance[np.minimum(numbers, 99)], billete[numbers])
+        return self.quantity * per_unit
+
+    # --- Group-by helpers ---
+    def quantity_by_number(self):
+        """Units sold per number: (billetes[10000], chances[100])."""
+        billetes = np.bincount(self.number[~self.is_chance], weights=self.quantity[~self.is_chance], minlength=10000)
+        chances = np.bincount(self.number[self.is_chance], weights=self.quantity[self.is_chance], minlength=100)
+        return billetes.astype(np.int64), chances.astype(np.int64)
+
+    def by_seller(self, values=None):
+        """(seller ids, sum of values per seller); values default to sale amounts."""
+        return _group_sum(self.seller_id, self.amount if values is None else values)
+
+    def by_client(self, values=None):
+        return _group_sum(self.client_id, self.amount if values is None else values)
+
+    def by_invoice(self, values=None):
+        return _group_sum(self.invoice_id, self.amount if values is None else values)
+
+    # --- Footprint ---
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in COLUMNS)
@@ -0,0 +1,359 @@
+"""Immutable per-raffle snapshot files for closed raffles.
+
+Once results are entered, a raffle's invoices, items and winners no longer
+change, so calculate_winners_for_raffle writes them to one compact file per
+raffle (RAFFLE_SNAPSHOT_DIR/raffle_<id>.snap). The winners list, invoice
+detail, winner-payments API and commission pages read closed raffles from
+these files through mmap instead of re-running their joins, and fall back to
+SQL whenever a snapshot is missing or unreadable.
+
+File layout: an 8-byte magic, a uint32 length, a JSON header (raffle, client
+and seller names, prize type strings, per-seller totals, indexes by seller
+and client, section offsets) and then packed native-endian columns, each
+8-byte aligned:
+
+    invoices (by id)  id, client_id, seller_id, total, created (us), item_start
+    items             id, number, number length, type, quantity, price, sub_total
+    winners           ordered like winner.list (seller name, client name)
+
+The names in the header are those at the time the results were entered.
+Clients and sellers can be renamed afterwards, so the views pass the current
+names (data_access.snapshot_names) to the readers, which only fall back to
+the header when given none. Set RAFFLE_SNAPSHOT_DIR to an empty string to turn
+the feature off; scripts/snapshot_raffles.py (re)builds snapshots for
+existing closed raffles.
+"""
+import array
+import bisect
+import collections
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+
+import queries
+
+SNAPSHOT_DIR = os.environ.get('RAFFLE_SNAPSHOT_DIR', os.path.join('snapshots', 'raffles'))
+MAGIC = b'LOTOSNP1'
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# section -> [(column, array typecode)]
+SECTIONS = {
+    'invoices': [('id', 'i'), ('client_id', 'i'), ('seller_id', 'i'), ('total_amount', 'd'),
+                 ('creation_us', 'q'), ('item_start', 'i')],
+    'items': [('id', 'i'), ('number', 'H'), ('number_len', 'B'), ('is_chance', 'B'), ('quantity', 'i'),
+              ('price_per_unit', 'd'), ('sub_total', 'd')],
+    'winners': [('id', 'i'), ('invoice_id', 'i'), ('client_id', 'i'), ('seller_id', 'i'), ('number', 'H'),
+                ('number_len', 'B'), ('prize_type', 'H'), ('amount_won', 'd'), ('quantity', 'i'),
+                ('total_payout', 'd')],
+}
+
+# Same fields as the SQL rows they replace (invoice.detail, invoice_item.by_invoice, winner.list).
+InvoiceDetail = collections.namedtuple('InvoiceDetail', 'id total_amount creation_date raffle_date '
+                                       'client_name client_last_name seller_name seller_id')
+InvoiceItem = collections.namedtuple('InvoiceItem', 'id invoice_id number item_type quantity price_per_unit sub_total')
+Winner = collections.namedtuple('Winner', 'id raffle_id invoice_id client_id seller_id winning_number prize_type '
+                                'amount_won quantity total_payout client_name seller_name raffle_date')
+# Client id -> [name, last_name] and seller id -> name, as in the header.
+Names = collections.namedtuple('Names', 'clients sellers')
+
+
+def enabled():
+    return bool(SNAPSHOT_DIR)
+
+
+def snapshot_path(raffle_id):
+    return os.path.join(SNAPSHOT_DIR, f'raffle_{int(raffle_id)}.snap')
+
+
+def _to_us(value):
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    return (value - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _from_us(value):
+    return _EPOCH + datetime.timedelta(microseconds=value)
+
+
+def _format_number(value, length):
+    return str(value).zfill(length)
+
+
+# --- Writing ---
+def write_snapshot(cur, raffle_id):
+    """Writes the snapshot of a closed raffle; returns its path (None if disabled/open)."""
+    if not enabled():
+        return None
+    raffle = queries.fetch_one(cur, 'raffle.by_id', (raffle_id,))
+    if raffle is None or not raffle.results_entered:
+        return None
+    invoices = queries.fetch_all(cur, 'invoice.by_raffle', (raffle_id,))
+    items = queries.fetch_all(cur, 'invoice_item.full_by_raffle', (raffle_id,))
+    winners = queries.fetch_all(cur, 'winner.list', (raffle_id,))
+    clients = queries.fetch_all(cur, 'client.names_by_raffle', (raffle_id,))
+    sellers = queries.fetch_all(cur, 'seller.options')
+
+    columns = {section: {name: array.array(code) for name, code in cols} for section, cols in SECTIONS.items()}
+    inv_cols, item_cols, win_cols = columns['invoices'], columns['items'], columns['winners']
+    seller_totals = collections.defaultdict(lambda: [0.0, 0.0])  # seller_id -> [sales, winnings]
+
+    items_by_invoice = collections.defaultdict(list)
+    for item in items:
+        items_by_invoice[item.invoice_id].append(item)
+    for inv in invoices:
+        inv_cols['id'].append(inv.id)
+        inv_cols['client_id'].append(inv.client_id)
+        inv_cols['seller_id'].append(inv.seller_id)
+        inv_cols['total_amount'].append(float(inv.total_amount))
+        inv_cols['creation_us'].append(_to_us(inv.creation_date))
+        inv_cols['item_start'].append(len(item_cols['id']))
+        seller_totals[inv.seller_id][0] += float(inv.total_amount)
+        for item in items_by_invoice[inv.id]:
+            item_cols['id'].append(item.id)
+            item_cols['number'].append(int(item.number))
+            item_cols['number_len'].append(len(item.number))
+            item_cols['is_chance'].append(item.item_type == 'chance')
+            item_cols['quantity'].append(item.quantity)
+            item_cols['price_per_unit'].append(float(item.price_per_unit))
+            item_cols['sub_total'].append(float(item.sub_total))
+    inv_cols['item_start'].append(len(item_cols['id']))
+
+    prize_types = []
+    winners_by_seller = collections.defaultdict(list)
+    winners_by_client = collections.defaultdict(list)
+    for index, w in enumerate(winners):
+        if w.prize_type not in prize_types:
+            prize_types.append(w.prize_type)
+        win_cols['id'].append(w.id)
+        win_cols['invoice_id'].append(w.invoice_id)
+        win_cols['client_id'].append(w.client_id)
+        win_cols['seller_id'].append(w.seller_id)
+        win_cols['number'].append(int(w.winning_number))
+        win_cols['number_len'].append(len(w.winning_number))
+        win_cols['prize_type'].append(prize_types.index(w.prize_type))
+        win_cols['amount_won'].append(float(w.amount_won))
+        win_cols['quantity'].append(w.quantity)
+        win_cols['total_payout'].append(float(w.total_payout))
+        seller_totals[w.seller_id][1] += float(w.total_payout)
+        winners_by_seller[w.seller_id].append(index)
+        winners_by_client[w.client_id].append(index)
+
+    header = {
+        'byteorder': sys.byteorder,
+        'raffle': {'id': raffle.id, 'raffle_date': raffle.raffle_date.isoformat(),
+                   'first_prize': raffle.first_prize, 'second_prize': raffle.second_prize,
+                   'third_prize': raffle.third_prize},
+        'clients': {c.id: [c.name, c.last_name] for c in clients},
+        'sellers': {s.id: s.name for s in sellers},
+        'prize_types': prize_types,
+        'seller_totals': seller_totals,
+        'winners_by_seller': winners_by_seller,
+        'winners_by_client': winners_by_client,
+        'counts': {section: len(cols[SECTIONS[section][0][0]]) for section, cols in columns.items()},
+        'sections': {},
+    }
+
+    # Offsets depend on the header length, so lay the columns out relative to
+    # the start of the data area and store that start separately.
+    offset = 0
+    for section, cols in SECTIONS.items():
+        for name, code in cols:
+            header['sections'][f'{section}.{name}'] = [offset, code, len(columns[section][name])]
+            offset += _aligned(len(columns[section][name]) * array.array(code).itemsize)
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 4 + len(header_bytes))
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=SNAPSHOT_DIR, prefix='.tmp_', suffix='.snap')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+            f.write(b'\0' * (data_start - f.tell()))
+            for section, cols in SECTIONS.items():
+                for name, _ in cols:
+                    raw = columns[section][name].tobytes()
+                    f.write(raw + b'\0' * (_aligned(len(raw)) - len(raw)))
+        os.replace(tmp, snapshot_path(raffle_id))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    store.discard(raffle_id)
+    return snapshot_path(raffle_id)
+
+
+def _aligned(size, alignment=8):
+    return (size + alignment - 1) // alignment * alignment
+
+
+# --- Reading ---
+class RaffleSnapshot:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path}: not a raffle snapshot')
+        (header_len,) = struct.unpack_from('<I', self._mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._mm[start:start + header_len])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f'{path}: written on a machine with different byte order')
+        data_start = _aligned(start + header_len)
+        view = memoryview(self._mm)
+        self._columns = {}
+        for key, (offset, code, count) in header['sections'].items():
+            size = array.array(code).itemsize
+            self._columns[key] = view[data_start + offset:data_start + offset + count * size].cast(code)
+
+        raffle = header['raffle']
+        self.raffle_id = raffle['id']
+        self.raffle_date = datetime.datetime.fromisoformat(raffle['raffle_date'])
+        self.results = (raffle['first_prize'], raffle['second_prize'], raffle['third_prize'])
+        # JSON object keys are strings; convert the id-keyed maps back to ints.
+        self.names = Names({int(k): v for k, v in header['clients'].items()},
+                           {int(k): v for k, v in header['sellers'].items()})
+        self.prize_types = header['prize_types']
+        self.seller_totals = {int(k): v for k, v in header['seller_totals'].items()}
+        self.winners_by_seller = {int(k): v for k, v in header['winners_by_seller'].items()}
+        self.winners_by_client = {int(k): v for k, v in header['winners_by_client'].items()}
+        ids = self._columns['invoices.id']
+        self.invoice_range = (ids[0], ids[-1]) if len(ids) else (0, -1)
+
+    def column(self, section, name):
+        return self._columns[f'{section}.{name}']
+
+    # Winners (winner.list / winner.list_for_seller)
+    def _winner(self, index, names):
+        col = lambda name: self._columns[f'winners.{name}'][index]
+        client = names.clients.get(col('client_id'), ['', None])
+        return Winner(col('id'), self.raffle_id, col('invoice_id'), col('client_id'), col('seller_id'),
+                      _format_number(col('number'), col('number_len')), self.prize_types[col('prize_type')],
+                      col('amount_won'), col('quantity'), col('total_payout'), client[0],
+                      names.sellers.get(col('seller_id')), self.raffle_date)
+
+    def winners(self, seller_id=None, names=None):
+        if seller_id is None:
+            indexes = range(len(self._columns['winners.id']))
+        else:
+            indexes = self.winners_by_seller.get(seller_id, [])
+        return [self._winner(i, names or self.names) for i in indexes]
+
+    # Winner payments (_winner_payments)
+    def winner_payments(self, seller_id=None, names=None):
+        payout = self._columns['winners.total_payout']
+        invoice = self._columns['winners.invoice_id']
+        sellers = self._columns['winners.seller_id']
+        results = []
+        for client_id in sorted(self.winners_by_client):
+            indexes = [i for i in self.winners_by_client[client_id] if seller_id is None or sellers[i] == seller_id]
+            if not indexes:
+                continue
+            name, last_name = (names or self.names).clients.get(client_id, ['', None])
+            client_name = ((name or '') + ' ' + (last_name or '')).strip() or 'Cliente'
+            results.append({'cliente': client_name, 'pago': sum(payout[i] for i in indexes),
+                            'facturas': [{'id': inv} for inv in sorted({invoice[i] for i in indexes})]})
+        return results
+
+    # Invoices (invoice.detail + invoice_item.by_invoice)
+    def invoice(self, invoice_id, names=None):
+        """Returns (InvoiceDetail, [InvoiceItem]) or None if the invoice is not in this raffle."""
+        names = names or self.names
+        ids = self._columns['invoices.id']
+        pos = bisect.bisect_left(ids, invoice_id)
+        if pos >= len(ids) or ids[pos] != invoice_id:
+            return None
+        col = lambda name: self._columns[f'invoices.{name}'][pos]
+        name, last_name = names.clients.get(col('client_id'), ['', None])
+        detail = InvoiceDetail(invoice_id, col('total_amount'), _from_us(col('creation_us')), self.raffle_date,
+                               name, last_name, names.sellers.get(col('seller_id')), col('seller_id'))
+        items = []
+        start, end = self._columns['invoices.item_start'][pos], self._columns['invoices.item_start'][pos + 1]
+        for i in range(start, end):
+            icol = lambda name: self._columns[f'items.{name}'][i]
+            items.append(InvoiceItem(icol('id'), invoice_id, _format_number(icol('number'), icol('number_len')),
+                                     'chance' if icol('is_chance') else 'billete', icol('quantity'),
+                                     icol('price_per_unit'), icol('sub_total')))
+        return detail, items
+
+
+class SnapshotStore:
+    """Open snapshots of this process, reopened when the file on disk is replaced."""
+
+    def __init__(self):
+        self._open = {}
+        self._lock = threading.Lock()
+        self._ranges = None  # [(first invoice id, last invoice id, raffle_id)]
+        self._dir_mtime = None
+
+    def get(self, raffle_id):
+        if not enabled() or raffle_id is None:
+            return None
+        path = snapshot_path(raffle_id)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        snap = self._open.get(raffle_id)
+        if snap is None or snap.identity != (stat.st_ino, stat.st_mtime_ns):
+            try:
+                snap = RaffleSnapshot(path)
+            except (OSError, ValueError, KeyError):
+                return None
+            with self._lock:
+                self._open[raffle_id] = snap
+        return snap
+
+    def discard(self, raffle_id):
+        with self._lock:
+            self._open.pop(raffle_id, None)
+            self._ranges = None
+
+    def raffle_ids(self):
+        if not enabled() or not os.path.isdir(SNAPSHOT_DIR):
+            return set()
+        ids = set()
+        for name in os.listdir(SNAPSHOT_DIR):
+            if name.startswith('raffle_') and name.endswith('.snap'):
+                ids.add(int(name[len('raffle_'):-len('.snap')]))
+        return ids
+
+    def find_invoice(self, invoice_id, names_for=None):
+        """(InvoiceDetail, items) for an invoice of a snapshotted raffle, else None.
+
+        names_for(raffle_id), if given, returns the Names to show.
+        """
+        if not enabled():
+            return None
+        try:
+            mtime = os.stat(SNAPSHOT_DIR).st_mtime_ns
+        except OSError:
+            return None
+        if self._ranges is None or mtime != self._dir_mtime:
+            ranges = []
+            for raffle_id in self.raffle_ids():
+                snap = self.get(raffle_id)
+                if snap is not None:
+                    ranges.append((*snap.invoice_range, raffle_id))
+            self._ranges, self._dir_mtime = ranges, mtime
+        for first, last, raffle_id in self._ranges:
+            if first <= invoice_id <= last:
+                snap = self.get(raffle_id)
+                if snap is None:
+                    continue
+                found = snap.invoice(invoice_id, names_for(raffle_id) if names_for else None)
+                if found is not None:
+                    return found
+        return None
+
+
+store = SnapshotStore()
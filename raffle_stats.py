@@ -0,0 +1,133 @@
+"""Per-raffle totals for the admin dashboard, kept up to date by the writes.
+
+raffle_stats holds one row per raffle and seller: invoice count, sales,
+billete and chance units and prize payouts. Each write applies its change in
+the same transaction:
+
+* new sales (sales.insert_sales, mobile_asgi.save_sale) add their totals;
+* editing or deleting an invoice subtracts its saved totals first;
+* entering results recomputes the raffle's payouts from its winners.
+
+Commissions are not stored. They follow the seller's current
+commission_percentage, which the admin can change, so summaries() computes
+them per row, as the commission report does. Reading the dashboard is one
+query over raffles x sellers rows, however many invoices there are.
+
+scripts/check_raffle_stats.py recomputes the rows from the base tables and
+reports (or rewrites) the ones that drifted; scripts/migrate_schema.py
+fills the table for existing databases.
+"""
+import queries
+from database import lock_writers, write
+
+# Stored columns, in the order of raffle_stats.put.
+COLUMNS = ('invoice_count', 'sales_total', 'billete_units', 'chance_units', 'payouts_total')
+# Sums of 0.25 multiples are exact; anything beyond this is real drift.
+TOLERANCE = 0.005
+
+
+def sale_delta(raffle_id, seller_id, total_amount, items, sign=1):
+    """(raffle_id, seller_id, invoices, sales, billete units, chance units) of one invoice."""
+    billetes = sum(item['quantity'] for item in items if item['item_type'] == 'billete')
+    chances = sum(item['quantity'] for item in items if item['item_type'] == 'chance')
+    return (int(raffle_id), int(seller_id), sign, sign * total_amount, sign * billetes, sign * chances)
+
+
+def add(cur, deltas):
+    """Applies sale_delta() tuples, one statement per raffle and seller."""
+    totals = {}
+    for raffle_id, seller_id, *delta in deltas:
+        current = totals.get((raffle_id, seller_id), (0, 0, 0, 0))
+        totals[(raffle_id, seller_id)] = tuple(a + b for a, b in zip(current, delta))
+    for (raffle_id, seller_id), delta in sorted(totals.items()):
+        queries.execute(cur, 'raffle_stats.add', (raffle_id, seller_id, *delta))
+
+
+def remove_invoice(cur, invoice_id):
+    """Subtracts a saved invoice; call in the write that edits or deletes it, before the change."""
+    row = queries.fetch_one(cur, 'raffle_stats.invoice_totals', (invoice_id,))
+    if row is not None:
+        add(cur, [(row.raffle_id, row.seller_id, -1, -row.total_amount, -row.billete_units, -row.chance_units)])
+
+
+def refresh_payouts(cur, raffle_id):
+    """Sets the raffle's payouts from its winners; call in the write that stores them."""
+    queries.execute(cur, 'raffle_stats.reset_payouts', (raffle_id,))
+    for row in queries.fetch_all(cur, 'raffle_stats.actual_winners_for_raffle', (raffle_id,)):
+        queries.execute(cur, 'raffle_stats.set_payouts', (raffle_id, row.seller_id, row.payouts_total))
+
+
+def summaries(cur):
+    """Totals per raffle, newest first; payouts and net only once results are entered."""
+    results = []
+    for row in queries.fetch_all(cur, 'raffle_stats.summaries'):
+        summary = row._asdict()
+        summary['results_entered'] = bool(row.results_entered)
+        if summary['results_entered']:
+            summary['net'] = row.sales_total - row.commissions - row.payouts_total
+        else:
+            summary['payouts_total'] = summary['net'] = None
+        results.append(summary)
+    return results
+
+
+# --- Consistency check ---
+def stored(cur, raffle_id=None):
+    """{(raffle_id, seller_id): [stored COLUMNS]} (one raffle, or all)."""
+    rows = (queries.fetch_all(cur, 'raffle_stats.for_raffle', (raffle_id,)) if raffle_id is not None
+            else queries.fetch_all(cur, 'raffle_stats.all'))
+    return {(row.raffle_id, row.seller_id): [getattr(row, column) for column in COLUMNS] for row in rows}
+
+
+def actual(cur, raffle_id=None):
+    """The same totals recomputed from invoices, items and winners (one raffle, or all)."""
+    suffix, params = ('_for_raffle', (raffle_id,)) if raffle_id is not None else ('', ())
+    totals = {}
+    for part, columns in (('invoices', ('invoice_count', 'sales_total')),
+                          ('items', ('billete_units', 'chance_units')),
+                          ('winners', ('payouts_total',))):
+        for row in queries.fetch_all(cur, f'raffle_stats.actual_{part}{suffix}', params):
+            values = totals.setdefault((row.raffle_id, row.seller_id), [0] * len(COLUMNS))
+            for column in columns:
+                values[COLUMNS.index(column)] = getattr(row, column) or 0
+    return totals
+
+
+def drift(stored_rows, actual_rows):
+    """[(raffle_id, seller_id, column, stored, actual)] for every value that differs."""
+    zeros = [0] * len(COLUMNS)
+    found = []
+    for key in sorted(set(stored_rows) | set(actual_rows)):
+        for column, have, want in zip(COLUMNS, stored_rows.get(key, zeros), actual_rows.get(key, zeros)):
+            if abs(have - want) > TOLERANCE:
+                found.append((*key, column, have, want))
+    return found
+
+
+def rewrite(cur, actual_rows, keys):
+    """Replaces the given rows with their recomputed values (rows with nothing left are deleted)."""
+    for key in keys:
+        values = actual_rows.get(key)
+        if values is None or not any(values):
+            queries.execute(cur, 'raffle_stats.delete', key)
+        else:
+            queries.execute(cur, 'raffle_stats.put', (*key, *values))
+
+
+def check_raffle(raffle_id, fix=False):
+    """drift() of one raffle, read while writes to raffle_stats wait.
+
+    Every write that changes the totals also writes raffle_stats, so with
+    database.lock_writers taken first no sale, edit or result lands between
+    the two reads. With fix, the raffle's rows are rewritten from the base
+    tables in that same transaction. Returns the drift found (before fixing).
+    """
+    def job(cur):
+        lock_writers(cur, 'raffle_stats')
+        actual_rows = actual(cur, raffle_id)
+        stored_rows = stored(cur, raffle_id)
+        found = drift(stored_rows, actual_rows)
+        if found and fix:
+            rewrite(cur, actual_rows, set(stored_rows) | set(actual_rows))
+        return found
+    return write(job, raffle_id)
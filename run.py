@@ -6,4 +6,5 @@ from app import app
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print(f"Servidor de producción iniciado en http://0.0.0.0:{port}")
-    serve(app, host='0.0.0.0', port=port)
+    # One process; gunicorn.conf.py is the multi-process profile.
+    serve(app, host='0.0.0.0', port=port, threads=int(os.environ.get('WAITRESS_THREADS', 4)))
@@ -0,0 +1,149 @@
+"""Saving new sales, alone or many per statement.
+
+new_sale hands a SaleJob to database.write(). On the SQLite writer thread
+(see sqlite_writer.py) the sales that arrive within the same few
+milliseconds are combined: one query checks all their raffles, one
+multi-row INSERT writes all the invoices and another writes all their
+items. Each request still gets its own invoice id, or None when its raffle
+is closed. If the combined statements fail, the writer retries the sales one
+by one, so only the faulty sale's request sees the error.
+
+Sales queued by the offline app carry a client_ref, unique per seller. A
+sale whose client_ref is already saved is not inserted again; it gets the
+existing invoice id, so an upload can be retried after a lost response.
+save() also covers a retry that races the original upload.
+"""
+import queries
+import raffle_stats
+import sync
+from database import is_unique_violation, write
+
+INVOICE_COLUMNS = ('raffle_id', 'client_id', 'seller_id', 'total_amount', 'change_seq', 'client_ref')
+ITEM_COLUMNS = ('invoice_id', 'raffle_id', 'seller_id', 'client_id', 'number', 'item_type', 'quantity',
+                'price_per_unit', 'sub_total')
+# Price per unit: 4-digit billetes and 2-digit chances.
+PRICES = {'billete': 1.0, 'chance': 0.25}
+
+
+def item_from(number, quantity):
+    """Builds a sale item; raises ValueError for a bad number or quantity."""
+    number = str(number)
+    quantity = int(quantity)
+    if not (number.isdigit() and len(number) in (2, 4) and quantity > 0):
+        raise ValueError(f'invalid item {number} x {quantity}')
+    item_type = 'billete' if len(number) == 4 else 'chance'
+    price_per_unit = PRICES[item_type]
+    return {'number': number, 'quantity': quantity, 'item_type': item_type,
+            'price_per_unit': price_per_unit, 'sub_total': quantity * price_per_unit}
+
+
+def sale_from_json(body, seller_id, now):
+    """SaleJob from a mobile API body {sorteo_id, client_id, items: [{number, quantity}], client_ref?}.
+
+    Raises ValueError with a message for the client when the body is malformed.
+    """
+    try:
+        raffle_id = int(body['sorteo_id'])
+        client_id = int(body['client_id'])
+        items = [item_from(item['number'], item['quantity']) for item in body['items']]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('sorteo_id, client_id and items [{number, quantity}] are required')
+    if not items:
+        raise ValueError('at least one item is required')
+    client_ref = body.get('client_ref')
+    if client_ref is not None and not (isinstance(client_ref, str) and 0 < len(client_ref) <= 64):
+        raise ValueError('client_ref must be a string of up to 64 characters')
+    return SaleJob(raffle_id, client_id, seller_id, items, now, client_ref)
+
+
+class SaleJob:
+    """One validated sale; items are dicts as built by item_from (or new_sale)."""
+
+    def __init__(self, raffle_id, client_id, seller_id, items, now, client_ref=None):
+        self.raffle_id = raffle_id
+        self.client_id = client_id
+        self.seller_id = seller_id
+        self.items = items
+        self.now = now
+        self.client_ref = client_ref
+        self.total_amount = sum(item['sub_total'] for item in items)
+
+    def __call__(self, cur):
+        return insert_sales(cur, [self])[0]
+
+    @staticmethod
+    def combine(cur, jobs):
+        return insert_sales(cur, jobs)
+
+
+def _open_raffles(cur, sales):
+    """ids (as strings, like the form values) of the raffles still open for each sale's time."""
+    raffle_ids = sorted({str(sale.raffle_id) for sale in sales})
+    queries.execute_sql(cur, f"SELECT id, raffle_date FROM raffles WHERE id IN ({', '.join(['%s'] * len(raffle_ids))}) "
+                             "AND results_entered = false", raffle_ids)
+    return {str(row.id): row.raffle_date for row in cur.fetchall()}
+
+
+def _saved_refs(cur, sales):
+    """(seller_id, client_ref) -> invoice id of the sales already saved."""
+    refs = sorted({sale.client_ref for sale in sales if sale.client_ref is not None})
+    if not refs:
+        return {}
+    queries.execute_sql(cur, f"SELECT id, seller_id, client_ref FROM invoices "
+                             f"WHERE client_ref IN ({', '.join(['%s'] * len(refs))})", refs)
+    return {(row.seller_id, row.client_ref): row.id for row in cur.fetchall()}
+
+
+def insert_sales(cur, sales):
+    """Inserts the sales whose raffle is open; returns their invoice ids (None for the rest)."""
+    by_ref = _saved_refs(cur, sales)
+    open_raffles = _open_raffles(cur, sales)
+    valid = []
+    pending_refs = set()
+    for sale in sales:
+        ref = (sale.seller_id, sale.client_ref)
+        if sale.client_ref is not None and (ref in by_ref or ref in pending_refs):
+            continue
+        # Always re-checked in the transaction: the cached raffle list may be stale.
+        if str(sale.raffle_id) in open_raffles and open_raffles[str(sale.raffle_id)] > sale.now:
+            valid.append(sale)
+            pending_refs.add(ref)
+    if not valid:
+        return [by_ref.get((sale.seller_id, sale.client_ref)) for sale in sales]
+
+    seq = sync.next_seq(cur)
+    rows = queries.insert_many(cur, 'invoices', INVOICE_COLUMNS,
+                               [(s.raffle_id, s.client_id, s.seller_id, s.total_amount, seq, s.client_ref)
+                                for s in valid],
+                               returning='id')
+    # RETURNING does not promise VALUES order, but ids are handed out in
+    # insertion order, so the sorted ids line up with the rows.
+    invoice_ids = {id(sale): invoice_id for sale, invoice_id in zip(valid, sorted(row.id for row in rows))}
+    queries.insert_many(cur, 'invoice_items', ITEM_COLUMNS, [
+        (invoice_ids[id(sale)], sale.raffle_id, sale.seller_id, sale.client_id, item['number'], item['item_type'],
+         item['quantity'], item['price_per_unit'], item['sub_total'])
+        for sale in valid for item in sale.items
+    ])
+    raffle_stats.add(cur, [raffle_stats.sale_delta(sale.raffle_id, sale.seller_id, sale.total_amount, sale.items)
+                           for sale in valid])
+    for sale in valid:
+        if sale.client_ref is not None:
+            by_ref[(sale.seller_id, sale.client_ref)] = invoice_ids[id(sale)]
+    return [invoice_ids[id(sale)] if id(sale) in invoice_ids else by_ref.get((sale.seller_id, sale.client_ref))
+            for sale in sales]
+
+
+def save(job):
+    """database.write(job) for a SaleJob or an insert_sales job, from a mobile upload.
+
+    Two uploads of the same sale (a retry sent while the first one is still
+    saving) can both miss each other's client_ref; the unique index then
+    rejects the second insert. By then the first is committed, so the job
+    runs once more, finds it and returns its invoice id.
+    """
+    try:
+        return write(job)
+    except Exception as exc:
+        if not is_unique_violation(exc):
+            raise
+    return write(job)
@@ -1,3 +1,6 @@
+DROP TABLE IF EXISTS raffle_stats;
+DROP TABLE IF EXISTS sync_deletions;
+DROP TABLE IF EXISTS resource_versions;
 DROP TABLE IF EXISTS winners;
 DROP TABLE IF EXISTS invoice_items;
 DROP TABLE IF EXISTS invoices;
@@ -25,8 +28,10 @@ CREATE TABLE clients (
     address TEXT,
     seller_id INTEGER NOT NULL,
     join_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    change_seq INTEGER NOT NULL DEFAULT 0, -- see sync.py
     FOREIGN KEY (seller_id) REFERENCES users (id)
 );
+CREATE INDEX clients_seller_change_idx ON clients (seller_id, change_seq);
 
 CREATE TABLE raffles (
     id SERIAL PRIMARY KEY,
@@ -34,8 +39,10 @@ CREATE TABLE raffles (
     first_prize TEXT,
     second_prize TEXT,
     third_prize TEXT,
-    results_entered BOOLEAN NOT NULL DEFAULT false
+    results_entered BOOLEAN NOT NULL DEFAULT false,
+    change_seq INTEGER NOT NULL DEFAULT 0
 );
+CREATE INDEX raffles_change_idx ON raffles (change_seq);
 
 CREATE TABLE invoices (
     id SERIAL PRIMARY KEY,
@@ -44,24 +51,62 @@ CREATE TABLE invoices (
     seller_id INTEGER NOT NULL,
     creation_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     total_amount REAL NOT NULL,
+    change_seq INTEGER NOT NULL DEFAULT 0,
+    -- Id the offline app gives a queued sale, so a retried upload is not saved twice.
+    client_ref TEXT,
     FOREIGN KEY (raffle_id) REFERENCES raffles (id),
     FOREIGN KEY (client_id) REFERENCES clients (id),
     FOREIGN KEY (seller_id) REFERENCES users (id)
 );
+CREATE INDEX invoices_seller_change_idx ON invoices (seller_id, change_seq);
+-- Refs are unique per seller: each app numbers its own queue.
+CREATE UNIQUE INDEX invoices_seller_client_ref_idx ON invoices (seller_id, client_ref) WHERE client_ref IS NOT NULL;
 
+-- invoice_items and winners are partitioned by raffle: queries filtered on
+-- raffle_id only touch that raffle's partition, and closed raffles stay in
+-- partitions that are never written again. database.create_raffle_partitions
+-- adds the partitions of each new raffle; rows of raffles without one land in
+-- the DEFAULT partition (scripts/migrate_schema.py moves them out).
 CREATE TABLE invoice_items (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     invoice_id INTEGER NOT NULL,
+    -- Copies of the invoice's columns, so winner calculation and per-number
+    -- reports read items of one raffle without joining invoices.
+    raffle_id INTEGER NOT NULL, -- also the partition key
+    seller_id INTEGER NOT NULL,
+    client_id INTEGER NOT NULL,
     number TEXT NOT NULL, -- 2 or 4 digits
     item_type TEXT NOT NULL, -- 'billete' or 'chance'
     quantity INTEGER NOT NULL,
     price_per_unit REAL NOT NULL,
     sub_total REAL NOT NULL,
-    FOREIGN KEY (invoice_id) REFERENCES invoices (id)
-);
+    -- Numeric keys of the number (NULL for chances), one per prize rule, so
+    -- every rule is an index lookup (see invoice_item.prize_candidates).
+    number_value INTEGER GENERATED ALWAYS AS (CAST(number AS INTEGER)) STORED,
+    prefix3 INTEGER GENERATED ALWAYS AS (CASE WHEN length(number) = 4 THEN CAST(substr(number, 1, 3) AS INTEGER) END) STORED,
+    suffix3 INTEGER GENERATED ALWAYS AS (CASE WHEN length(number) = 4 THEN CAST(substr(number, 2, 3) AS INTEGER) END) STORED,
+    prefix2 INTEGER GENERATED ALWAYS AS (CASE WHEN length(number) = 4 THEN CAST(substr(number, 1, 2) AS INTEGER) END) STORED,
+    suffix2 INTEGER GENERATED ALWAYS AS (CASE WHEN length(number) = 4 THEN CAST(substr(number, 3, 2) AS INTEGER) END) STORED,
+    last1 INTEGER GENERATED ALWAYS AS (CASE WHEN length(number) = 4 THEN CAST(substr(number, 4, 1) AS INTEGER) END) STORED,
+    PRIMARY KEY (id, raffle_id),
+    FOREIGN KEY (invoice_id) REFERENCES invoices (id),
+    FOREIGN KEY (raffle_id) REFERENCES raffles (id),
+    FOREIGN KEY (seller_id) REFERENCES users (id),
+    FOREIGN KEY (client_id) REFERENCES clients (id)
+) PARTITION BY LIST (raffle_id);
+CREATE TABLE invoice_items_default PARTITION OF invoice_items DEFAULT;
+CREATE INDEX invoice_items_invoice_idx ON invoice_items (invoice_id);
+-- Covers invoice_item.by_raffle / book_by_raffle with index-only scans.
+CREATE INDEX invoice_items_raffle_number_idx
+    ON invoice_items (raffle_id, number) INCLUDE (item_type, quantity, invoice_id, client_id, seller_id, id);
+CREATE INDEX invoice_items_prefix3_idx ON invoice_items (raffle_id, prefix3);
+CREATE INDEX invoice_items_suffix3_idx ON invoice_items (raffle_id, suffix3);
+CREATE INDEX invoice_items_prefix2_idx ON invoice_items (raffle_id, prefix2);
+CREATE INDEX invoice_items_suffix2_idx ON invoice_items (raffle_id, suffix2);
+CREATE INDEX invoice_items_last1_idx ON invoice_items (raffle_id, last1);
 
 CREATE TABLE winners (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     raffle_id INTEGER NOT NULL,
     invoice_id INTEGER NOT NULL,
     client_id INTEGER NOT NULL,
@@ -71,8 +116,39 @@ CREATE TABLE winners (
     amount_won REAL NOT NULL,
     quantity INTEGER NOT NULL,
     total_payout REAL NOT NULL,
+    PRIMARY KEY (id, raffle_id),
     FOREIGN KEY (raffle_id) REFERENCES raffles (id),
     FOREIGN KEY (invoice_id) REFERENCES invoices (id),
     FOREIGN KEY (client_id) REFERENCES clients (id),
     FOREIGN KEY (seller_id) REFERENCES users (id)
-);
\ No newline at end of file
+) PARTITION BY LIST (raffle_id);
+CREATE TABLE winners_default PARTITION OF winners DEFAULT;
+
+-- Change counters behind the ETags of the cacheable JSON endpoints (see versions.py)
+CREATE TABLE resource_versions (
+    resource TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+-- Rows removed from a seller's synced data, for /api/mobile/sync (see sync.py)
+CREATE TABLE sync_deletions (
+    id SERIAL PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    table_name TEXT NOT NULL, -- 'clients' or 'invoices'
+    row_id INTEGER NOT NULL,
+    seller_id INTEGER NOT NULL
+);
+CREATE INDEX sync_deletions_seller_seq_idx ON sync_deletions (seller_id, seq);
+
+-- Per raffle and seller totals behind the admin dashboard, kept up to date by
+-- the writes (see raffle_stats.py)
+CREATE TABLE raffle_stats (
+    raffle_id INTEGER NOT NULL,
+    seller_id INTEGER NOT NULL,
+    invoice_count INTEGER NOT NULL DEFAULT 0,
+    sales_total REAL NOT NULL DEFAULT 0,
+    billete_units INTEGER NOT NULL DEFAULT 0,
+    chance_units INTEGER NOT NULL DEFAULT 0,
+    payouts_total REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (raffle_id, seller_id)
+);
@@ -0,0 +1,160 @@
+"""Moves closed raffles out of the live tables.
+
+On SQLite every closed raffle gets its own archive database
+(SQLITE_ARCHIVE_DIR/raffle_<id>.db) holding its invoices, invoice_items and
+winners; database.get_db_connection(raffle_id) opens it with the main file
+attached, so the app reads archived raffles transparently. On PostgreSQL
+invoice_items and winners are partitioned by raffle_id instead, and every
+raffle's rows already sit in their own partition (scripts/migrate_schema.py
+converts existing tables), so there is nothing to move.
+
+Run from the repository root (after scripts/migrate_schema.py):
+
+    python scripts/archive_raffles.py archive          # every closed raffle not archived yet
+    python scripts/archive_raffles.py archive 12 13 --vacuum
+    python scripts/archive_raffles.py restore 12       # move a raffle back into the main file
+    python scripts/archive_raffles.py list
+
+Archiving writes the raffle's snapshot first (see raffle_snapshots.py): the
+cross-raffle reports read archived raffles from their snapshots, or sum
+their archive files when snapshots are off (data_access.closed_raffle_totals).
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _columns(conn, table, schema='main'):
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+def _copy_raffle(conn, raffle_id, source, target):
+    """INSERT ... SELECT of one raffle's rows between attached schemas; returns the row counts."""
+    from database import ARCHIVED_TABLES
+    counts = {}
+    for table in ARCHIVED_TABLES:
+        cols = ', '.join(_columns(conn, table, target))
+        counts[table] = conn.execute(f'INSERT INTO {target}.{table} ({cols}) SELECT {cols} FROM {source}.{table} WHERE raffle_id = ?',
+                                     (raffle_id,)).rowcount
+    return counts
+
+
+def _delete_raffle(conn, raffle_id, schema):
+    from database import ARCHIVED_TABLES
+    for table in reversed(ARCHIVED_TABLES):
+        conn.execute(f'DELETE FROM {schema}.{table} WHERE raffle_id = ?', (raffle_id,))
+
+
+def archive_raffle(conn, raffle_id):
+    import database
+    import queries
+    import raffle_snapshots
+    from database import get_cursor
+
+    path = database.archive_path(raffle_id)
+    if os.path.exists(path):
+        # A previous run may have stopped between writing the archive and
+        # deleting the rows from the main file.
+        _delete_raffle(conn, raffle_id, 'main')
+        conn.commit()
+        return f'raffle {raffle_id}: already archived'
+
+    cur = get_cursor(conn)
+    raffle = queries.fetch_one(cur, 'raffle.by_id', (raffle_id,))
+    if raffle is None or not raffle.results_entered:
+        cur.close()
+        return f'raffle {raffle_id}: skipped (not found or results not entered)'
+    raffle_snapshots.write_snapshot(cur, raffle_id)
+    cur.close()
+
+    # Same tables and indexes as the main file, created from its own DDL.
+    ddl = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name IN ({}) AND sql IS NOT NULL ORDER BY type DESC".format(
+            ', '.join('?' * len(database.ARCHIVED_TABLES))), database.ARCHIVED_TABLES)]
+    os.makedirs(database.ARCHIVE_DIR, exist_ok=True)
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    archive = sqlite3.connect(tmp)
+    archive.executescript(';\n'.join(ddl) + ';')
+    archive.close()
+
+    conn.execute('ATTACH DATABASE ? AS archive', (tmp,))
+    try:
+        counts = _copy_raffle(conn, raffle_id, 'main', 'archive')
+        conn.commit()
+    finally:
+        conn.execute('DETACH DATABASE archive')
+    # From here on connections for this raffle open the archive.
+    os.replace(tmp, path)
+    _delete_raffle(conn, raffle_id, 'main')
+    conn.commit()
+    summary = ', '.join(f'{count} {table}' for table, count in counts.items())
+    return f'raffle {raffle_id}: archived {summary} ({os.path.getsize(path) / 1024:.1f} KiB)'
+
+
+def restore_raffle(conn, raffle_id):
+    import database
+
+    path = database.archive_path(raffle_id)
+    if not os.path.exists(path):
+        return f'raffle {raffle_id}: not archived'
+    conn.execute('ATTACH DATABASE ? AS archive', (path,))
+    try:
+        _delete_raffle(conn, raffle_id, 'main')  # leftovers of an interrupted archive run
+        counts = _copy_raffle(conn, raffle_id, 'archive', 'main')
+        conn.commit()
+    finally:
+        conn.execute('DETACH DATABASE archive')
+    # With SQLITE_TUNING the archive may have WAL side files; its rows were
+    # read through them, so they go too.
+    for name in (path, path + '-wal', path + '-shm'):
+        if os.path.exists(name):
+            os.remove(name)
+    summary = ', '.join(f'{count} {table}' for table, count in counts.items())
+    return f'raffle {raffle_id}: restored {summary}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['archive', 'restore', 'list'])
+    parser.add_argument('raffle_ids', type=int, nargs='*')
+    parser.add_argument('--db', help='SQLite file (defaults to SQLITE_PATH / lottery.db)')
+    parser.add_argument('--vacuum', action='store_true', help='reclaim the space of archived rows (SQLite)')
+    args = parser.parse_args()
+    if args.db:
+        os.environ['SQLITE_PATH'] = os.path.abspath(args.db)
+
+    import database
+    import queries
+    from database import get_db_connection, get_cursor
+
+    if 'DATABASE_URL' in os.environ:
+        raise SystemExit('On PostgreSQL closed raffles stay in their own partitions; see scripts/migrate_schema.py.')
+    conn = get_db_connection()
+    if args.command == 'list':
+        for raffle_id in database.archived_raffle_ids():
+            print(f'raffle {raffle_id}: {os.path.getsize(database.archive_path(raffle_id)) / 1024:.1f} KiB')
+    elif args.command == 'archive':
+        if 'raffle_id' not in _columns(conn, 'invoice_items'):
+            raise SystemExit('Run scripts/migrate_schema.py first.')
+        cur = get_cursor(conn)
+        raffle_ids = args.raffle_ids or [r.id for r in queries.fetch_all(cur, 'raffle.with_results')]
+        cur.close()
+        for raffle_id in raffle_ids:
+            print(archive_raffle(conn, raffle_id))
+        if args.vacuum:
+            conn.execute('VACUUM')
+    else:
+        if not args.raffle_ids:
+            raise SystemExit('restore needs the raffle ids to bring back.')
+        for raffle_id in args.raffle_ids:
+            print(restore_raffle(conn, raffle_id))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
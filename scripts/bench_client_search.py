@@ -0,0 +1,53 @@
+"""Times prefix lookups in client_index.ClientIndex on a synthetic client list.
+
+Run from the repository root:  python scripts/bench_client_search.py [num_clients]
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_index import ClientIndex
+
+NAMES = ['José', 'María', 'Luis', 'Ana', 'Carlos', 'Lucía', 'Pedro', 'Sofía', 'Jorge', 'Elena']
+LAST_NAMES = ['Pérez', 'González', 'Rodríguez', 'Castillo', 'Herrera', 'Vargas', 'Morales', 'Guerra']
+
+
+def make_clients(n):
+    rng = random.Random(42)
+    return [{
+        'id': i,
+        'name': rng.choice(NAMES) + ' ' + ''.join(rng.choices(string.ascii_lowercase, k=4)),
+        'last_name': rng.choice(LAST_NAMES),
+        'phone': f'6{rng.randrange(10**7):07d}',
+        'address': '', 'seller_id': 1, 'seller_name': 'Vendedor',
+    } for i in range(1, n + 1)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    clients = make_clients(n)
+    start = time.perf_counter()
+    index = ClientIndex(clients)
+    print(f'build: {n} clients in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    queries = ['jo', 'mar', 'gonz', 'pérez', 'ana c', '61', '6123', 'zzz']
+    rounds = 2000
+    for q in queries:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            found = index.search(q, 10)
+        per_call = (time.perf_counter() - start) / rounds * 1e6
+        print(f'search {q!r:<9} {len(found):3d} hits  {per_call:7.1f} us')
+
+    start = time.perf_counter()
+    for i in range(200):
+        index.upsert(dict(clients[i], last_name='Nuevo'))
+    print(f'upsert: {(time.perf_counter() - start) / 200 * 1e6:.1f} us per client')
+
+
+if __name__ == '__main__':
+    main()
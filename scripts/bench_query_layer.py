@@ -0,0 +1,78 @@
+"""Compares per-request query overhead of the old ad hoc pattern against queries.py.
+
+Run from the repository root:  python scripts/bench_query_layer.py
+Uses an in-memory SQLite database so only the Python-side overhead is measured.
+"""
+import os
+import sqlite3
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queries
+from database import get_cursor
+
+ROUNDS = int(os.environ.get('BENCH_ROUNDS', 20000))
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password TEXT, role TEXT, name TEXT)')
+    conn.executemany('INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)',
+                     [(f'user{i}', 'hash', 'seller', f'User {i}') for i in range(1000)])
+    conn.commit()
+    return conn
+
+
+def old_pattern(conn):
+    # What mobile_login used to do: try '%s', fail, retry with '?', then probe each field.
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT id, username, password, role, name FROM users WHERE username = %s', ('user500',))
+    except Exception:
+        cur.execute('SELECT id, username, password, role, name FROM users WHERE username = ?', ('user500',))
+    user = cur.fetchone()
+    try:
+        stored = user['password']
+        role = user['role']
+        user_id = user['id']
+        name = user['name']
+    except Exception:
+        stored, role, user_id, name = user[2], user[3], user[0], user[4]
+    cur.close()
+    return stored, role, user_id, name
+
+
+def placeholder_pattern(conn):
+    # The `ph = '?' if isinstance(...)` variant used by the other handlers.
+    cur = conn.cursor()
+    ph = '?' if isinstance(conn, sqlite3.Connection) else '%s'
+    cur.execute(f'SELECT id, username, password, role, name FROM users WHERE username = {ph}', ('user500',))
+    user = cur.fetchone()
+    result = user['password'], user['role'], user['id'], user['name']
+    cur.close()
+    return result
+
+
+def query_layer(conn):
+    cur = get_cursor(conn)
+    user = queries.fetch_one(cur, 'user.by_username', ('user500',))
+    cur.close()
+    return user.password, user.role, user.id, user.name
+
+
+def main():
+    conn = make_db()
+    for label, fn in [('try/except retry', old_pattern),
+                      ('isinstance placeholder', placeholder_pattern),
+                      ('queries.py', query_layer)]:
+        fn(conn)
+        seconds = min(timeit.repeat(lambda: fn(conn), number=ROUNDS, repeat=3))
+        print(f'{label:<24} {seconds / ROUNDS * 1e6:8.2f} us/request')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Cold start benchmark: import time and time to first request per entry point.
+
+Each run is a fresh interpreter that loads an entry point the way the
+hosting does (wsgi.py for Render and waitress, appfordomain/passenger_wsgi.py
+for Passenger), from the entry point's directory, and then sends it one
+request through the WSGI interface. It reports, as medians over --runs:
+
+* import: loading the entry point (the app and everything it imports);
+* first request: the first response, with its template compilation and
+  database connection;
+* ready: import + first request, i.e. time to first request once the
+  interpreter is up;
+* process: the whole child process, interpreter startup included;
+
+and the heavy optional modules that were loaded by then (ReportLab, psycopg2,
+PyJWT), which should only appear once a PDF, PostgreSQL or a bearer token
+needs them. Run from the repository root:
+
+    python scripts/bench_startup.py --db bench.db
+    python -X importtime wsgi.py 2> imports.txt    # per-module detail
+"""
+import argparse
+import json
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# name -> (entry point file, WSGI callable in it)
+ENTRY_POINTS = {
+    'wsgi': ('wsgi.py', 'app'),
+    'passenger': (os.path.join('appfordomain', 'passenger_wsgi.py'), 'application'),
+}
+HEAVY_MODULES = ('reportlab', 'psycopg2', 'jwt')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='bench.db', help='SQLite file for the main app (ignored with DATABASE_URL)')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/login', help='path of the first request')
+    parser.add_argument('--entry', default=','.join(ENTRY_POINTS), help='comma-separated entry points')
+    parser.add_argument('--child', nargs=2, metavar=('ENTRY', 'PATH'), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def child(entry, path):
+    """Runs inside the fresh interpreter; prints the timings as JSON."""
+    filename, attr = ENTRY_POINTS[entry]
+    start = time.perf_counter()
+    application = runpy.run_path(os.path.join(ROOT, filename))[attr]
+    imported = time.perf_counter()
+
+    from werkzeug.test import EnvironBuilder
+    statuses = []
+    body = application(EnvironBuilder(path=path).get_environ(), lambda status, headers, exc=None: statuses.append(status))
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    answered = time.perf_counter()
+    print(json.dumps({'import': imported - start, 'request': answered - imported, 'status': statuses[0],
+                      'loaded': [name for name in HEAVY_MODULES if name in sys.modules]}))
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        return child(*args.child)
+
+    env = dict(os.environ)
+    if 'DATABASE_URL' not in env:
+        env['SQLITE_PATH'] = os.path.abspath(args.db)
+        if not os.path.exists(env['SQLITE_PATH']):
+            raise SystemExit(f'{args.db} not found; run scripts/generate_data.py --db {args.db} first.')
+
+    print(f'First request: GET {args.path}; medians of {args.runs} fresh processes, in ms.')
+    print(f"{'entry':<10} {'import':>8} {'first req':>10} {'ready':>8} {'process':>8}  status  heavy modules loaded")
+    for entry in args.entry.split(','):
+        cwd = os.path.dirname(os.path.join(ROOT, ENTRY_POINTS[entry][0]))
+        results, process = [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', entry, args.path],
+                                 cwd=cwd, env=env, capture_output=True, text=True)
+            process.append(time.perf_counter() - start)
+            if out.returncode != 0:
+                raise SystemExit(f'{entry} failed:\n{out.stderr}')
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+        def median_ms(values):
+            return statistics.median(values) * 1000
+
+        imports = [r['import'] for r in results]
+        requests = [r['request'] for r in results]
+        ready = [r['import'] + r['request'] for r in results]
+        print(f"{entry:<10} {median_ms(imports):>8.1f} {median_ms(requests):>10.1f} {median_ms(ready):>8.1f} "
+              f"{median_ms(process):>8.1f}  {results[-1]['status'].split()[0]:>6}  "
+              f"{', '.join(results[-1]['loaded']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
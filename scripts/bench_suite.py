@@ -0,0 +1,261 @@
+"""Benchmark suite for the hot paths, with JSON baselines.
+
+Runs the Flask app in-process (test clients, optional threads) against a
+database produced by scripts/generate_data.py and reports throughput and
+latency percentiles per scenario. Run from the repository root:
+
+    python scripts/generate_data.py --db bench.db
+    python scripts/bench_suite.py --db bench.db --save baselines/main.json
+    # ... change something ...
+    python scripts/bench_suite.py --db bench.db --compare baselines/main.json
+
+--compare flags any scenario whose throughput dropped or whose p95 grew by
+more than --tolerance (default 20%). Use the same dataset arguments for both
+runs. The new_sale scenario writes invoices to the open raffle, so regenerate
+the data when comparing long series of runs.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SELLER_PASSWORD = 'benchpass'
+ADMIN_PASSWORD = 'adminpass'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='bench.db', help='SQLite file from generate_data.py (ignored with DATABASE_URL)')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--only', help='comma-separated scenario names')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.20)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Fixture:
+    """Ids shared by the scenarios, picked from the generated dataset."""
+
+    def __init__(self, appmod):
+        import data_access
+        import queries
+        from database import get_db_connection, get_cursor
+
+        self.app = appmod
+        self.data_access = data_access
+        conn = get_db_connection()
+        cur = get_cursor(conn)
+        cur.execute("SELECT id, username FROM users WHERE role = 'seller' ORDER BY id")
+        sellers = cur.fetchall()
+        pending = queries.fetch_all(cur, 'raffle.pending')
+        closed = queries.fetch_all(cur, 'raffle.with_results')
+        if not sellers or not pending or not closed:
+            raise SystemExit('Run scripts/generate_data.py first (needs sellers, an open raffle and closed raffles).')
+        # The busiest seller: realistic worst case for list/report pages.
+        cur.execute('SELECT seller_id, COUNT(*) AS n FROM invoices GROUP BY seller_id ORDER BY n DESC LIMIT 1')
+        self.seller_id = cur.fetchone().seller_id
+        self.seller_username = next(s.username for s in sellers if s.id == self.seller_id)
+        self.client_ids = [row.id for row in queries.fetch_all(cur, 'client.options_for_seller', (self.seller_id,))]
+        queries.execute_sql(cur, 'SELECT id FROM invoices WHERE seller_id = %s ORDER BY id DESC LIMIT 500', (self.seller_id,))
+        self.invoice_ids = [row.id for row in cur.fetchall()]
+        self.open_raffle_id = pending[-1].id
+        self.closed_raffles = [(r.id, r.first_prize, r.second_prize, r.third_prize) for r in closed]
+        cur.close()
+        conn.close()
+
+        r = appmod.app.test_client().post('/api/mobile/login', json={'username': self.seller_username, 'password': SELLER_PASSWORD})
+        self.bearer = {'Authorization': 'Bearer ' + r.get_json()['token']}
+
+    def login(self, username, password):
+        """A test client with its own session; each worker thread logs in separately."""
+        client = self.app.app.test_client()
+        r = client.post('/login', data={'username': username, 'password': password})
+        if r.status_code != 302:
+            raise SystemExit(f'Login failed for {username}.')
+        return client
+
+
+def _sale_form(fx, rng):
+    numbers = []
+    quantities = []
+    for _ in range(rng.randint(1, 5)):
+        numbers.append(f'{rng.randint(0, 9999):04d}' if rng.random() < 0.7 else f'{rng.randint(0, 99):02d}')
+        quantities.append(str(rng.randint(1, 5)))
+    return {'raffle_id': fx.open_raffle_id, 'client_id': rng.choice(fx.client_ids),
+            'number': numbers, 'quantity': quantities}
+
+
+# name -> callable(fixture, client_for(role), rng) returning a status code
+SCENARIOS = {
+    'new_sale': lambda fx, c, rng: c('seller').post('/sales/new', data=_sale_form(fx, rng)).status_code,
+    'list_sales': lambda fx, c, rng: c('seller').get('/sales').status_code,
+    'commissions_report': lambda fx, c, rng: c('admin').get('/admin/commissions').status_code,
+    'calculate_winners_for_raffle': lambda fx, c, rng: (
+        fx.data_access.calculate_winners_for_raffle(*rng.choice(fx.closed_raffles), incremental=False), 200)[1],
+    'invoice_pdf': lambda fx, c, rng: c('seller').get(f'/sales/{rng.choice(fx.invoice_ids)}/pdf').status_code,
+    'mobile_sorteos': lambda fx, c, rng: c('mobile').get('/api/mobile/sorteos', headers=fx.bearer).status_code,
+    'mobile_winner_payments': lambda fx, c, rng: c('mobile').get(
+        f'/api/mobile/winner-payments?sorteo_id={rng.choice(fx.closed_raffles)[0]}', headers=fx.bearer).status_code,
+}
+# Requests expected to redirect after success.
+REDIRECTS = {'new_sale'}
+
+
+def run_scenario(fx, name, total, threads, seed):
+    func = SCENARIOS[name]
+    ok_status = 302 if name in REDIRECTS else 200
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_thread = [total // threads + (1 if n < total % threads else 0) for n in range(threads)]
+
+    # Log every worker in before the clock starts.
+    sessions = [{'seller': fx.login(fx.seller_username, SELLER_PASSWORD), 'admin': fx.login('admin', ADMIN_PASSWORD),
+                 'mobile': fx.app.app.test_client()} for _ in range(threads)]
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        clients = sessions[n]
+        local = []
+        local_errors = 0
+        for _ in range(per_thread[n]):
+            start = time.perf_counter()
+            status = func(fx, clients.__getitem__, rng)
+            local.append(time.perf_counter() - start)
+            if status != ok_status:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def dataset_counts():
+    from database import get_db_connection, get_cursor
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    counts = {}
+    for table in ('users', 'clients', 'raffles', 'invoices', 'invoice_items', 'winners'):
+        cur.execute(f'SELECT COUNT(*) AS n FROM {table}')
+        counts[table] = cur.fetchone().n
+    cur.close()
+    conn.close()
+    return counts
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Prints deltas against a baseline; returns the names of regressed scenarios."""
+    regressions = []
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp')}):")
+    for name, current in results.items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+        rps_delta = (current['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] if old['throughput_rps'] else 0.0
+        p95_delta = (current['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0.0
+        regressed = rps_delta < -tolerance or p95_delta > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"  {name:<30} rps {rps_delta:+7.1%}   p95 {p95_delta:+7.1%}{'   REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    if 'DATABASE_URL' not in os.environ:
+        os.environ['SQLITE_PATH'] = os.path.abspath(args.db)
+        if not os.path.exists(os.environ['SQLITE_PATH']):
+            raise SystemExit(f'{args.db} not found; run scripts/generate_data.py --db {args.db} first.')
+
+    import app as appmod
+
+    names = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (available: {', '.join(SCENARIOS)})")
+
+    fx = Fixture(appmod)
+    counts = dataset_counts()
+    print('Dataset: ' + ', '.join(f'{n} {t}' for t, n in counts.items()))
+    print(f"{'scenario':<30} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+
+    results = {}
+    for name in names:
+        result = run_scenario(fx, name, args.requests, args.threads, args.seed)
+        results[name] = result
+        print(f"{name:<30} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}")
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'backend': 'postgres' if 'DATABASE_URL' in os.environ else 'sqlite',
+        'threads': args.threads,
+        'requests_per_scenario': args.requests,
+        'dataset': counts,
+        'scenarios': results,
+    }
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nSaved results to {args.save}')
+    if regressions:
+        raise SystemExit(f"Regressions: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Concurrent sales benchmark for the SQLite write path.
+
+N threads, each logged in as a different seller, post new_sale through the
+Flask test client as fast as they can. The same load runs in each
+configuration, in its own process (the settings are read at import) and on
+a fresh copy of the database:
+
+  default   rollback journal, a connection and a commit per sale
+  wal       SQLITE_TUNING=1 with SQLITE_WRITER=0: WAL profile, commit per sale
+  writer    WAL profile plus the group-commit writer thread, statements per sale
+  combined  as writer, with the sales of a batch sharing multi-row inserts
+
+Run from the repository root; the burst before a draw closes is
+--threads 500 (the dataset needs as many sellers):
+
+    python scripts/generate_data.py --db bench.db --sellers 500 --clients 5
+    python scripts/bench_writes.py --db bench.db --threads 500 --sales 5000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SELLER_PASSWORD = 'benchpass'
+
+MODES = {
+    'default': {'SQLITE_TUNING': '0'},
+    'wal': {'SQLITE_TUNING': '1', 'SQLITE_WRITER': '0'},
+    'writer': {'SQLITE_TUNING': '1', 'SQLITE_WRITER': '1', 'SQLITE_WRITER_COMBINE': '0'},
+    'combined': {'SQLITE_TUNING': '1', 'SQLITE_WRITER': '1', 'SQLITE_WRITER_COMBINE': '1'},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='bench.db', help='SQLite file from generate_data.py (copied, never modified)')
+    parser.add_argument('--threads', type=int, default=32, help='concurrent sellers')
+    parser.add_argument('--sales', type=int, default=2000, help='sales per configuration')
+    parser.add_argument('--modes', default=','.join(MODES), help='comma-separated configurations')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _sale_form(raffle_id, client_ids, rng):
+    numbers = []
+    quantities = []
+    for _ in range(rng.randint(1, 5)):
+        numbers.append(f'{rng.randint(0, 9999):04d}' if rng.random() < 0.7 else f'{rng.randint(0, 99):02d}')
+        quantities.append(str(rng.randint(1, 5)))
+    return {'raffle_id': raffle_id, 'client_id': rng.choice(client_ids), 'number': numbers, 'quantity': quantities}
+
+
+def run_child(args):
+    """Runs the load in this process and prints the result as JSON."""
+    import app as appmod
+    import database
+    import queries
+    from database import get_db_connection, get_cursor
+
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    sellers = queries.fetch_all(cur, 'seller.list')[:args.threads]
+    raffle_id = queries.fetch_all(cur, 'raffle.pending')[-1].id
+    users = {s.username: [row.id for row in queries.fetch_all(cur, 'client.options_for_seller', (s.id,))]
+             for s in sellers}
+    cur.close()
+    conn.close()
+    if len(users) < args.threads:
+        raise SystemExit(f'Only {len(users)} sellers in the database; use generate_data.py --sellers {args.threads}.')
+
+    # Log every seller in before the clock starts. Only the first one goes
+    # through /login; the rest get the same session keys directly, which saves
+    # hundreds of password hash checks.
+    sessions = []
+    for seller in sellers:
+        client = appmod.app.test_client()
+        if not sessions:
+            if client.post('/login', data={'username': seller.username, 'password': SELLER_PASSWORD}).status_code != 302:
+                raise SystemExit(f'Login failed for {seller.username}.')
+        else:
+            with client.session_transaction() as session:
+                session.update(user_id=seller.id, user_role='seller', username=seller.username)
+        sessions.append((client, users[seller.username]))
+
+    per_thread = [args.sales // args.threads + (1 if n < args.sales % args.threads else 0) for n in range(args.threads)]
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(n):
+        rng = random.Random(args.seed * 1000 + n)
+        client, client_ids = sessions[n]
+        local = []
+        local_errors = 0
+        for _ in range(per_thread[n]):
+            start = time.perf_counter()
+            r = client.post('/sales/new', data=_sale_form(raffle_id, client_ids, rng))
+            local.append(time.perf_counter() - start)
+            if r.status_code != 302 or not r.location.endswith('/sales'):
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    writer = database.writer
+    print(json.dumps({
+        'sales': len(latencies),
+        'errors': errors[0],
+        'sales_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'avg_batch': round(writer.jobs / writer.batches, 1) if writer.batches else None,
+        'combined': writer.combined,
+        'writer_ms_per_sale': round(writer.busy * 1000 / writer.jobs, 3) if writer.jobs else None,
+    }))
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        run_child(args)
+        return
+    if 'DATABASE_URL' in os.environ:
+        raise SystemExit('This benchmark measures the SQLite write path; unset DATABASE_URL.')
+    if not os.path.exists(args.db):
+        raise SystemExit(f'{args.db} not found; run scripts/generate_data.py --db {args.db} first.')
+
+    print(f'{args.sales} sales from {args.threads} concurrent sellers')
+    print(f"{'mode':<10} {'sales/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7} {'batch':>7} {'combined':>9} {'writer ms/sale':>15}")
+    workdir = tempfile.mkdtemp(prefix='bench_writes_')
+    try:
+        for mode in args.modes.split(','):
+            copy = os.path.join(workdir, f'{mode}.db')
+            shutil.copyfile(args.db, copy)
+            env = dict(os.environ, SQLITE_PATH=copy, **MODES[mode])
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode,
+                                  '--threads', str(args.threads), '--sales', str(args.sales), '--seed', str(args.seed)],
+                                 cwd=ROOT, env=env, capture_output=True, text=True)
+            if out.returncode != 0:
+                raise SystemExit(f'{mode} failed:\n{out.stderr}')
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            batch = f"{result['avg_batch']:.1f}" if result['avg_batch'] else '-'
+            writer_ms = f"{result['writer_ms_per_sale']:.3f}" if result['writer_ms_per_sale'] else '-'
+            print(f"{mode:<10} {result['sales_per_s']:>9.1f} {result['p50_ms']:>9.2f} "
+                  f"{result['p95_ms']:>9.2f} {result['errors']:>7} {batch:>7} {result['combined']:>9} {writer_ms:>15}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Builds the fingerprinted, precompressed copy of static/ (see static_assets.py).
+
+Every file under static/ except the ones served at fixed URLs is copied to
+static/dist/ with the first 10 hex digits of its SHA-256 in the name. Text
+files get gzip variants, and brotli variants when the brotli package is
+installed; a variant is only kept when it is smaller than the original.
+The fixed-URL files (service-worker.js, manifest.json, lh-test.html) are
+copied with their /static/ references rewritten to the hashed URLs. The
+service worker also gets an APP_SHELL listing every hashed file and a
+CACHE_NAME that changes with the build. The old build is removed first.
+Run from the repository root after changing anything under static/:
+
+    python scripts/build_static.py
+"""
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from static_assets import DIST_DIR, ENCODINGS, MANIFEST, STATIC_DIR
+
+# Served at fixed URLs by views/auth.py, so they are rewritten instead of renamed.
+ROOT_FILES = ('service-worker.js', 'manifest.json', 'lh-test.html')
+SKIP_DIRS = ('dist', '.well-known')
+COMPRESSIBLE = ('.css', '.js', '.json', '.html', '.svg', '.txt')
+
+
+def _source_files():
+    for directory, dirs, files in os.walk(STATIC_DIR):
+        if directory == STATIC_DIR:
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in sorted(files):
+            rel = os.path.relpath(os.path.join(directory, name), STATIC_DIR).replace(os.sep, '/')
+            if rel not in ROOT_FILES:
+                yield rel
+
+
+def _hashed_name(rel, data):
+    stem, ext = os.path.splitext(rel)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+
+
+def _write(rel, data):
+    path = os.path.join(DIST_DIR, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _compress(rel, data, use_brotli):
+    """Writes the .gz/.br variants that save bytes; returns their encodings."""
+    if not rel.endswith(COMPRESSIBLE):
+        return []
+    variants = [('gzip', '.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if use_brotli:
+        import brotli  # optional dependency
+        variants.insert(0, ('br', '.br', brotli.compress(data, quality=11)))
+    encodings = []
+    for encoding, suffix, compressed in variants:
+        if len(compressed) < len(data):
+            _write(rel + suffix, compressed)
+            encodings.append(encoding)
+    return encodings
+
+
+def _rewrite(text, assets):
+    # Longest names first, so /static/icons/a.png is not cut short by a prefix.
+    for rel in sorted(assets, key=len, reverse=True):
+        text = text.replace(f'/static/{rel}', f'/assets/{assets[rel]}')
+    return text
+
+
+def _service_worker(text, assets, build_id):
+    shell = ',\n'.join(f"  '/assets/{assets[rel]}'" for rel in sorted(assets))
+    text, count = re.subn(r'const APP_SHELL = \[.*?\];', f'const APP_SHELL = [\n{shell}\n];', text, flags=re.S)
+    if count != 1:
+        raise SystemExit('service-worker.js: APP_SHELL list not found.')
+    text = re.sub(r"const CACHE_NAME = '[^']*';", f"const CACHE_NAME = 'lotoweb-{build_id}';", text)
+    return _rewrite(text, assets)
+
+
+def main():
+    use_brotli = importlib.util.find_spec('brotli') is not None
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+
+    assets = {}
+    encoded = {}
+    sizes = [0, 0]
+    for rel in _source_files():
+        with open(os.path.join(STATIC_DIR, rel), 'rb') as f:
+            data = f.read()
+        hashed = _hashed_name(rel, data)
+        _write(hashed, data)
+        assets[rel] = hashed
+        encodings = _compress(hashed, data, use_brotli)
+        if encodings:
+            encoded[hashed] = encodings
+        sizes[0] += len(data)
+        # Bytes sent for the preferred variant.
+        sizes[1] += os.path.getsize(os.path.join(DIST_DIR, hashed + dict(ENCODINGS)[encodings[0]])) if encodings else len(data)
+
+    build_id = hashlib.sha256(json.dumps(assets, sort_keys=True).encode()).hexdigest()[:10]
+    for rel in ROOT_FILES:
+        with open(os.path.join(STATIC_DIR, rel), encoding='utf-8') as f:
+            text = f.read()
+        text = _service_worker(text, assets, build_id) if rel == 'service-worker.js' else _rewrite(text, assets)
+        _write(rel, text.encode('utf-8'))
+
+    with open(MANIFEST, 'w') as f:
+        json.dump({'build': build_id, 'assets': assets, 'encoded': encoded}, f, indent=1, sort_keys=True)
+
+    print(f'{len(assets)} assets in {os.path.relpath(DIST_DIR, ROOT)} (build {build_id}): '
+          f'{sizes[0] / 1024:.1f} KiB, {sizes[1] / 1024:.1f} KiB as sent to a client that accepts '
+          f"{'br' if use_brotli else 'gzip'}.")
+    if not use_brotli:
+        print('brotli is not installed: only gzip variants were written (pip install brotli).')
+
+
+if __name__ == '__main__':
+    main()
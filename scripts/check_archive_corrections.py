@@ -0,0 +1,99 @@
+"""Checks that correcting an archived raffle's results reaches the apps.
+
+Works on a copy of the database in a temporary directory: archives a closed
+raffle there (scripts/archive_raffles.py), enters corrected results for it
+through data_access.calculate_winners_for_raffle and checks that
+
+  * the main file's 'winners:<id>' version moved, so the winner-payments
+    ETag changes and clients stop getting 304 with the old payouts;
+  * the main file's 'sync' sequence moved and the raffle row carries it,
+    so delta-sync clients receive the correction;
+  * the archive file did not get a resource_versions table of its own.
+
+Prints what it checked and exits with status 1 on the first failure. Run
+from the repository root:
+
+    python scripts/check_archive_corrections.py [--db lottery.db] [--raffle 1]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.environ.get('SQLITE_PATH', 'lottery.db'), help='SQLite file to copy')
+    parser.add_argument('--raffle', type=int, help='closed raffle to archive (default: the latest one)')
+    return parser.parse_args()
+
+
+def versions(path):
+    conn = sqlite3.connect(path)
+    rows = dict(conn.execute('SELECT resource, version FROM resource_versions'))
+    conn.close()
+    return rows
+
+
+def check(ok, message):
+    print(('ok   ' if ok else 'FAIL ') + message)
+    if not ok:
+        sys.exit(1)
+
+
+def main():
+    args = parse_args()
+    if 'DATABASE_URL' in os.environ:
+        raise SystemExit('Archives are SQLite only; on PostgreSQL there is nothing to check.')
+    work = tempfile.mkdtemp(prefix='archive-check-')
+    db = os.path.join(work, 'lottery.db')
+    shutil.copy(args.db, db)
+    os.environ.update(SQLITE_PATH=db, SQLITE_ARCHIVE_DIR=os.path.join(work, 'archive'),
+                      RAFFLE_SNAPSHOT_DIR=os.path.join(work, 'snapshots'), CHANGE_SIGNAL='0')
+    try:
+        conn = sqlite3.connect(db)
+        raffle = conn.execute('SELECT id, first_prize, second_prize, third_prize FROM raffles '
+                              'WHERE results_entered = 1 AND (? IS NULL OR id = ?) ORDER BY raffle_date DESC LIMIT 1',
+                              (args.raffle, args.raffle)).fetchone()
+        conn.close()
+        if raffle is None:
+            raise SystemExit('No closed raffle to archive.')
+        raffle_id, first, second, third = raffle
+        subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'archive_raffles.py'), 'archive', str(raffle_id)],
+                       check=True, cwd=ROOT)
+
+        import data_access
+        import database
+        check(database.is_archived(raffle_id), f'raffle {raffle_id} archived')
+        before = versions(db)
+        etag = data_access.winner_payments_tag(raffle_id, 0)
+        # Another first prize, so the correction rewrites part of the winners.
+        data_access.calculate_winners_for_raffle(raffle_id, f'{(int(first) + 1) % 10000:04d}', second, third)
+        after = versions(db)
+
+        winners = f'winners:{raffle_id}'
+        check(after.get(winners, 0) > before.get(winners, 0),
+              f'main {winners} moved {before.get(winners, 0)} -> {after.get(winners, 0)}')
+        data_access.resource_versions.reload()
+        check(data_access.winner_payments_tag(raffle_id, 0) != etag, 'winner-payments ETag changed')
+        check(after.get('sync', 0) > before.get('sync', 0), f"main sync moved {before.get('sync', 0)} -> {after.get('sync', 0)}")
+        conn = sqlite3.connect(db)
+        change_seq = conn.execute('SELECT change_seq FROM raffles WHERE id = ?', (raffle_id,)).fetchone()[0]
+        conn.close()
+        check(change_seq == after['sync'], f'raffle change_seq is the main sync sequence ({change_seq})')
+        archive = sqlite3.connect(database.archive_path(raffle_id))
+        stray = archive.execute("SELECT 1 FROM sqlite_master WHERE name = 'resource_versions'").fetchone()
+        archive.close()
+        check(stray is None, 'archive has no resource_versions table')
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
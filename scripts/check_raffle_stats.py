@@ -0,0 +1,85 @@
+"""Checks the raffle_stats totals against the invoices, items and winners they summarize.
+
+Recomputes every raffle and seller row from the base tables (archived
+raffles from their archive files) and compares it with the stored row. A
+raffle that differs is checked again with writers locked out (see
+raffle_stats.check_raffle), so a sale saved between the two reads is not
+reported as drift and --fix never drops it. Prints every value
+that drifted; with --fix, rewrites the drifted raffles from the base tables.
+Exits with status 1 when drift was found and left in place, so it can run
+from cron. Run from the repository root:
+
+    python scripts/check_raffle_stats.py [--db lottery.db] [--fix]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='SQLite file (defaults to SQLITE_PATH / lottery.db)')
+    parser.add_argument('--raffle', type=int, help='check only this raffle id')
+    parser.add_argument('--fix', action='store_true', help='rewrite the raffles that drifted')
+    return parser.parse_args()
+
+
+def suspects(raffle_ids):
+    """Raffle ids whose stored rows differ from a first, unlocked recomputation."""
+    import raffle_stats
+    from database import archived_raffle_ids, get_cursor, get_db_connection
+
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    stored = raffle_stats.stored(cur)
+    actual = raffle_stats.actual(cur)
+    cur.close()
+    conn.close()
+    # Archived raffles keep their rows in their own file (SQLite).
+    for raffle_id in archived_raffle_ids():
+        conn = get_db_connection(raffle_id)
+        cur = get_cursor(conn)
+        actual.update(raffle_stats.actual(cur, raffle_id))
+        cur.close()
+        conn.close()
+    return sorted({raffle_id for raffle_id, *_ in raffle_stats.drift(stored, actual)} & set(raffle_ids))
+
+
+def main():
+    args = parse_args()
+    if args.db:
+        os.environ['SQLITE_PATH'] = os.path.abspath(args.db)
+
+    import queries
+    import raffle_stats
+    from database import get_cursor, get_db_connection
+
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    raffle_ids = [row.id for row in queries.fetch_all(cur, 'raffle.options')]
+    cur.close()
+    conn.close()
+    if args.raffle is not None:
+        raffle_ids = [raffle_id for raffle_id in raffle_ids if raffle_id == args.raffle]
+
+    drifted = []
+    for raffle_id in suspects(raffle_ids):
+        found = raffle_stats.check_raffle(raffle_id, fix=args.fix)
+        if found:
+            drifted.append(raffle_id)
+            for _, seller_id, column, have, want in found:
+                print(f'raffle {raffle_id} seller {seller_id}: {column} stored {have:g}, actual {want:g}')
+
+    if not drifted:
+        print(f'{len(raffle_ids)} raffles checked, no drift.')
+        return
+    action = 'rewritten from the base tables' if args.fix else 'run with --fix to rewrite them'
+    print(f'{len(raffle_ids)} raffles checked, {len(drifted)} drifted ({", ".join(map(str, drifted))}); {action}.')
+    if not args.fix:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""Fills a database with synthetic sellers, clients, raffles and sales.
+
+Number popularity follows a Zipf-like distribution (a few "favourite" numbers
+take most of the sales, as in real raffles) and everything is driven by a
+seed, so the same arguments always produce the same dataset. Closed raffles
+get random results and their winners are computed with the app's own
+calculate_winners_for_raffle; one future raffle is left open for new sales.
+
+The database is RESET. By default a separate SQLite file (bench.db) is used;
+pass --db to choose another file, or set DATABASE_URL to fill a Postgres
+database instead. Run from the repository root:
+
+    python scripts/generate_data.py --sellers 20 --clients 50 --raffles 30 --invoices 400
+
+Every seller logs in as vendedorN / benchpass, the admin as admin / adminpass.
+"""
+import argparse
+import datetime
+import itertools
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SELLER_PASSWORD = 'benchpass'
+ADMIN_PASSWORD = 'adminpass'
+
+FIRST_NAMES = ['José', 'María', 'Luis', 'Ana', 'Carlos', 'Rosa', 'Juan', 'Carmen', 'Pedro', 'Elena',
+               'Jorge', 'Lucía', 'Miguel', 'Sofía', 'Ramón', 'Isabel', 'Andrés', 'Marta', 'Diego', 'Julia']
+LAST_NAMES = ['González', 'Rodríguez', 'Pérez', 'Sánchez', 'Martínez', 'Díaz', 'Herrera', 'Castillo',
+              'Vargas', 'Morales', 'Jiménez', 'Ríos', 'Batista', 'Quintero', 'Ortega', 'Navarro']
+PROVINCES = ['Panamá', 'Colón', 'Chiriquí', 'Veraguas', 'Coclé', 'Herrera', 'Los Santos', 'Darién']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='bench.db', help='SQLite file to (re)create (ignored with DATABASE_URL)')
+    parser.add_argument('--sellers', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=50, help='clients per seller')
+    parser.add_argument('--raffles', type=int, default=30, help='closed raffles (one open raffle is always added)')
+    parser.add_argument('--invoices', type=int, default=400, help='invoices per raffle')
+    parser.add_argument('--max-items', type=int, default=6, help='maximum items per invoice')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of number popularity')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='allow overwriting lottery.db')
+    return parser.parse_args()
+
+
+class NumberPicker:
+    """Draws 2- and 4-digit numbers with Zipf-distributed popularity."""
+
+    def __init__(self, rng, skew):
+        self.rng = rng
+        self.billetes = self._ranked([f'{n:04d}' for n in range(10000)], skew)
+        self.chances = self._ranked([f'{n:02d}' for n in range(100)], skew)
+
+    def _ranked(self, numbers, skew):
+        self.rng.shuffle(numbers)  # which numbers are popular depends on the seed
+        weights = [1.0 / (rank ** skew) for rank in range(1, len(numbers) + 1)]
+        return numbers, list(itertools.accumulate(weights))
+
+    def pick(self):
+        # Roughly 70% of the items are billetes (4 digits), the rest chances.
+        numbers, cum_weights = self.billetes if self.rng.random() < 0.7 else self.chances
+        return self.rng.choices(numbers, cum_weights=cum_weights)[0]
+
+
+def reset_schema(conn, dialect):
+    schema = 'schema.sql' if dialect == 'sqlite' else 'schema_postgres.sql'
+    with open(os.path.join(ROOT, schema)) as f:
+        sql = f.read()
+    if dialect == 'sqlite':
+        conn.executescript(sql)
+    else:
+        cur = conn.cursor()
+        cur.execute(sql)
+        cur.close()
+    conn.commit()
+
+
+def insert_many(conn, dialect, sql, rows):
+    import queries
+    cur = conn.cursor()
+    if dialect == 'sqlite':
+        cur.executemany(queries.render(sql, dialect), rows)
+    else:
+        import psycopg2.extras
+        psycopg2.extras.execute_batch(cur, sql, rows, page_size=1000)
+    cur.close()
+
+
+def generate(conn, dialect, args):
+    from werkzeug.security import generate_password_hash
+    from database import create_raffle_partitions, get_cursor
+
+    rng = random.Random(args.seed)
+    picker = NumberPicker(rng, args.skew)
+    now = datetime.datetime.now().replace(hour=15, minute=0, second=0, microsecond=0)
+    # Hash once: every seller shares the same password.
+    seller_hash = generate_password_hash(SELLER_PASSWORD)
+
+    # Ids are assigned in insertion order on the freshly created tables.
+    users = [('admin', generate_password_hash(ADMIN_PASSWORD), 'admin', 'Administrador Principal', None, None, None)]
+    for n in range(1, args.sellers + 1):
+        users.append((f'vendedor{n}', seller_hash, 'seller', f'Vendedor {n}', f'6{rng.randint(0, 9999999):07d}',
+                      rng.choice(PROVINCES), rng.choice([8.0, 10.0, 12.0, 15.0])))
+    insert_many(conn, dialect, '''
+        INSERT INTO users (username, password, role, name, phone, province, commission_percentage)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ''', users)
+    seller_ids = list(range(2, args.sellers + 2))
+
+    clients = []
+    clients_by_seller = {}
+    for seller_id in seller_ids:
+        for _ in range(args.clients):
+            clients.append((rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f'6{rng.randint(0, 9999999):07d}',
+                            f'Calle {rng.randint(1, 99)}', seller_id))
+            clients_by_seller.setdefault(seller_id, []).append(len(clients))
+    insert_many(conn, dialect, 'INSERT INTO clients (name, last_name, phone, address, seller_id) VALUES (%s, %s, %s, %s, %s)', clients)
+
+    # Closed raffles every 3 days going back from today, plus one open raffle.
+    raffle_dates = [now - datetime.timedelta(days=3 * (args.raffles - n)) for n in range(args.raffles)]
+    raffle_dates.append(now + datetime.timedelta(days=3))
+    insert_many(conn, dialect, 'INSERT INTO raffles (raffle_date) VALUES (%s)',
+                [(d.strftime('%Y-%m-%d %H:%M:%S'),) for d in raffle_dates])
+    cur = get_cursor(conn)
+    for raffle_id in range(1, len(raffle_dates) + 1):
+        create_raffle_partitions(cur, raffle_id)
+    cur.close()
+
+    # Some sellers and clients sell/buy much more than others.
+    seller_weights = list(itertools.accumulate(1.0 / (rank ** 0.8) for rank in range(1, len(seller_ids) + 1)))
+    invoices = []
+    items = []
+    for raffle_id, raffle_date in enumerate(raffle_dates, start=1):
+        for _ in range(args.invoices):
+            seller_id = rng.choices(seller_ids, cum_weights=seller_weights)[0]
+            client_id = rng.choice(clients_by_seller[seller_id])
+            invoice_id = len(invoices) + 1
+            total = 0.0
+            for _ in range(rng.randint(1, args.max_items)):
+                number = picker.pick()
+                item_type = 'billete' if len(number) == 4 else 'chance'
+                price = 1.0 if item_type == 'billete' else 0.25
+                quantity = min(int(rng.paretovariate(1.5)), 50)
+                items.append((invoice_id, raffle_id, seller_id, client_id, number, item_type, quantity, price, quantity * price))
+                total += quantity * price
+            created = raffle_date - datetime.timedelta(minutes=rng.randint(30, 3 * 24 * 60))
+            invoices.append((raffle_id, client_id, seller_id, created.strftime('%Y-%m-%d %H:%M:%S'), total))
+    insert_many(conn, dialect, '''
+        INSERT INTO invoices (raffle_id, client_id, seller_id, creation_date, total_amount)
+        VALUES (%s, %s, %s, %s, %s)
+    ''', invoices)
+    insert_many(conn, dialect, '''
+        INSERT INTO invoice_items (invoice_id, raffle_id, seller_id, client_id, number, item_type, quantity, price_per_unit, sub_total)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ''', items)
+    conn.commit()
+
+    results = []
+    for raffle_id in range(1, args.raffles + 1):
+        p1 = f'{rng.randint(0, 9999):04d}'
+        p2 = f'{rng.randint(0, 9999):04d}' if rng.random() < 0.8 else f'{rng.randint(0, 99):02d}'
+        p3 = f'{rng.randint(0, 9999):04d}' if rng.random() < 0.8 else f'{rng.randint(0, 99):02d}'
+        results.append((raffle_id, p1, p2, p3))
+    return {'users': len(users), 'clients': len(clients), 'raffles': len(raffle_dates),
+            'invoices': len(invoices), 'invoice_items': len(items)}, results
+
+
+def main():
+    args = parse_args()
+    if 'DATABASE_URL' in os.environ:
+        dialect = 'postgres'
+    else:
+        dialect = 'sqlite'
+        db_path = os.path.abspath(args.db)
+        if db_path == os.path.join(ROOT, 'lottery.db') and not args.force:
+            raise SystemExit('Refusing to overwrite lottery.db without --force.')
+        os.environ['SQLITE_PATH'] = db_path
+
+    # Imported after SQLITE_PATH is set so the app uses the generated database.
+    import queries
+    import raffle_stats
+    from database import get_cursor, get_db_connection
+    from data_access import calculate_winners_for_raffle
+
+    start = time.perf_counter()
+    conn = get_db_connection()
+    reset_schema(conn, dialect)
+    counts, results = generate(conn, dialect, args)
+    cur = get_cursor(conn)
+    raffle_ids = [row.id for row in queries.fetch_all(cur, 'raffle.options')]
+    cur.close()
+    conn.close()
+
+    for raffle_id, p1, p2, p3 in results:
+        calculate_winners_for_raffle(raffle_id, p1, p2, p3)
+    # The sales were inserted directly; compute their dashboard totals.
+    for raffle_id in raffle_ids:
+        raffle_stats.check_raffle(raffle_id, fix=True)
+
+    target = os.environ['SQLITE_PATH'] if dialect == 'sqlite' else 'DATABASE_URL'
+    summary = ', '.join(f'{count} {table}' for table, count in counts.items())
+    print(f'Generated {summary} in {target} ({time.perf_counter() - start:.1f}s).')
+
+
+if __name__ == '__main__':
+    main()
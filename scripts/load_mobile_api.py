@@ -0,0 +1,73 @@
+"""Requests/second on the mobile API with and without the verified-token cache.
+
+Runs the Flask app in-process (test client, several threads) against the
+local lottery.db, so it isolates application overhead from network and
+server effects. Run from the repository root:
+
+    python scripts/load_mobile_api.py [seconds_per_run] [threads]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as appmod
+import queries
+import security
+from database import get_db_connection, get_cursor
+
+
+def pick_seller_and_raffle():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    cur.execute("SELECT id, username FROM users WHERE role = 'seller' ORDER BY id LIMIT 1")
+    seller = cur.fetchone()
+    raffle = queries.fetch_one(cur, 'raffle.latest_id')
+    cur.close()
+    conn.close()
+    if seller is None or raffle is None:
+        raise SystemExit('Need at least one seller and one raffle in the database.')
+    return seller, raffle.id
+
+
+def run(paths, headers, seconds, threads):
+    count = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(n):
+        client = appmod.app.test_client()
+        i = 0
+        while time.perf_counter() < deadline:
+            r = client.get(paths[i % len(paths)], headers=headers)
+            assert r.status_code == 200, r.status_code
+            i += 1
+        count[n] = i
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(count) / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seller, raffle_id = pick_seller_and_raffle()
+    token = security.generate_jwt({'user_id': seller.id, 'username': seller.username, 'role': 'seller'})
+    headers = {'Authorization': 'Bearer ' + token}
+    paths = ['/api/mobile/sorteos', f'/api/mobile/winner-payments?sorteo_id={raffle_id}']
+
+    cache_size = security.token_cache.maxsize or 4096
+    for label, size in [('without token cache', 0), ('with token cache', cache_size)]:
+        security.token_cache.maxsize = size
+        security.token_cache.clear()
+        rps = run(paths, headers, seconds, threads)
+        print(f'{label:<22} {rps:8.1f} req/s  ({threads} threads, {seconds:g}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Concurrent connections per worker: Flask on waitress vs mobile_asgi on uvicorn.
+
+Starts each server as one process on a local port and opens a growing number
+of concurrent keep-alive connections, each requesting the mobile endpoints
+(sorteos and winner payments) in a loop. For every level it reports
+throughput, p95 latency and errors, and finally the largest level each
+server sustained (no errors and p95 under --slo-ms).
+
+The gap grows with query latency: point DATABASE_URL at PostgreSQL to let
+the ASGI app use asyncpg. On SQLite both servers end up running queries on
+threads. The load comes from a minimal asyncio HTTP/1.1 client, so that the
+client itself stays cheap at hundreds of connections. Run from the
+repository root:
+
+    python scripts/generate_data.py --db bench.db
+    python scripts/load_mobile_asgi.py --db bench.db --levels 10,50,200,500
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SELLER_PASSWORD = 'benchpass'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='bench.db', help='SQLite file from generate_data.py (ignored with DATABASE_URL)')
+    parser.add_argument('--levels', default='10,50,200,500', help='comma-separated concurrent connection counts')
+    parser.add_argument('--seconds', type=float, default=10, help='duration of each level')
+    parser.add_argument('--threads', type=int, default=8, help='waitress worker threads')
+    parser.add_argument('--slo-ms', type=float, default=1000, help='p95 latency a level must stay under')
+    parser.add_argument('--servers', default='wsgi,asgi')
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(kind, port, args):
+    if kind == 'wsgi':
+        return [sys.executable, '-m', 'waitress', '--listen', f'127.0.0.1:{port}', f'--threads={args.threads}',
+                '--connection-limit=2000', 'app:app']
+    return [sys.executable, '-m', 'uvicorn', 'mobile_asgi:app', '--host', '127.0.0.1', '--port', str(port),
+            '--log-level', 'warning', '--backlog', '2048']
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection; enough for JSON requests with Content-Length."""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        lines = [f'{method} {path} HTTP/1.1', f'Host: 127.0.0.1:{self.port}']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        payload = json.dumps(body).encode() if body is not None else b''
+        if body is not None:
+            lines += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split()[1])
+        length = 0
+        for line in head[1:]:
+            name, _, value = line.partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        data = await self.reader.readexactly(length) if length else b''
+        return status, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+async def wait_ready(port):
+    for _ in range(100):
+        conn = Connection(port)
+        try:
+            await conn.request('GET', '/login')
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+        finally:
+            conn.close()
+    raise SystemExit(f'Server on port {port} did not start.')
+
+
+async def run_level(port, headers, paths, connections, seconds):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(n):
+        nonlocal errors
+        conn = Connection(port)
+        i = n
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status, _ = await asyncio.wait_for(conn.request('GET', paths[i % len(paths)], headers), 30)
+                if status != 200:
+                    errors += 1
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                errors += 1
+                conn.close()
+            latencies.append(time.perf_counter() - start)
+            i += 1
+        conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 0.95) * 1000, errors
+
+
+async def main():
+    args = parse_args()
+    env = dict(os.environ)
+    if 'DATABASE_URL' not in env:
+        env['SQLITE_PATH'] = os.path.abspath(args.db)
+        if not os.path.exists(env['SQLITE_PATH']):
+            raise SystemExit(f'{args.db} not found; run scripts/generate_data.py --db {args.db} first.')
+    os.environ.update(env)
+    import queries
+    from database import get_db_connection, get_cursor
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    username = queries.fetch_all(cur, 'seller.list')[0].username
+    cur.close()
+    conn.close()
+
+    levels = [int(level) for level in args.levels.split(',')]
+    sustained = {}
+
+    print(f"{'server':<6} {'conns':>6} {'req/s':>9} {'p95 ms':>9} {'errors':>7}")
+    for kind in args.servers.split(','):
+        port = free_port()
+        # Server logs are dropped: waitress warns about its queue depth on every request.
+        server = subprocess.Popen(server_command(kind, port, args), cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            await wait_ready(port)
+            conn = Connection(port)
+            status, data = await conn.request('POST', '/api/mobile/login',
+                                              body={'username': username, 'password': SELLER_PASSWORD})
+            if status != 200:
+                raise SystemExit(f'Login failed on {kind}: {data!r}')
+            headers = {'Authorization': 'Bearer ' + json.loads(data)['token']}
+            raffles = json.loads((await conn.request('GET', '/api/mobile/sorteos', headers))[1])
+            conn.close()
+            paths = ['/api/mobile/sorteos'] + [f"/api/mobile/winner-payments?sorteo_id={r['id']}" for r in raffles[:5]]
+
+            for connections in levels:
+                rps, p95, errors = await run_level(port, headers, paths, connections, args.seconds)
+                print(f'{kind:<6} {connections:>6} {rps:>9.1f} {p95:>9.1f} {errors:>7}')
+                if errors == 0 and p95 <= args.slo_ms:
+                    sustained[kind] = connections
+        finally:
+            server.terminate()
+            server.wait()
+
+    print()
+    for kind in args.servers.split(','):
+        print(f"{kind}: sustained {sustained.get(kind, 0)} concurrent connections in one worker "
+              f"(p95 under {args.slo_ms:g} ms, no errors)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
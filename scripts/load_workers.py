@@ -0,0 +1,210 @@
+"""Throughput of the gunicorn profile as the number of worker processes grows.
+
+Starts gunicorn with gunicorn.conf.py once per --workers value against the
+same database and drives it with a fixed number of keep-alive connections
+(--connections), spread over client processes so the load generator itself
+is not held back by one GIL. Each connection loops over a CPU-heavy mix:
+invoice PDFs, the sales and winners pages and client search. Reports
+requests per second, latency percentiles and the speedup over one worker.
+Run from the repository root:
+
+    python scripts/generate_data.py --db bench.db
+    python scripts/load_workers.py --db bench.db --workers 1,2,4
+
+The client processes share the machine with the server: only counts where
+workers plus clients fit the cores say anything about scaling. On SQLite
+every run uses SQLITE_WRITER=0, since gunicorn.conf.py allows only one
+worker with the group-commit writer.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SELLER_PASSWORD = 'benchpass'
+ADMIN_PASSWORD = 'adminpass'
+
+
+def parse_args():
+    cores = multiprocessing.cpu_count()
+    default_workers = sorted({1, *(n for n in (2, 4, 8, 16) if n <= cores), cores})
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='bench.db', help='SQLite file from generate_data.py (ignored with DATABASE_URL)')
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)),
+                        help='comma-separated worker counts (default: 1, 2, 4, ... up to the core count)')
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker (GUNICORN_THREADS)')
+    parser.add_argument('--connections', type=int, default=16, help='concurrent client connections, same for every run')
+    parser.add_argument('--clients', type=int, default=min(cores, 4), help='client processes the connections are spread over')
+    parser.add_argument('--duration', type=float, default=10, help='seconds measured per run')
+    parser.add_argument('--warmup', type=float, default=2, help='seconds of load before measuring')
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, server):
+    for _ in range(300):
+        if server.poll() is not None:
+            raise SystemExit(f'gunicorn exited with status {server.returncode}.')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/login')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f'Server on port {port} did not start.')
+
+
+class Client:
+    """A keep-alive connection with the session cookie of one user."""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        self.cookie = None
+
+    def get(self, path):
+        self.conn.request('GET', path, headers={'Cookie': self.cookie, 'Accept-Encoding': 'gzip'})
+        response = self.conn.getresponse()
+        response.read()
+        return response.status
+
+    def login(self, username, password):
+        body = urllib.parse.urlencode({'username': username, 'password': password})
+        self.conn.request('POST', '/login', body=body, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        response = self.conn.getresponse()
+        response.read()
+        cookie = response.getheader('Set-Cookie')
+        if response.status != 302 or not cookie:
+            raise SystemExit(f'Login failed for {username}.')
+        self.cookie = cookie.split(';', 1)[0]
+
+
+def workload():
+    """(username, password, paths) per user type, from the generated dataset."""
+    import queries
+    from database import get_db_connection, get_cursor
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    cur.execute('SELECT u.id, u.username FROM invoices i JOIN users u ON u.id = i.seller_id '
+                'GROUP BY u.id, u.username ORDER BY COUNT(*) DESC LIMIT 1')
+    seller = cur.fetchone()
+    closed = queries.fetch_all(cur, 'raffle.with_results')
+    invoice_ids = []
+    if seller is not None:
+        rows = queries.execute_sql(cur, 'SELECT id FROM invoices WHERE seller_id = %s ORDER BY id DESC LIMIT 50',
+                                   (seller[0],)).fetchall()
+        invoice_ids = [row[0] for row in rows]
+    cur.close()
+    conn.close()
+    if seller is None or not closed or not invoice_ids:
+        raise SystemExit('Run scripts/generate_data.py first (needs sales and closed raffles).')
+    seller_paths = [f'/sales/{invoice_id}/pdf' for invoice_id in invoice_ids]
+    seller_paths += ['/sales', '/clients', '/api/clients/search?q=ma', '/api/clients/search?q=ro']
+    admin_paths = [f'/winners?raffle_id={raffle.id}' for raffle in closed[:5]] + ['/sales']
+    return [(seller[1], SELLER_PASSWORD, seller_paths), ('admin', ADMIN_PASSWORD, admin_paths)]
+
+
+def _connection(port, user, start_at, stop_at, seed, out):
+    username, password, paths = user
+    rng = random.Random(seed)
+    client = Client(port)
+    client.login(username, password)
+    latencies, errors = [], 0
+    while time.time() < start_at:
+        client.get(rng.choice(paths))
+    while time.time() < stop_at:
+        started = time.perf_counter()
+        status = client.get(rng.choice(paths))
+        latencies.append(time.perf_counter() - started)
+        errors += status != 200
+    client.conn.close()
+    out.append((latencies, errors))
+
+
+def client_process(port, users, connections, start_at, stop_at, seed, queue):
+    """Runs `connections` threads; seller connections outnumber admin ones three to one."""
+    results = []
+    threads = [threading.Thread(target=_connection, args=(port, users[0] if i % 4 else users[1],
+                                                          start_at, stop_at, seed * 1000 + i, results))
+               for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put(results)
+
+
+def run(port, users, args):
+    start_at = time.time() + 1 + args.warmup
+    stop_at = start_at + args.duration
+    queue = multiprocessing.Queue()
+    share = [args.connections // args.clients + (i < args.connections % args.clients) for i in range(args.clients)]
+    procs = [multiprocessing.Process(target=client_process, args=(port, users, n, start_at, stop_at, i, queue))
+             for i, n in enumerate(share) if n]
+    for proc in procs:
+        proc.start()
+    results = [result for _ in procs for result in queue.get()]
+    for proc in procs:
+        proc.join()
+    latencies = sorted(latency for latency_list, _ in results for latency in latency_list)
+    errors = sum(e for _, e in results)
+    if not latencies:
+        raise SystemExit('No request completed.')
+    return {'rps': len(latencies) / args.duration, 'errors': errors,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95)] * 1000,
+            'p99': latencies[int(len(latencies) * 0.99)] * 1000}
+
+
+def main():
+    args = parse_args()
+    env = dict(os.environ, GUNICORN_THREADS=str(args.threads))
+    if 'DATABASE_URL' not in env:
+        env['SQLITE_PATH'] = os.path.abspath(args.db)
+        env.setdefault('SQLITE_TUNING', '1')
+        env['SQLITE_WRITER'] = '0'
+        if not os.path.exists(env['SQLITE_PATH']):
+            raise SystemExit(f'{args.db} not found; run scripts/generate_data.py --db {args.db} first.')
+    os.environ.update(env)
+    users = workload()
+
+    print(f'{multiprocessing.cpu_count()} cores; {args.connections} connections from {args.clients} client processes, '
+          f'{args.threads} threads per worker, {args.duration:.0f}s per run.')
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8} {'per worker':>10}")
+    baseline = None
+    for workers in [int(n) for n in args.workers.split(',')]:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+                                   '--bind', f'127.0.0.1:{port}', 'wsgi:app'],
+                                  cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(port, server)
+            result = run(port, users, args)
+        finally:
+            server.terminate()
+            server.wait()
+        baseline = baseline or result['rps'] / workers
+        speedup = result['rps'] / baseline
+        print(f"{workers:>7} {result['rps']:>9.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} "
+              f"{result['errors']:>7} {speedup:>7.2f}x {speedup / workers:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Payload size and time to first byte of the heavy pages, before and after compression.
+
+Starts the app on waitress twice against the same database: once with
+COMPRESSION=0 and TEMPLATE_TRIM=0 ("before") and once with the defaults
+("after", see compression.py and templating.py). Logged in as the admin and
+as the busiest seller, it requests the sales, clients and winners pages
+with --accept as Accept-Encoding and reports, per page, the bytes on the
+wire, the decoded HTML size and the median time to first byte and to the
+last byte. Run from the repository root:
+
+    python scripts/generate_data.py --db bench.db
+    python scripts/measure_payloads.py --db bench.db
+
+Over loopback the time is all server work, so compression shows up as a few
+milliseconds more; on a mobile link, the bytes saved dominate.
+"""
+import argparse
+import gzip
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SELLER_PASSWORD = 'benchpass'
+ADMIN_PASSWORD = 'adminpass'
+
+VARIANTS = (('before', {'COMPRESSION': '0', 'TEMPLATE_TRIM': '0'}),
+            ('after', {'COMPRESSION': '1', 'TEMPLATE_TRIM': '1'}))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='bench.db', help='SQLite file from generate_data.py (ignored with DATABASE_URL)')
+    parser.add_argument('--repeat', type=int, default=5, help='requests per page; times are medians')
+    parser.add_argument('--accept', default='br, gzip', help='Accept-Encoding sent by the client')
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def decode(data, encoding):
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if encoding == 'br':
+        import brotli  # optional dependency
+        return brotli.decompress(data)
+    return data
+
+
+class Client:
+    """A keep-alive connection with the session cookie of one user."""
+
+    def __init__(self, port, accept):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        self.accept = accept
+        self.cookie = None
+
+    def request(self, method, path, body=None):
+        headers = {'Accept-Encoding': self.accept}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        if body is not None:
+            body = urllib.parse.urlencode(body)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        start = time.perf_counter()
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        ttfb = time.perf_counter() - start
+        data = response.read()
+        total = time.perf_counter() - start
+        return response, data, ttfb, total
+
+    def login(self, username, password):
+        response, _, _, _ = self.request('POST', '/login', {'username': username, 'password': password})
+        cookie = response.getheader('Set-Cookie')
+        if response.status != 302 or not cookie:
+            raise SystemExit(f'Login failed for {username}.')
+        self.cookie = cookie.split(';', 1)[0]
+
+
+def wait_ready(port):
+    for _ in range(100):
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/login')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f'Server on port {port} did not start.')
+
+
+def pages():
+    """(label, user, path) for every page measured, from the generated dataset."""
+    import queries
+    from database import get_db_connection, get_cursor
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    cur.execute('SELECT u.username FROM invoices i JOIN users u ON u.id = i.seller_id '
+                'GROUP BY u.username ORDER BY COUNT(*) DESC LIMIT 1')
+    seller = cur.fetchone()
+    closed = queries.fetch_all(cur, 'raffle.with_results')
+    cur.close()
+    conn.close()
+    if seller is None or not closed:
+        raise SystemExit('Run scripts/generate_data.py first (needs sales and closed raffles).')
+    winners = f'/winners?raffle_id={closed[0].id}'
+    return seller.username, [
+        ('admin /sales', 'admin', '/sales'),
+        ('admin /sales (all)', 'admin', '/sales?raffle_id=all'),
+        ('admin /clients', 'admin', '/clients'),
+        ('admin /winners', 'admin', winners),
+        ('seller /sales', 'seller', '/sales'),
+        ('seller /sales (all)', 'seller', '/sales?raffle_id=all'),
+        ('seller /clients', 'seller', '/clients'),
+        ('seller /winners', 'seller', winners),
+    ]
+
+
+def measure(port, accept, seller, page_list, repeat):
+    clients = {'admin': Client(port, accept), 'seller': Client(port, accept)}
+    clients['admin'].login('admin', ADMIN_PASSWORD)
+    clients['seller'].login(seller, SELLER_PASSWORD)
+    results = {}
+    for label, user, path in page_list:
+        ttfbs, totals = [], []
+        for _ in range(repeat):
+            response, data, ttfb, total = clients[user].request('GET', path)
+            if response.status != 200:
+                raise SystemExit(f'{label}: HTTP {response.status}')
+            ttfbs.append(ttfb)
+            totals.append(total)
+        encoding = response.getheader('Content-Encoding')
+        results[label] = {'wire': len(data), 'html': len(decode(data, encoding)), 'encoding': encoding or '-',
+                          'ttfb': statistics.median(ttfbs) * 1000, 'total': statistics.median(totals) * 1000}
+    for client in clients.values():
+        client.conn.close()
+    return results
+
+
+def main():
+    args = parse_args()
+    env = dict(os.environ)
+    if 'DATABASE_URL' not in env:
+        env['SQLITE_PATH'] = os.path.abspath(args.db)
+        if not os.path.exists(env['SQLITE_PATH']):
+            raise SystemExit(f'{args.db} not found; run scripts/generate_data.py --db {args.db} first.')
+    os.environ.update(env)
+    seller, page_list = pages()
+
+    runs = {}
+    for name, overrides in VARIANTS:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, '-m', 'waitress', '--listen', f'127.0.0.1:{port}', 'app:app'],
+                                  cwd=ROOT, env=dict(env, **overrides),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(port)
+            runs[name] = measure(port, args.accept, seller, page_list, args.repeat)
+        finally:
+            server.terminate()
+            server.wait()
+
+    before, after = runs['before'], runs['after']
+    print(f'Accept-Encoding: {args.accept}; times are medians of {args.repeat} requests over loopback.')
+    print(f"{'page':<22} {'before B':>10} {'after B':>9} {'enc':>4} {'saved':>6} "
+          f"{'html B':>19} {'TTFB ms':>15} {'total ms':>15}")
+    for label, _, _ in page_list:
+        b, a = before[label], after[label]
+        print(f"{label:<22} {b['wire']:>10} {a['wire']:>9} {a['encoding']:>4} {1 - a['wire'] / b['wire']:>6.1%} "
+              f"{b['html']:>9}->{a['html']:<8} {b['ttfb']:>6.1f}->{a['ttfb']:<7.1f} {b['total']:>6.1f}->{a['total']:<6.1f}")
+
+
+if __name__ == '__main__':
+    main()
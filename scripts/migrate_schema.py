@@ -0,0 +1,318 @@
+"""Brings an existing database up to the current schema.
+
+Databases created from schema.sql / schema_postgres.sql are already current.
+Every step checks what is there first, so the script can be run again after
+an interruption or on an up-to-date database:
+
+  * invoice_items gets copies of its invoice's raffle_id, seller_id and
+    client_id, backfilled from invoices, plus the covering index used by the
+    winner calculation;
+  * invoice_items gets the generated prefix/suffix keys of its number and
+    their indexes (see invoice_item.prize_candidates);
+  * on PostgreSQL, invoice_items and winners are rebuilt as tables
+    partitioned by raffle_id, with one partition per raffle;
+  * clients, raffles and invoices get the change_seq column of the delta
+    sync, invoices its client_ref, plus the sync_deletions table (see
+    sync.py). Existing rows keep change_seq 0 and reach the apps with their
+    next full sync;
+  * the raffle_stats table of the admin dashboard is created and, while
+    empty, filled from the base tables (see raffle_stats.py);
+  * SQLite archive files lose any resource_versions table of their own
+    (older versions created one when an archived raffle's results were
+    corrected, hiding the main file's counters); the raffle is then stamped
+    with fresh main-file counters so apps and ETags pick up the correction.
+
+SQLite archive files (see archive_raffles.py) are migrated too. Run from the
+repository root:
+
+    python scripts/migrate_schema.py [--db lottery.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# invoice_items columns copied from invoices.
+ITEM_COLUMNS = ('raffle_id', 'seller_id', 'client_id')
+
+# Generated invoice_items columns: numeric keys of the number (NULL for chances).
+NUMBER_KEYS = {
+    'number_value': 'CAST(number AS INTEGER)',
+    'prefix3': 'CASE WHEN length(number) = 4 THEN CAST(substr(number, 1, 3) AS INTEGER) END',
+    'suffix3': 'CASE WHEN length(number) = 4 THEN CAST(substr(number, 2, 3) AS INTEGER) END',
+    'prefix2': 'CASE WHEN length(number) = 4 THEN CAST(substr(number, 1, 2) AS INTEGER) END',
+    'suffix2': 'CASE WHEN length(number) = 4 THEN CAST(substr(number, 3, 2) AS INTEGER) END',
+    'last1': 'CASE WHEN length(number) = 4 THEN CAST(substr(number, 4, 1) AS INTEGER) END',
+}
+_KEY_INDEXES = [f'CREATE INDEX IF NOT EXISTS invoice_items_{key}_idx ON invoice_items (raffle_id, {key})'
+                for key in NUMBER_KEYS if key != 'number_value']
+
+# Delta sync columns (see sync.py).
+SYNC_COLUMNS = {
+    'clients': ['change_seq INTEGER NOT NULL DEFAULT 0'],
+    'raffles': ['change_seq INTEGER NOT NULL DEFAULT 0'],
+    'invoices': ['change_seq INTEGER NOT NULL DEFAULT 0', 'client_ref TEXT'],
+}
+SYNC_INDEXES = {
+    'clients': ['CREATE INDEX IF NOT EXISTS clients_seller_change_idx ON clients (seller_id, change_seq)'],
+    'raffles': ['CREATE INDEX IF NOT EXISTS raffles_change_idx ON raffles (change_seq)'],
+    'invoices': ['CREATE INDEX IF NOT EXISTS invoices_seller_change_idx ON invoices (seller_id, change_seq)',
+                 # Refs are unique per seller; the first version indexed client_ref alone.
+                 'DROP INDEX IF EXISTS invoices_client_ref_idx',
+                 '''CREATE UNIQUE INDEX IF NOT EXISTS invoices_seller_client_ref_idx
+                    ON invoices (seller_id, client_ref) WHERE client_ref IS NOT NULL'''],
+}
+_SYNC_DELETIONS = '''
+    CREATE TABLE IF NOT EXISTS sync_deletions (
+        id {id},
+        seq INTEGER NOT NULL,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        seller_id INTEGER NOT NULL
+    )
+'''
+_SYNC_DELETIONS_INDEX = 'CREATE INDEX IF NOT EXISTS sync_deletions_seller_seq_idx ON sync_deletions (seller_id, seq)'
+
+_RAFFLE_STATS = '''
+    CREATE TABLE IF NOT EXISTS raffle_stats (
+        raffle_id INTEGER NOT NULL,
+        seller_id INTEGER NOT NULL,
+        invoice_count INTEGER NOT NULL DEFAULT 0,
+        sales_total REAL NOT NULL DEFAULT 0,
+        billete_units INTEGER NOT NULL DEFAULT 0,
+        chance_units INTEGER NOT NULL DEFAULT 0,
+        payouts_total REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (raffle_id, seller_id)
+    )
+'''
+
+SQLITE_INDEXES = [
+    '''CREATE INDEX IF NOT EXISTS invoice_items_raffle_number_idx
+       ON invoice_items (raffle_id, number, item_type, quantity, invoice_id, client_id, seller_id)''',
+] + _KEY_INDEXES
+POSTGRES_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS invoice_items_invoice_idx ON invoice_items (invoice_id)',
+    '''CREATE INDEX IF NOT EXISTS invoice_items_raffle_number_idx
+       ON invoice_items (raffle_id, number) INCLUDE (item_type, quantity, invoice_id, client_id, seller_id, id)''',
+] + _KEY_INDEXES
+
+
+def _columns(conn, table):
+    # table_xinfo also lists generated columns.
+    return [row[1] for row in conn.execute(f'PRAGMA table_xinfo({table})')]
+
+
+# --- SQLite ---
+def migrate_sqlite(conn, label):
+    import queries
+    existing = _columns(conn, 'invoice_items')
+    for column in ITEM_COLUMNS:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE invoice_items ADD COLUMN {column} INTEGER')
+    updated = conn.execute('''
+        UPDATE invoice_items SET raffle_id = i.raffle_id, seller_id = i.seller_id, client_id = i.client_id
+        FROM invoices i
+        WHERE invoice_items.invoice_id = i.id
+          AND (invoice_items.raffle_id IS NULL OR invoice_items.seller_id IS NULL OR invoice_items.client_id IS NULL)
+    ''').rowcount
+    for column, expression in NUMBER_KEYS.items():
+        if column not in existing:
+            # Only VIRTUAL generated columns can be added to an existing table.
+            conn.execute(f'ALTER TABLE invoice_items ADD COLUMN {column} INTEGER GENERATED ALWAYS AS ({expression}) VIRTUAL')
+    for sql in SQLITE_INDEXES:
+        conn.execute(sql)
+    # Archive files only hold invoices of the delta-sync tables, and no users.
+    for table, columns in SYNC_COLUMNS.items():
+        existing = _columns(conn, table)
+        if not existing:
+            continue
+        for column in columns:
+            if column.split()[0] not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column}')
+        for sql in SYNC_INDEXES[table]:
+            conn.execute(sql)
+    if _columns(conn, 'users'):
+        conn.execute(queries.sql_for('version.create_table', 'sqlite'))
+        conn.execute(_SYNC_DELETIONS.format(id='INTEGER PRIMARY KEY AUTOINCREMENT'))
+        conn.execute(_SYNC_DELETIONS_INDEX)
+        conn.execute(_RAFFLE_STATS)
+    conn.commit()
+    print(f'{label}: invoice_items backfilled for {updated} rows.')
+
+
+# --- PostgreSQL ---
+_FOREIGN_KEYS = {
+    'invoice_items': ['FOREIGN KEY (invoice_id) REFERENCES invoices (id)',
+                      'FOREIGN KEY (raffle_id) REFERENCES raffles (id)',
+                      'FOREIGN KEY (seller_id) REFERENCES users (id)',
+                      'FOREIGN KEY (client_id) REFERENCES clients (id)'],
+    'winners': ['FOREIGN KEY (raffle_id) REFERENCES raffles (id)',
+                'FOREIGN KEY (invoice_id) REFERENCES invoices (id)',
+                'FOREIGN KEY (client_id) REFERENCES clients (id)',
+                'FOREIGN KEY (seller_id) REFERENCES users (id)'],
+}
+
+
+def _is_partitioned(cur, table):
+    cur.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', (table,))
+    return cur.fetchone() is not None
+
+
+def _plain_columns(cur, table):
+    """Column list without generated columns, which INSERT cannot set."""
+    cur.execute('''
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = %s AND is_generated = 'NEVER' ORDER BY ordinal_position
+    ''', (table,))
+    return ', '.join(row[0] for row in cur.fetchall())
+
+
+def _ensure_partition(cur, table, raffle_id):
+    """Creates a raffle's partition, moving its rows out of the DEFAULT partition."""
+    cur.execute('SELECT 1 FROM pg_class WHERE relname = %s', (f'{table}_r{raffle_id}',))
+    if cur.fetchone() is not None:
+        return False
+    # A partition cannot be created while DEFAULT holds rows that belong to it.
+    cur.execute(f'CREATE TEMP TABLE moving AS SELECT * FROM {table}_default WHERE raffle_id = %s', (raffle_id,))
+    cur.execute(f'DELETE FROM {table}_default WHERE raffle_id = %s', (raffle_id,))
+    cur.execute(f'CREATE TABLE {table}_r{raffle_id} PARTITION OF {table} FOR VALUES IN ({raffle_id})')
+    columns = _plain_columns(cur, table)
+    cur.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM moving')
+    cur.execute('DROP TABLE moving')
+    return True
+
+
+def _partition_table(cur, table, raffle_ids):
+    """Rebuilds an ordinary table as a table partitioned by raffle_id."""
+    old = f'{table}_unpartitioned'
+    cur.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    for column in ITEM_COLUMNS if table == 'invoice_items' else ('raffle_id',):
+        cur.execute(f'ALTER TABLE {old} ALTER COLUMN {column} SET NOT NULL')
+    cur.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING GENERATED) PARTITION BY LIST (raffle_id)')
+    cur.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    for raffle_id in raffle_ids:
+        cur.execute(f'CREATE TABLE {table}_r{raffle_id} PARTITION OF {table} FOR VALUES IN ({raffle_id})')
+    columns = _plain_columns(cur, old)
+    cur.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {old}')
+    # The id sequence belongs to the old table's column; keep it for the new one.
+    cur.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+    cur.execute(f'DROP TABLE {old}')
+    cur.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    cur.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, raffle_id)')
+    for constraint in _FOREIGN_KEYS[table]:
+        cur.execute(f'ALTER TABLE {table} ADD {constraint}')
+
+
+def migrate_postgres(conn):
+    import queries
+    from database import PARTITIONED_TABLES
+    cur = conn.cursor()
+    for column in ITEM_COLUMNS:
+        cur.execute(f'ALTER TABLE invoice_items ADD COLUMN IF NOT EXISTS {column} INTEGER')
+    cur.execute('''
+        UPDATE invoice_items ii SET raffle_id = i.raffle_id, seller_id = i.seller_id, client_id = i.client_id
+        FROM invoices i
+        WHERE ii.invoice_id = i.id AND (ii.raffle_id IS NULL OR ii.seller_id IS NULL OR ii.client_id IS NULL)
+    ''')
+    print(f'invoice_items backfilled for {cur.rowcount} rows.')
+    for column, expression in NUMBER_KEYS.items():
+        cur.execute(f'ALTER TABLE invoice_items ADD COLUMN IF NOT EXISTS {column} INTEGER GENERATED ALWAYS AS ({expression}) STORED')
+
+    cur.execute('SELECT id FROM raffles ORDER BY id')
+    raffle_ids = [row[0] for row in cur.fetchall()]
+    for table in PARTITIONED_TABLES:
+        if not _is_partitioned(cur, table):
+            _partition_table(cur, table, raffle_ids)
+            print(f'{table}: partitioned into {len(raffle_ids)} raffle partitions.')
+        else:
+            created = sum(_ensure_partition(cur, table, raffle_id) for raffle_id in raffle_ids)
+            print(f'{table}: already partitioned, {created} partitions added.')
+    for sql in POSTGRES_INDEXES:
+        cur.execute(sql)
+    for table, columns in SYNC_COLUMNS.items():
+        for column in columns:
+            cur.execute(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column}')
+        for sql in SYNC_INDEXES[table]:
+            cur.execute(sql)
+    cur.execute(queries.sql_for('version.create_table', 'postgres'))
+    cur.execute(_SYNC_DELETIONS.format(id='SERIAL PRIMARY KEY'))
+    cur.execute(_SYNC_DELETIONS_INDEX)
+    cur.execute(_RAFFLE_STATS)
+    conn.commit()
+    cur.close()
+
+
+def drop_archive_counters(archive, raffle_id):
+    """Removes a stray resource_versions table from an archive file.
+
+    While it exists it shadows the main file's table on the raffle's
+    connections, so version and sync bumps of that raffle went to the
+    archive. Once it is gone the raffle is stamped again from the main
+    file's counters.
+    """
+    import queries
+    import sync
+    from database import write
+
+    if not archive.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'resource_versions'").fetchone():
+        return
+
+    def job(cur):
+        # In the raffle's own transaction: once main (the archive) has no
+        # table of that name, the counters below resolve to the main file.
+        queries.execute_sql(cur, 'DROP TABLE main.resource_versions')
+        queries.execute_sql(cur, 'UPDATE raffles SET change_seq = %s WHERE id = %s', (sync.next_seq(cur), raffle_id))
+        for resource in ('raffles', f'winners:{raffle_id}'):
+            queries.fetch_one(cur, 'version.bump', (resource,))
+    write(job, raffle_id)
+    print(f'raffle {raffle_id}: dropped the archive copy of resource_versions, counters bumped.')
+
+
+def fill_raffle_stats():
+    """Computes raffle_stats from the base tables, unless it already has rows."""
+    import queries
+    import raffle_stats
+    from database import get_cursor, get_db_connection
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    filled = bool(queries.fetch_all(cur, 'raffle_stats.all'))
+    raffle_ids = [row.id for row in queries.fetch_all(cur, 'raffle.options')]
+    cur.close()
+    conn.close()
+    if filled:
+        print('raffle_stats: already filled (see scripts/check_raffle_stats.py).')
+        return
+    for raffle_id in raffle_ids:
+        raffle_stats.check_raffle(raffle_id, fix=True)
+    print(f'raffle_stats: filled for {len(raffle_ids)} raffles.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='SQLite file (defaults to SQLITE_PATH / lottery.db)')
+    args = parser.parse_args()
+    if args.db:
+        os.environ['SQLITE_PATH'] = os.path.abspath(args.db)
+
+    import database
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    if isinstance(conn, sqlite3.Connection):
+        migrate_sqlite(conn, database.SQLITE_PATH)
+        conn.close()
+        for raffle_id in database.archived_raffle_ids():
+            archive = sqlite3.connect(database.archive_path(raffle_id))
+            migrate_sqlite(archive, database.archive_path(raffle_id))
+            drop_archive_counters(archive, raffle_id)
+            archive.close()
+    else:
+        migrate_postgres(conn)
+        conn.close()
+    fill_raffle_stats()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Memory and speed of RaffleBook versus lists of row dicts for one raffle.
+
+Run from the repository root (needs numpy):
+
+    python scripts/raffle_book_report.py [raffle_id] [--db bench.db]
+
+Without raffle_id the raffle with the most items is used. The snapshot is
+written to a temporary directory, so nothing under snapshots/ is touched.
+"""
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(func):
+    """Returns (result, seconds, bytes allocated and still held)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('raffle_id', type=int, nargs='?')
+    parser.add_argument('--db', help='SQLite file (defaults to SQLITE_PATH / lottery.db)')
+    args = parser.parse_args()
+    if args.db:
+        os.environ['SQLITE_PATH'] = os.path.abspath(args.db)
+
+    import queries
+    from database import get_db_connection, get_cursor
+    from raffle_book import RaffleBook
+
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    raffle_id = args.raffle_id
+    if raffle_id is None:
+        cur.execute('SELECT raffle_id, COUNT(*) AS n FROM invoice_items GROUP BY raffle_id ORDER BY n DESC LIMIT 1')
+        row = cur.fetchone()
+        if row is None:
+            raise SystemExit('No invoice items found.')
+        raffle_id = row.raffle_id
+    raffle = queries.fetch_one(cur, 'raffle.by_id', (raffle_id,))
+
+    rows, rows_s, rows_bytes = measure(lambda: [r._asdict() for r in queries.fetch_all(cur, 'invoice_item.by_raffle', (raffle_id,))])
+    book, book_s, book_bytes = measure(lambda: RaffleBook.from_db(conn, raffle_id))
+    print(f'Raffle {raffle_id}: {len(book)} items')
+    print(f'  row dicts : {rows_bytes / 1024:10.1f} KiB  loaded in {rows_s * 1000:8.2f} ms')
+    print(f'  RaffleBook: {book_bytes / 1024:10.1f} KiB  loaded in {book_s * 1000:8.2f} ms  (arrays: {book.nbytes / 1024:.1f} KiB)')
+    print(f'  ratio     : {rows_bytes / max(book_bytes, 1):.1f}x smaller')
+
+    # Units per seller: Python loop over dicts vs vectorized group-by.
+    start = time.perf_counter()
+    per_seller = collections.Counter()
+    for r in rows:
+        per_seller[r['seller_id']] += r['quantity']
+    loop_s = time.perf_counter() - start
+    start = time.perf_counter()
+    sellers, units = book.by_seller(book.quantity)
+    vec_s = time.perf_counter() - start
+    assert dict(zip(sellers.tolist(), units.astype(int).tolist())) == dict(per_seller)
+    print(f'  units per seller: loop {loop_s * 1000:.2f} ms, vectorized {vec_s * 1000:.2f} ms')
+
+    if raffle.results_entered:
+        start = time.perf_counter()
+        payouts = book.payouts(raffle.first_prize, raffle.second_prize, raffle.third_prize)
+        payout_s = time.perf_counter() - start
+        cur.execute(queries.render('SELECT COALESCE(SUM(total_payout), 0) AS total FROM winners WHERE raffle_id = %s',
+                                   'sqlite' if 'DATABASE_URL' not in os.environ else 'postgres'), (raffle_id,))
+        stored = cur.fetchone().total
+        print(f'  total payout {payouts.sum():.2f} (winners table: {stored:.2f}) in {payout_s * 1000:.2f} ms')
+
+    with tempfile.TemporaryDirectory() as directory:
+        book.save(directory)
+        snap, snap_s, _ = measure(lambda: RaffleBook.from_snapshot(raffle_id, directory))
+        print(f'  snapshot mmap load: {snap_s * 1000:.2f} ms')
+        del snap
+
+    cur.close()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Builds (or rebuilds) the snapshot files of closed raffles.
+
+New snapshots are written automatically when results are entered; run this
+once after deploying, or after renaming clients/sellers whose old names
+should no longer appear in closed raffles. Run from the repository root:
+
+    python scripts/snapshot_raffles.py            # every closed raffle
+    python scripts/snapshot_raffles.py 12 13      # only these raffles
+    python scripts/snapshot_raffles.py --verify   # also compare with SQL
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queries
+import raffle_snapshots
+from database import get_db_connection, get_cursor
+
+
+def verify(cur, raffle_id):
+    """Compares the snapshot with the SQL results it replaces; returns a list of problems."""
+    snap = raffle_snapshots.store.get(raffle_id)
+    problems = []
+    sql_winners = [row._asdict() for row in queries.fetch_all(cur, 'winner.list', (raffle_id,))]
+    snap_winners = [row._asdict() for row in snap.winners()]
+    keys = ['id', 'invoice_id', 'client_id', 'seller_id', 'winning_number', 'prize_type', 'total_payout', 'client_name', 'seller_name']
+    if [[w[k] for k in keys] for w in sql_winners] != [[w[k] for k in keys] for w in snap_winners]:
+        problems.append('winners differ')
+    for inv in queries.fetch_all(cur, 'invoice.by_raffle', (raffle_id,)):
+        detail = queries.fetch_one(cur, 'invoice.detail', (inv.id,))
+        items = queries.fetch_all(cur, 'invoice_item.by_invoice', (inv.id,))
+        snap_detail, snap_items = snap.invoice(inv.id)
+        if (detail.total_amount, detail.client_name, detail.seller_name) != (
+                snap_detail.total_amount, snap_detail.client_name, snap_detail.seller_name):
+            problems.append(f'invoice {inv.id} differs')
+        if [(i.id, i.number, i.quantity, i.sub_total) for i in items] != [
+                (i.id, i.number, i.quantity, i.sub_total) for i in snap_items]:
+            problems.append(f'items of invoice {inv.id} differ')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('raffle_ids', type=int, nargs='*')
+    parser.add_argument('--verify', action='store_true')
+    args = parser.parse_args()
+    if not raffle_snapshots.enabled():
+        raise SystemExit('RAFFLE_SNAPSHOT_DIR is empty: snapshots are disabled.')
+
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    raffle_ids = args.raffle_ids or [r.id for r in queries.fetch_all(cur, 'raffle.with_results')]
+    failed = False
+    for raffle_id in raffle_ids:
+        start = time.perf_counter()
+        path = raffle_snapshots.write_snapshot(cur, raffle_id)
+        if path is None:
+            print(f'raffle {raffle_id}: skipped (not found or results not entered)')
+            continue
+        line = f'raffle {raffle_id}: {os.path.getsize(path) / 1024:.1f} KiB in {(time.perf_counter() - start) * 1000:.0f} ms'
+        if args.verify:
+            problems = verify(cur, raffle_id)
+            failed = failed or bool(problems)
+            line += ' - ' + ('; '.join(problems) if problems else 'matches SQL')
+        print(line)
+    cur.close()
+    conn.close()
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Access control shared by the blueprints: session decorators and mobile JWTs.
+
+Tokens are verified without an app context, so mobile_asgi.py can use the
+same functions, cache and revocation list as the Flask views. Revocations
+are stored in the revoked_tokens table, so a token revoked by one worker
+process is rejected by all of them.
+"""
+import os
+import time
+import uuid
+from functools import wraps
+
+from flask import flash, g, jsonify, redirect, request, session, url_for
+
+import queries
+from data_access import resource_versions
+from database import get_cursor, get_db_connection, write
+from token_cache import TokenCache
+
+SECRET_KEY = 'a_very_secret_key_that_should_be_changed'
+
+# Verified bearer tokens -> claims, so polling clients skip the HMAC check.
+# JWT_CACHE_SIZE=0 disables the cache.
+token_cache = TokenCache(maxsize=int(os.environ.get('JWT_CACHE_SIZE', 4096)))
+
+# Unexpired revocations (key -> exp), reloaded whenever a worker revokes a token.
+_revoked = {}
+
+
+def generate_jwt(payload, exp_seconds=60*60*24):
+    import jwt  # loaded on the first mobile login, not at startup
+    data = payload.copy()
+    data['exp'] = int(time.time()) + exp_seconds
+    # jti identifies the token in the revocation list
+    data['jti'] = uuid.uuid4().hex
+    token = jwt.encode(data, SECRET_KEY, algorithm='HS256')
+    return token
+
+
+def _revocation_key(token, data):
+    # Tokens issued before jti was added are revoked by their full value.
+    return data.get('jti', token)
+
+
+def _load_revocations(previous, current):
+    global _revoked
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    queries.execute(cur, 'token.create_table')
+    rows = queries.fetch_all(cur, 'token.active', (int(time.time()),))
+    conn.commit()
+    cur.close()
+    conn.close()
+    _revoked = {row.token_key: row.expires_at for row in rows}
+
+
+resource_versions.on_change('tokens', _load_revocations)
+
+
+def verify_jwt(token):
+    data = token_cache.get(token)
+    if data is None:
+        import jwt  # loaded on the first bearer request, not at startup
+        try:
+            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        except Exception:
+            return None
+        token_cache.put(token, data)
+    # Version 0: nothing was ever revoked.
+    if resource_versions.get('tokens') and _revocation_key(token, data) in _revoked:
+        return None
+    return data
+
+
+def revoke_jwt(token, data):
+    """Rejects the token from now on; the entry is purged once the token would have expired."""
+    key, expires_at = _revocation_key(token, data), int(data.get('exp', 0))
+    if expires_at > time.time():
+        def save(cur):
+            queries.execute(cur, 'token.create_table')
+            queries.execute(cur, 'token.purge_expired', (int(time.time()),))
+            queries.execute(cur, 'token.revoke', (key, expires_at))
+            resource_versions.bump(cur, 'tokens')
+
+        write(save)
+        _revoked[key] = expires_at
+    token_cache.discard(token)
+
+
+def current_seller_id():
+    """The logged-in seller's id, or None for an admin (who sees every seller's data)."""
+    return session['user_id'] if session.get('user_role') == 'seller' else None
+
+
+# --- Decorators for access control ---
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return redirect(url_for('auth.login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session or session.get('user_role') != 'admin':
+            flash('Acceso no autorizado.', 'danger')
+            return redirect(url_for('auth.login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def seller_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session or session.get('user_role') != 'seller':
+            flash('Acceso no autorizado.', 'danger')
+            return redirect(url_for('auth.login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def mobile_auth_required(func):
+    def wrapper(*args, **kwargs):
+        # Try session first
+        if 'user_id' in session and session.get('user_role') == 'seller':
+            g.user_id = session['user_id']
+            return func(*args, **kwargs)
+
+        # Else try Authorization header with Bearer token
+        auth = request.headers.get('Authorization', '')
+        if auth.startswith('Bearer '):
+            token = auth.split(' ', 1)[1]
+            data = verify_jwt(token)
+            if data and data.get('role') == 'seller':
+                g.user_id = data.get('user_id')
+                g.token = token
+                g.token_claims = data
+                return func(*args, **kwargs)
+
+        return jsonify({'error': 'Unauthorized'}), 401
+    wrapper.__name__ = func.__name__
+    return wrapper
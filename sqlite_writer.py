@@ -0,0 +1,143 @@
+"""Single writer thread for SQLite, with group commit.
+
+SQLite lets one connection write at a time. With a connection per request,
+concurrent writers wait on the database lock, and every commit pays for its
+own fsync. When all writes go through this one thread instead, writes that
+arrive together share a transaction. The thread:
+
+* takes everything already waiting in the queue, plus whatever arrives
+  within `window` seconds, up to `max_batch` jobs;
+* runs each job in its own SAVEPOINT, so a failing job rolls back only its
+  own changes and its caller gets the exception;
+* commits the batch once, then hands each caller its result.
+
+Jobs that have a `combine(cur, jobs)` attribute (see sales.SaleJob) can go
+further: the jobs of a batch that share it are run by a single
+combine call, which returns one result per job, so they can share
+multi-row statements. If that call fails, those jobs are run one by one
+instead, each in its own savepoint.
+
+database.write() is the entry point. It uses a writer when SQLITE_TUNING=1
+(see database.py). Jobs are callables taking a cursor. They must not commit
+or roll back themselves.
+"""
+import concurrent.futures
+import queue
+import threading
+import time
+
+
+class GroupCommitWriter:
+    def __init__(self, connect, window=0.002, max_batch=100, combine=True):
+        self._connect = connect  # () -> (connection, cursor), called on the writer thread
+        self.window = window
+        self.max_batch = max_batch
+        self.combine = combine
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Counters for benchmarks: average batch size = jobs / batches.
+        self.batches = 0
+        self.jobs = 0
+        self.combined = 0  # jobs that shared a combine call with at least one other job
+        self.busy = 0.0  # seconds spent between BEGIN and COMMIT
+
+    def submit(self, job):
+        """Runs job(cur) on the writer thread; returns its result or raises its exception."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    # Started on first use, so a server that forks workers after
+                    # importing the app gets one writer per worker.
+                    self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                    self._thread.start()
+        future = concurrent.futures.Future()
+        self._queue.put((job, future))
+        return future.result()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = cur = None
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn, cur = self._connect()
+                outcomes = self._commit(conn, cur, batch)
+            except Exception as exc:
+                # BEGIN or COMMIT failed: nothing in the batch was written.
+                try:
+                    conn.rollback()
+                except Exception:
+                    conn = cur = None  # reconnect for the next batch
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.jobs += len(batch)
+            self.busy += time.perf_counter() - started
+            for future, ok, value in outcomes:
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _commit(self, conn, cur, batch):
+        outcomes = []
+        groups = {}
+        cur.execute('BEGIN IMMEDIATE')
+        for job, future in batch:
+            combine = getattr(job, 'combine', None) if self.combine else None
+            if combine is None:
+                outcomes.append(self._run_one(cur, job, future))
+            else:
+                groups.setdefault(combine, []).append((job, future))
+        for combine, group in groups.items():
+            if len(group) == 1:
+                outcomes.append(self._run_one(cur, *group[0]))
+            else:
+                outcomes.extend(self._run_group(cur, combine, group))
+        conn.commit()
+        return outcomes
+
+    def _run_one(self, cur, job, future):
+        cur.execute('SAVEPOINT job')
+        try:
+            result = job(cur)
+        except Exception as exc:
+            cur.execute('ROLLBACK TO job')
+            cur.execute('RELEASE job')
+            return future, False, exc
+        cur.execute('RELEASE job')
+        return future, True, result
+
+    def _run_group(self, cur, combine, group):
+        cur.execute('SAVEPOINT job_group')
+        try:
+            results = combine(cur, [job for job, _ in group])
+        except Exception:
+            cur.execute('ROLLBACK TO job_group')
+            cur.execute('RELEASE job_group')
+            # Find out which job failed: only its caller gets the error.
+            return [self._run_one(cur, job, future) for job, future in group]
+        cur.execute('RELEASE job_group')
+        self.combined += len(group)
+        return [(future, True, result) for (_, future), result in zip(group, results)]
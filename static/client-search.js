@@ -0,0 +1,82 @@
+// Typeahead client lookups against /api/clients/search, shared by the sale forms
+// and the client list so pages no longer embed every client row.
+(function () {
+    function debounce(fn, wait) {
+        let timer = null;
+        return function () {
+            const args = arguments;
+            clearTimeout(timer);
+            timer = setTimeout(function () { fn.apply(null, args); }, wait);
+        };
+    }
+
+    let lastRequest = 0;
+
+    // Without a connection, sellers search their offline copy (offline-sync.js).
+    function searchOffline(query, limit) {
+        return window.OfflineSync ? OfflineSync.searchClients(query, limit).catch(function () { return []; })
+                                  : Promise.resolve([]);
+    }
+
+    // Resolves with the matching clients, or null if a newer search superseded this one.
+    function search(query, limit) {
+        const requestId = ++lastRequest;
+        const url = '/api/clients/search?q=' + encodeURIComponent(query) + '&limit=' + (limit || 10);
+        const lookup = navigator.onLine === false ? searchOffline(query, limit)
+            : fetch(url, { credentials: 'same-origin' })
+                .then(function (r) { return r.ok ? r.json() : []; })
+                .catch(function () { return searchOffline(query, limit); });
+        return lookup.then(function (clients) { return requestId === lastRequest ? clients : null; });
+    }
+
+    function label(client) {
+        return ((client.name || '') + ' ' + (client.last_name || '')).trim();
+    }
+
+    // Turns a text input into a client picker: matches are listed under it and the
+    // chosen client's id is written to the hidden input that the form submits.
+    function attachPicker(input, hidden, list) {
+        function choose(client) {
+            hidden.value = client.id;
+            input.value = label(client);
+            list.innerHTML = '';
+        }
+
+        const run = debounce(function () {
+            const q = input.value.trim();
+            if (!q) { list.innerHTML = ''; return; }
+            search(q, 10).then(function (clients) {
+                if (clients === null) return;
+                list.innerHTML = '';
+                clients.forEach(function (client) {
+                    const li = document.createElement('li');
+                    li.textContent = label(client) + (client.phone ? ' · ' + client.phone : '');
+                    li.addEventListener('mousedown', function (e) { e.preventDefault(); choose(client); });
+                    li.client = client;
+                    list.appendChild(li);
+                });
+                if (!clients.length) {
+                    const li = document.createElement('li');
+                    li.className = 'empty';
+                    li.textContent = 'Sin resultados';
+                    list.appendChild(li);
+                }
+            });
+        }, 150);
+
+        input.addEventListener('input', function () {
+            hidden.value = '';
+            run();
+        });
+        input.addEventListener('keydown', function (e) {
+            if (e.key !== 'Enter') return;
+            const first = list.querySelector('li');
+            if (first && first.client) choose(first.client);
+        });
+        input.addEventListener('blur', function () {
+            setTimeout(function () { list.innerHTML = ''; }, 150);
+        });
+    }
+
+    window.ClientSearch = { search: search, label: label, debounce: debounce, attachPicker: attachPicker };
+})();
@@ -0,0 +1,234 @@
+// Offline copy of the seller's clients, open raffles and invoices, kept current through
+// /api/mobile/sync, plus the outbox of sales made without a connection. Loaded by the
+// pages (window.OfflineSync) and by the service worker (importScripts), so both can
+// flush the outbox.
+(function (scope) {
+    const DB_NAME = 'lotoweb';
+    const DB_VERSION = 1;
+    // Same as SALES_BATCH_MAX in app.py.
+    const BATCH_SIZE = 200;
+    const SYNC_TAG = 'sales-outbox';
+
+    let dbPromise = null;
+
+    function openDb() {
+        if (!dbPromise) {
+            dbPromise = new Promise(function (resolve, reject) {
+                const req = scope.indexedDB.open(DB_NAME, DB_VERSION);
+                req.onupgradeneeded = function () {
+                    const db = req.result;
+                    db.createObjectStore('meta');
+                    db.createObjectStore('clients', { keyPath: 'id' });
+                    db.createObjectStore('raffles', { keyPath: 'id' });
+                    db.createObjectStore('invoices', { keyPath: 'id' }).createIndex('sorteo_id', 'sorteo_id');
+                    db.createObjectStore('outbox', { keyPath: 'client_ref' });
+                };
+                req.onsuccess = function () { resolve(req.result); };
+                req.onerror = function () { reject(req.error); };
+            });
+        }
+        return dbPromise;
+    }
+
+    function result(req) {
+        return new Promise(function (resolve, reject) {
+            req.onsuccess = function () { resolve(req.result); };
+            req.onerror = function () { reject(req.error); };
+        });
+    }
+
+    function done(tx) {
+        return new Promise(function (resolve, reject) {
+            tx.oncomplete = function () { resolve(); };
+            tx.onerror = tx.onabort = function () { reject(tx.error); };
+        });
+    }
+
+    function readAll(storeName) {
+        return openDb().then(function (db) {
+            return result(db.transaction(storeName).objectStore(storeName).getAll());
+        });
+    }
+
+    function meta() {
+        return openDb().then(function (db) {
+            const store = db.transaction('meta').objectStore('meta');
+            return Promise.all([result(store.get('version')), result(store.get('seller_id'))]);
+        }).then(function (values) {
+            return { version: values[0] || 0, sellerId: values[1] || null };
+        });
+    }
+
+    // Applies one /api/mobile/sync answer in a single transaction.
+    function apply(data) {
+        return openDb().then(function (db) {
+            const tx = db.transaction(['meta', 'clients', 'raffles', 'invoices'], 'readwrite');
+            const clients = tx.objectStore('clients');
+            const raffles = tx.objectStore('raffles');
+            const invoices = tx.objectStore('invoices');
+            if (data.full) {
+                clients.clear();
+                raffles.clear();
+                invoices.clear();
+            }
+            data.clients.forEach(function (c) { clients.put(c); });
+            data.deleted.clients.forEach(function (id) { clients.delete(id); });
+            data.invoices.forEach(function (i) { invoices.put(i); });
+            data.deleted.invoices.forEach(function (id) { invoices.delete(id); });
+            // A closed raffle takes its invoices with it.
+            data.raffles.forEach(function (r) {
+                if (!r.closed) { raffles.put(r); return; }
+                raffles.delete(r.id);
+                invoices.index('sorteo_id').openKeyCursor(IDBKeyRange.only(r.id)).onsuccess = function (e) {
+                    const cursor = e.target.result;
+                    if (!cursor) return;
+                    invoices.delete(cursor.primaryKey);
+                    cursor.continue();
+                };
+            });
+            const metaStore = tx.objectStore('meta');
+            metaStore.put(data.version, 'version');
+            metaStore.put(data.seller_id, 'seller_id');
+            return done(tx);
+        });
+    }
+
+    // Fetches what changed since the stored version. Resolves with the new
+    // version, or rejects when offline or logged out.
+    function sync() {
+        return meta().then(function (m) {
+            return fetch('/api/mobile/sync?since=' + m.version, { credentials: 'same-origin' })
+                .then(function (r) {
+                    if (!r.ok) throw new Error('sync failed: ' + r.status);
+                    return r.json();
+                })
+                .then(function (data) {
+                    // Another seller logged in on this device: start over from a full copy.
+                    if (!data.full && data.seller_id !== m.sellerId) {
+                        return apply({ version: 0, full: true, seller_id: data.seller_id, clients: [], raffles: [],
+                                       invoices: [], deleted: { clients: [], invoices: [] } }).then(sync);
+                    }
+                    return apply(data).then(function () { return data.version; });
+                });
+        });
+    }
+
+    function newRef() {
+        if (scope.crypto && scope.crypto.randomUUID) return scope.crypto.randomUUID();
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    }
+
+    // Stores a sale {sorteo_id, client_id, items: [{number, quantity}]} for upload.
+    function queueSale(sale) {
+        return meta().then(function (m) {
+            const entry = {
+                client_ref: newRef(), seller_id: m.sellerId, status: 'pending', queued_at: new Date().toISOString(),
+                sorteo_id: sale.sorteo_id, client_id: sale.client_id, items: sale.items
+            };
+            return openDb().then(function (db) {
+                const tx = db.transaction('outbox', 'readwrite');
+                tx.objectStore('outbox').put(entry);
+                return done(tx);
+            }).then(function () {
+                // Background Sync retries the upload even after the page is closed.
+                if (scope.navigator && scope.navigator.serviceWorker) {
+                    scope.navigator.serviceWorker.ready.then(function (reg) {
+                        if (reg.sync) return reg.sync.register(SYNC_TAG);
+                    }).catch(function () { /* flushed on the next 'online' event instead */ });
+                }
+                return entry;
+            });
+        });
+    }
+
+    function uploadBatch(entries) {
+        const body = { sales: entries.map(function (e) {
+            return { client_ref: e.client_ref, sorteo_id: e.sorteo_id, client_id: e.client_id, items: e.items };
+        }) };
+        return fetch('/api/mobile/sales/batch', {
+            method: 'POST', credentials: 'same-origin',
+            headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(body)
+        }).then(function (r) {
+            if (!r.ok) throw new Error('upload failed: ' + r.status);
+            return r.json();
+        }).then(function (data) {
+            return openDb().then(function (db) {
+                const tx = db.transaction('outbox', 'readwrite');
+                const outbox = tx.objectStore('outbox');
+                let saved = 0;
+                data.results.forEach(function (res, n) {
+                    if (res.status === 201) {
+                        outbox.delete(entries[n].client_ref);
+                        saved++;
+                    } else {
+                        // Kept, so the seller can see what was refused and why.
+                        outbox.put(Object.assign({}, entries[n], { status: 'rejected', error: res.error }));
+                    }
+                });
+                return done(tx).then(function () { return saved; });
+            });
+        });
+    }
+
+    // Uploads the current seller's pending sales; resolves with the number saved.
+    function flush() {
+        return Promise.all([meta(), readAll('outbox')]).then(function (values) {
+            const pending = values[1].filter(function (e) {
+                return e.status === 'pending' && e.seller_id === values[0].sellerId;
+            });
+            let saved = 0;
+            let chain = Promise.resolve();
+            for (let start = 0; start < pending.length; start += BATCH_SIZE) {
+                const chunk = pending.slice(start, start + BATCH_SIZE);
+                chain = chain.then(function () { return uploadBatch(chunk); }).then(function (n) { saved += n; });
+            }
+            return chain.then(function () { return saved; });
+        });
+    }
+
+    function outboxCounts() {
+        return readAll('outbox').then(function (entries) {
+            const counts = { pending: 0, rejected: 0 };
+            entries.forEach(function (e) { counts[e.status]++; });
+            return counts;
+        });
+    }
+
+    function openRaffles(now) {
+        return readAll('raffles').then(function (raffles) {
+            const cutoff = now || new Date();
+            return raffles
+                .filter(function (r) { return new Date(r.date.replace(' ', 'T')) > cutoff; })
+                .sort(function (a, b) { return a.date < b.date ? -1 : 1; });
+        });
+    }
+
+    // Same keys and matching as client_index.py: a prefix of the first name, last
+    // name, full name, any of their words or the phone digits, ignoring accents.
+    function normalize(text) {
+        return (text || '').normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase().trim();
+    }
+
+    function clientKeys(c) {
+        const name = normalize(c.name);
+        const lastName = normalize(c.last_name);
+        const keys = [name, lastName, (name + ' ' + lastName).trim()]
+            .concat(name.split(/\s+/), lastName.split(/\s+/), [(c.phone || '').replace(/\D/g, '')]);
+        return keys.filter(Boolean);
+    }
+
+    function searchClients(query, limit) {
+        const prefix = normalize(query);
+        if (!prefix) return Promise.resolve([]);
+        return readAll('clients').then(function (clients) {
+            return clients.filter(function (c) {
+                return clientKeys(c).some(function (k) { return k.indexOf(prefix) === 0; });
+            }).slice(0, limit || 10);
+        });
+    }
+
+    scope.OfflineSync = {
+        SYNC_TAG: SYNC_TAG, sync: sync, queueSale: queueSale, flush: flush, outboxCounts: outboxCounts,
+        openRaffles: openRaffles, searchClients: searchClients
+    };
+})(self);
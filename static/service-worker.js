@@ -1,13 +1,22 @@
 // Minimal service worker using cache-first for app shell
-const CACHE_NAME = 'lotoweb-v1';
+// offline-sync.js (IndexedDB copy and sales outbox) is shared with the pages.
+importScripts('/static/offline-sync.js');
+
+const CACHE_NAME = 'lotoweb-v2';
 // Keep APP_SHELL minimal and avoid caching the site root to prevent serving a bad cached
 // response for '/' which can cause navigation failures in some environments.
 const APP_SHELL = [
   '/static/style.css',
+  '/static/client-search.js',
+  '/static/offline-sync.js',
   '/static/icons/icon-192x192.png',
   '/static/icons/icon-512x512.png'
 ];
 
+// Pages kept from the last online visit so they open without a connection; the
+// sale form then works from IndexedDB and queues its sales.
+const OFFLINE_PAGES = ['/sales/new'];
+
 // Fallback page for navigation requests when network is unavailable
 const NAV_FALLBACK = '/lh-test';
 
@@ -24,20 +33,36 @@ self.addEventListener('install', (event) => {
 });
 
 self.addEventListener('activate', (event) => {
-  event.waitUntil(self.clients.claim());
+  event.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(names.filter((name) => name !== CACHE_NAME).map((name) => caches.delete(name))))
+      .then(() => self.clients.claim())
+  );
 });
 
 self.addEventListener('fetch', (event) => {
   // For navigation requests (page loads), try network first then fall back to cached NAV_FALLBACK.
   if (event.request.mode === 'navigate') {
+    const path = new URL(event.request.url).pathname;
+    const keep = event.request.method === 'GET' && OFFLINE_PAGES.includes(path);
     event.respondWith(
       fetch(event.request).then((response) => {
+        if (keep && response.ok && !response.redirected) {
+          const copy = response.clone();
+          caches.open(CACHE_NAME).then((cache) => cache.put(path, copy));
+        }
         return response;
-      }).catch(() => caches.match(NAV_FALLBACK))
+      }).catch(() => (keep ? caches.match(path) : Promise.resolve(null))
+        .then((cached) => cached || caches.match(NAV_FALLBACK)))
     );
     return;
   }
 
+  // API calls always go to the network: the pages fall back to IndexedDB themselves.
+  if (event.request.method !== 'GET' || new URL(event.request.url).pathname.startsWith('/api/')) {
+    return;
+  }
+
   // For other requests, use cache-first for performance
   event.respondWith(
     caches.match(event.request).then((response) => {
@@ -45,3 +70,10 @@ self.addEventListener('fetch', (event) => {
     })
   );
 });
+
+// Background Sync: upload the sales queued while offline, then refresh the copy.
+self.addEventListener('sync', (event) => {
+  if (event.tag === OfflineSync.SYNC_TAG) {
+    event.waitUntil(OfflineSync.flush().then(() => OfflineSync.sync()));
+  }
+});
@@ -0,0 +1,91 @@
+"""Fingerprinted, precompressed static files (built by scripts/build_static.py).
+
+The build copies every file under static/ to static/dist/ with its content
+hash in the name (style.css -> style.3f2a1b9c.css), adds .br and .gz variants
+of the text files and writes static/dist/assets.json. When that manifest
+exists:
+
+* url_for('static', filename='style.css') returns /assets/style.3f2a1b9c.css;
+* /assets/* picks the brotli or gzip variant the client accepts and is sent
+  with Cache-Control: immutable, since a changed file gets a new name;
+* /service-worker.js and /manifest.json are the built copies, which point at
+  the hashed URLs (the service worker's APP_SHELL lists all of them).
+
+Without a build, or with STATIC_BUILD=0, static/ is served as before, so
+development needs no build step.
+"""
+import json
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = os.path.join(DIST_DIR, 'assets.json')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Content-Encoding -> file suffix, in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# source name -> hashed name; empty when there is no build.
+assets = {}
+# hashed name -> encodings that have a precompressed file
+_encoded = {}
+
+
+def load():
+    """Reads the build manifest; returns False when there is none (or it is disabled)."""
+    assets.clear()
+    _encoded.clear()
+    if os.environ.get('STATIC_BUILD', '1') == '0' or not os.path.exists(MANIFEST):
+        return False
+    with open(MANIFEST) as f:
+        manifest = json.load(f)
+    assets.update(manifest['assets'])
+    _encoded.update({name: set(encodings) for name, encodings in manifest['encoded'].items()})
+    return True
+
+
+def send_asset(filename):
+    """A hashed file from static/dist, precompressed when the client accepts it."""
+    path, encoding = filename, None
+    for name, suffix in ENCODINGS:
+        if name in _encoded.get(filename, ()) and request.accept_encodings[name]:
+            path, encoding = filename + suffix, name
+            break
+    response = send_from_directory(DIST_DIR, path, mimetype=mimetypes.guess_type(filename)[0])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if filename in _encoded:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def send_root_file(filename):
+    """/service-worker.js, /manifest.json and friends: the built copy when there is one.
+
+    These keep a fixed URL, so they must be revalidated on every load.
+    """
+    directory = DIST_DIR if assets and os.path.exists(os.path.join(DIST_DIR, filename)) else STATIC_DIR
+    response = send_from_directory(directory, filename)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def init_app(app):
+    app.add_url_rule('/assets/<path:filename>', 'assets', send_asset)
+    if not load():
+        return
+    build_url = app.url_for
+
+    def url_for(endpoint, **values):
+        if endpoint == 'static' and values.get('filename') in assets:
+            values['filename'] = assets[values['filename']]
+            endpoint = 'assets'
+        return build_url(endpoint, **values)
+
+    # flask.url_for and the templates' url_for both go through the app.
+    app.url_for = url_for
+    app.jinja_env.globals['url_for'] = url_for
@@ -0,0 +1,79 @@
+"""Delta sync for the offline sales app (/api/mobile/sync).
+
+Writes to clients, raffles and invoices stamp the rows they touch with the
+next value of one change sequence: the 'sync' counter in resource_versions.
+The counter row is updated inside the writing transaction and stays locked
+until it commits, so sequence numbers become visible in order. A reader that
+sees version N has seen every change up to N. Removed rows leave an entry in
+sync_deletions with the sequence of the removal.
+
+The app keeps the version of its last sync and asks only for what changed
+after it. since=0 (or no since) returns a full copy of the seller's working
+set: their clients, the open raffles and their invoices in those raffles.
+"""
+import queries
+
+
+def next_seq(cur):
+    """Takes the next change sequence number; call inside the write transaction.
+
+    The counter lives in the main database only, also when cur belongs to an
+    archived raffle's connection (see ResourceVersions.bump).
+    """
+    return queries.fetch_one(cur, 'version.bump', ('sync',)).version
+
+
+def record_deletion(cur, seq, table, row_id, seller_id):
+    queries.execute(cur, 'sync.record_deletion', (seq, table, row_id, seller_id))
+
+
+def current_version(cur):
+    row = queries.fetch_one(cur, 'sync.version')
+    return row.version if row is not None else 0
+
+
+def _raffle(row):
+    return {'id': row.id, 'date': row.raffle_date.strftime('%Y-%m-%d %H:%M'), 'closed': bool(row.results_entered)}
+
+
+def changes(cur, seller_id, since=0):
+    """What changed for a seller after version since, up to the current version."""
+    version = current_version(cur)
+    full = since <= 0
+    # Bounding every query by the version read first keeps the answer
+    # consistent with it: later changes come with the next sync.
+    window = (-1 if full else since, version)
+
+    clients = queries.fetch_all(cur, 'sync.clients', (seller_id, *window))
+    if full:
+        raffles = queries.fetch_all(cur, 'sync.raffles_open', (version,))
+        invoices = queries.fetch_all(cur, 'sync.invoices_open', (seller_id, *window))
+        items = queries.fetch_all(cur, 'sync.invoice_items_open', (seller_id, *window))
+        deletions = []
+    else:
+        raffles = queries.fetch_all(cur, 'sync.raffles', window)
+        invoices = queries.fetch_all(cur, 'sync.invoices', (seller_id, *window))
+        items = queries.fetch_all(cur, 'sync.invoice_items', (seller_id, *window))
+        deletions = queries.fetch_all(cur, 'sync.deletions', (seller_id, *window))
+
+    items_by_invoice = {}
+    for item in items:
+        items_by_invoice.setdefault(item.invoice_id, []).append(
+            {'number': item.number, 'item_type': item.item_type, 'quantity': item.quantity, 'sub_total': item.sub_total})
+    deleted = {'clients': [], 'invoices': []}
+    for row in deletions:
+        deleted[row.table_name].append(row.row_id)
+
+    return {
+        'version': version,
+        'full': full,
+        'seller_id': seller_id,
+        'clients': [{'id': c.id, 'name': c.name, 'last_name': c.last_name, 'phone': c.phone, 'address': c.address}
+                    for c in clients],
+        'raffles': [_raffle(r) for r in raffles],
+        'invoices': [{'id': i.id, 'sorteo_id': i.raffle_id, 'client_id': i.client_id, 'total': i.total_amount,
+                      'created': i.creation_date.strftime('%Y-%m-%d %H:%M'), 'client_ref': i.client_ref,
+                      'items': items_by_invoice.get(i.id, [])}
+                     for i in invoices],
+        'deleted': deleted,
+    }
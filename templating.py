@@ -0,0 +1,40 @@
+"""Whitespace trimming for the templates that render long tables.
+
+Rows in sales.html, winners.html and clients.html are indented source lines,
+so on a page with thousands of rows most of the bytes are indentation and
+the blank lines left by {% for %}/{% if %} tags. For those templates, the
+source is trimmed before Jinja compiles it:
+
+* leading whitespace is removed from every line, along with blank lines;
+* a line holding only a block tag loses its newline too, so the tag leaves
+  nothing behind in the output.
+
+The newline that ends each remaining line stays, so words and inline
+elements are never glued together and the page renders the same. None of
+these templates use <pre> or <textarea>. TEMPLATE_TRIM=0 turns it off.
+"""
+import os
+import re
+
+from jinja2.ext import Extension
+
+enabled = os.environ.get('TEMPLATE_TRIM', '1') == '1'
+
+HEAVY_TEMPLATES = {'sales.html', 'winners.html', 'clients.html'}
+
+_INDENT = re.compile(r'^\s+', re.M)
+_BLOCK_LINE = re.compile(r'^(\{%(?:(?!%\}).)*%\})\n', re.M)
+
+
+def trim(source):
+    return _BLOCK_LINE.sub(r'\1', _INDENT.sub('', source))
+
+
+class TrimWhitespace(Extension):
+    def preprocess(self, source, name, filename=None):
+        return trim(source) if name in HEAVY_TEMPLATES else source
+
+
+def init_app(app):
+    if enabled:
+        app.jinja_env.add_extension(TrimWhitespace)
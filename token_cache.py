@@ -0,0 +1,51 @@
+"""Bounded LRU cache of verified JWTs for the mobile API.
+
+Mobile clients send the same bearer token on every poll, so once a token's
+signature has been verified its claims are kept here until the token expires
+or is pushed out by newer entries. Lookups never return claims past `exp`.
+"""
+import collections
+import threading
+import time
+
+
+class TokenCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()  # token -> claims
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        if not self.maxsize:
+            return None
+        with self._lock:
+            claims = self._entries.get(token)
+            if claims is None:
+                self.misses += 1
+                return None
+            if claims.get('exp', 0) <= time.time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token, claims):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._entries[token] = claims
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,84 @@
+"""Change counters for resources served by the cacheable JSON endpoints.
+
+Each resource ('raffles', 'clients', 'winners:<raffle_id>') has a version
+number in the resource_versions table. Writers bump it after committing
+their change, and readers build ETags from the in-memory copy so a matching
+If-None-Match can be answered with 304 before any query runs. The copy is
+reloaded every `refresh_interval` seconds so bumps made by other worker
+processes are picked up, and at once when a ChangeSignal (change_signal.py)
+shared by the workers reports a bump. Caches derived from a resource
+register with on_change() to be dropped when any process changes it.
+"""
+import threading
+import time
+
+import queries
+from database import after_commit, get_db_connection, get_cursor, in_write
+
+
+class ResourceVersions:
+    def __init__(self, refresh_interval=5.0, signal=None):
+        self.refresh_interval = refresh_interval
+        self.signal = signal
+        self._versions = {}
+        # As last read from the table; local bumps only update _versions, so
+        # on_change callbacks see every change, this process's included.
+        self._loaded = {}
+        self._listeners = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get(self, resource):
+        if (self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval
+                or (self.signal is not None and self.signal.changed())):
+            self.reload()
+        return self._versions.get(resource, 0)
+
+    def on_change(self, resource, callback):
+        """Calls callback(previous, current) when a reload finds the resource changed.
+
+        previous and current map every resource to its version before and
+        after that reload (previous is empty on the first load).
+        """
+        self._listeners.setdefault(resource, []).append(callback)
+
+    def reload(self):
+        conn = get_db_connection()
+        cur = get_cursor(conn)
+        rows = queries.fetch_all(cur, 'version.all')
+        cur.close()
+        conn.close()
+        versions = {row.resource: row.version for row in rows}
+        with self._lock:
+            previous, self._loaded = self._loaded, versions
+            self._versions = dict(versions)
+            self._loaded_at = time.monotonic()
+        for resource, callbacks in self._listeners.items():
+            if versions.get(resource) != previous.get(resource):
+                for callback in callbacks:
+                    callback(previous, versions)
+
+    def bump(self, cur, *resources):
+        """Increments the given resources.
+
+        Inside a database.write job the bump commits together with the data
+        change and the in-memory copy is updated after that commit. Elsewhere
+        call this after the data change itself has been committed: a reader
+        that sees the new data with the old version only misses a 304, while
+        the reverse order could pin stale data to a new ETag.
+
+        On an archived raffle's connection the unqualified resource_versions
+        resolves to the attached main database, as long as no archive file
+        has a table of that name: the table comes from schema.sql /
+        scripts/migrate_schema.py and is never created here.
+        """
+        bumped = {resource: queries.fetch_one(cur, 'version.bump', (resource,)).version for resource in resources}
+        if not in_write():
+            cur.connection.commit()
+        after_commit(lambda: self._update(bumped))
+
+    def _update(self, bumped):
+        with self._lock:
+            self._versions.update(bumped)
+        if self.signal is not None:
+            self.signal.notify()
@@ -0,0 +1,32 @@
+"""The app's blueprints and the process types that serve them.
+
+Each module defines `bp`, the templates its pages render (TEMPLATES) and a
+prewarm() that fills the caches its first requests would otherwise fill.
+A process type (APP_PROFILE, see app.create_app) imports and registers only
+its blueprints, so the heavy admin/report paths and the latency-sensitive
+seller/mobile paths can run in separate worker pools behind a proxy that
+routes by path:
+
+* seller:  auth, sales (/sales, /clients, /api/clients/search), mobile (/api/mobile/*)
+* reports: auth, raffles (/admin/raffles, /winners, /api/sorteos, /api/winner-payments,
+  /seller/winner-payments), reports (/admin/commissions, /my_commissions, /api/raffle-stats),
+  pdf (/sales/<id>/pdf, /sales/<id>/printpdf), admin (/admin/sellers, /admin/profiling, /metrics)
+
+Both pools serve auth (login, dashboards, the PWA files) and /assets/*.
+"""
+import importlib
+
+BLUEPRINTS = ('auth', 'sales', 'mobile', 'raffles', 'reports', 'pdf', 'admin')
+
+PROFILES = {
+    'all': BLUEPRINTS,
+    'seller': ('auth', 'sales', 'mobile'),
+    'reports': ('auth', 'raffles', 'reports', 'pdf', 'admin'),
+}
+
+
+def load(name):
+    """The view module of a blueprint, imported on first use."""
+    if name not in BLUEPRINTS:
+        raise ValueError(f'Unknown blueprint: {name}')
+    return importlib.import_module(f'views.{name}')
@@ -0,0 +1,133 @@
+"""Administration: sellers, metrics and profiling."""
+from flask import Blueprint, current_app, flash, redirect, render_template, request, send_from_directory, url_for
+from werkzeug.security import generate_password_hash
+
+import data_access
+import instrumentation
+import profiling
+import queries
+from database import get_cursor, get_db_connection, write
+from security import admin_required
+
+bp = Blueprint('admin', __name__)
+
+TEMPLATES = ('sellers.html', 'seller_form.html', 'admin_profiling.html')
+
+
+# --- Admin: Seller Management ---
+@bp.route('/admin/sellers')
+@admin_required
+def list_sellers():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    sellers = queries.fetch_all(cur, 'seller.list')
+    cur.close()
+    conn.close()
+    return render_template('sellers.html', sellers=sellers)
+
+@bp.route('/admin/sellers/new', methods=['GET', 'POST'])
+@admin_required
+def create_seller():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        name = request.form['name']
+        phone = request.form['phone']
+        province = request.form['province']
+        commission = float(request.form['commission_percentage'])
+
+        password_hash = generate_password_hash(password)
+
+        def save(cur):
+            # Checked inside the write so two requests cannot both pass it.
+            if queries.fetch_one(cur, 'user.by_username', (username,)):
+                return False
+            queries.execute(cur, 'seller.insert', (username, password_hash, name, phone, province, commission))
+            return True
+
+        if not write(save):
+            flash('El nombre de usuario ya existe.', 'danger')
+            return render_template('seller_form.html', form_action='create')
+        flash('Vendedor creado exitosamente.', 'success')
+        return redirect(url_for('admin.list_sellers'))
+
+    return render_template('seller_form.html', form_action='create')
+
+@bp.route('/admin/sellers/edit/<int:seller_id>', methods=['GET', 'POST'])
+@admin_required
+def edit_seller(seller_id):
+    if request.method == 'POST':
+        name = request.form['name']
+        phone = request.form['phone']
+        province = request.form['province']
+        commission = float(request.form['commission_percentage'])
+        
+        def save(cur):
+            queries.execute(cur, 'seller.update', (name, phone, province, commission, seller_id))
+            # Snapshot readers show seller names from data_access.snapshot_names.
+            data_access.resource_versions.bump(cur, 'sellers')
+
+        write(save)
+        flash('Vendedor actualizado exitosamente.', 'success')
+        return redirect(url_for('admin.list_sellers'))
+
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    seller = queries.fetch_one(cur, 'seller.by_id', (seller_id,))
+    cur.close()
+    conn.close()
+    if seller is None:
+        flash('Vendedor no encontrado.', 'danger')
+        return redirect(url_for('admin.list_sellers'))
+        
+    return render_template('seller_form.html', seller=seller, form_action='edit')
+
+@bp.route('/metrics')
+@admin_required
+def metrics():
+    # Prometheus text exposition of the per-route and per-query timings.
+    return instrumentation.render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+# --- Admin: Profiling ---
+@bp.route('/admin/profiling', methods=['GET', 'POST'])
+@admin_required
+def admin_profiling():
+    if request.method == 'POST':
+        route = request.form.get('route', '').strip()
+        if request.form.get('action') == 'disarm':
+            profiling.disarm(route)
+            flash(f'Perfilado desactivado para {route}.', 'info')
+        elif not route:
+            flash('Indique la ruta a perfilar.', 'danger')
+        else:
+            try:
+                profiling.arm(route, request.form.get('count', type=int) or 1, request.form.get('format', 'prof'))
+                flash(f'Se perfilarán las próximas solicitudes a {route}.', 'success')
+            except ValueError as e:
+                flash(str(e), 'danger')
+        return redirect(url_for('admin.admin_profiling'))
+
+    routes = sorted({rule.rule for rule in current_app.url_map.iter_rules() if rule.endpoint != 'static'})
+    return render_template('admin_profiling.html', routes=routes, armed=profiling.armed(),
+                           captures=profiling.captures(), html_available=profiling.html_available(),
+                           max_captures=profiling.MAX_CAPTURES)
+
+
+@bp.route('/admin/profiling/<name>')
+@admin_required
+def download_profile(name):
+    if profiling.capture_path(name) is None:
+        flash('Captura no encontrada.', 'danger')
+        return redirect(url_for('admin.admin_profiling'))
+    return send_from_directory(profiling.PROFILE_DIR, name, as_attachment=True)
+
+
+@bp.route('/admin/profiling/<name>/stats')
+@admin_required
+def profile_stats(name):
+    path = profiling.capture_path(name)
+    if path is None or not name.endswith('.prof'):
+        flash('Captura no encontrada.', 'danger')
+        return redirect(url_for('admin.admin_profiling'))
+    return profiling.stats_text(path), 200, {'Content-Type': 'text/plain; charset=utf-8'}
@@ -0,0 +1,126 @@
+"""Login, dashboards and the PWA files; registered in every process type."""
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import queries
+import raffle_stats
+import static_assets
+from database import get_cursor, get_db_connection, write
+from security import admin_required, login_required, seller_required
+
+bp = Blueprint('auth', __name__)
+
+TEMPLATES = ('login.html', 'change_password.html', 'admin_dashboard.html', 'seller_dashboard.html')
+
+
+# --- Authentication Routes ---
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        conn = get_db_connection()
+        cur = get_cursor(conn)
+        user = queries.fetch_one(cur, 'user.by_username', (username,))
+        cur.close()
+        conn.close()
+
+        if user and check_password_hash(user.password, password):
+            session.clear()
+            session['user_id'] = user.id
+            session['user_role'] = user.role
+            session['username'] = user.username
+
+            if user.role == 'admin':
+                return redirect(url_for('auth.admin_dashboard'))
+            else:
+                return redirect(url_for('auth.seller_dashboard'))
+        else:
+            flash('Usuario o contraseña incorrectos.', 'danger')
+
+    return render_template('login.html')
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    flash('Has cerrado sesión.', 'success')
+    return redirect(url_for('auth.login'))
+
+@bp.route('/change_password', methods=['GET', 'POST'])
+@login_required
+def change_password():
+    if request.method == 'POST':
+        current_password = request.form['current_password']
+        new_password = request.form['new_password']
+        confirm_password = request.form['confirm_password']
+
+        conn = get_db_connection()
+        cur = get_cursor(conn)
+        user = queries.fetch_one(cur, 'user.password_by_id', (session['user_id'],))
+        cur.close()
+        conn.close()
+
+        if user is None:
+            flash('Usuario no encontrado.', 'danger')
+            return redirect(url_for('auth.login'))
+
+        if not check_password_hash(user.password, current_password):
+            flash('Contraseña actual incorrecta.', 'danger')
+            return render_template('change_password.html')
+
+        if new_password != confirm_password:
+            flash('Las nuevas contraseñas no coinciden.', 'danger')
+            return render_template('change_password.html')
+
+        if len(new_password) < 6:
+            flash('La nueva contraseña debe tener al menos 6 caracteres.', 'danger')
+            return render_template('change_password.html')
+
+        password_hash = generate_password_hash(new_password)
+        user_id = session['user_id']
+        write(lambda cur: queries.execute(cur, 'user.update_password', (password_hash, user_id)))
+
+        flash('Contraseña actualizada exitosamente.', 'success')
+        return redirect(url_for('auth.index'))
+
+    return render_template('change_password.html')
+
+# --- Dashboard Routes ---
+@bp.route('/')
+@login_required
+def index():
+    if session['user_role'] == 'admin':
+        return redirect(url_for('auth.admin_dashboard'))
+    else:
+        return redirect(url_for('auth.seller_dashboard'))
+
+
+# Serve PWA manifest and service worker at the site root so they are discoverable by Lighthouse
+@bp.route('/manifest.json')
+def manifest():
+    return static_assets.send_root_file('manifest.json')
+
+
+@bp.route('/service-worker.js')
+def service_worker():
+    return static_assets.send_root_file('service-worker.js')
+
+
+@bp.route('/lh-test')
+def lh_test():
+    return static_assets.send_root_file('lh-test.html')
+
+@bp.route('/admin/dashboard')
+@admin_required
+def admin_dashboard():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    stats = raffle_stats.summaries(cur)
+    cur.close()
+    conn.close()
+    return render_template('admin_dashboard.html', raffle_stats=stats)
+
+@bp.route('/seller/dashboard')
+@seller_required
+def seller_dashboard():
+    return render_template('seller_dashboard.html')
@@ -0,0 +1,178 @@
+"""JSON API for the seller app (/api/mobile/*), authenticated by session or bearer token.
+
+mobile_asgi.py serves the same endpoints on an event loop and mounts the
+Flask app for the rest.
+"""
+import datetime
+
+from flask import Blueprint, g, jsonify, request
+from werkzeug.security import check_password_hash
+
+import data_access
+import queries
+import sales
+import sync
+from database import get_cursor, get_db_connection
+from security import generate_jwt, mobile_auth_required, revoke_jwt
+
+bp = Blueprint('mobile', __name__)
+
+TEMPLATES = ()
+
+
+def prewarm():
+    data_access.resource_versions.reload()
+
+
+@bp.route('/api/mobile/login', methods=['POST'])
+def mobile_login():
+    body = request.get_json() or {}
+    username = body.get('username')
+    password = body.get('password')
+    if not username or not password:
+        return jsonify({'error': 'username and password required'}), 400
+
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    user = queries.fetch_one(cur, 'user.by_username', (username,))
+    cur.close()
+    conn.close()
+
+    if not user:
+        return jsonify({'error': 'invalid credentials'}), 401
+
+    if not check_password_hash(user.password, password):
+        return jsonify({'error': 'invalid credentials'}), 401
+
+    if user.role != 'seller':
+        return jsonify({'error': 'user is not a seller'}), 403
+
+    token = generate_jwt({'user_id': user.id, 'username': username, 'role': user.role})
+    return jsonify({'token': token, 'user': {'id': user.id, 'username': username, 'name': user.name}})
+
+
+@bp.route('/api/mobile/logout', methods=['POST'])
+@mobile_auth_required
+def mobile_logout():
+    if g.get('token'):
+        revoke_jwt(g.token, g.token_claims)
+    return jsonify({'ok': True})
+
+
+@bp.route('/api/mobile/sorteos')
+@mobile_auth_required
+@data_access.versioned(data_access.sorteos_etag)
+def mobile_get_sorteos():
+    # reuse server-side sorteo listing but return JSON
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    rows = queries.fetch_all(cur, 'raffle.options')
+    sorteos = [{'id': row.id, 'date': row.raffle_date.strftime('%Y-%m-%d %H:%M')} for row in rows]
+    cur.close()
+    conn.close()
+    return jsonify(sorteos)
+
+
+
+@bp.route('/api/mobile/winner-payments')
+@mobile_auth_required
+@data_access.versioned(lambda: data_access.winner_payments_etag(g.user_id))
+def mobile_winner_payments():
+    # Very similar to existing /api/winner-payments but only accessible for sellers
+    sorteo_id = request.args.get('sorteo_id')
+    if not sorteo_id:
+        return jsonify({'error': 'sorteo_id is required'}), 400
+
+    # Only return winners for this raffle and the current seller
+    return jsonify(data_access.winner_payments(sorteo_id, g.user_id))
+
+@bp.route('/api/mobile/sales', methods=['POST'])
+@mobile_auth_required
+def mobile_create_sale():
+    try:
+        sale = sales.sale_from_json(request.get_json(silent=True) or {}, g.user_id, datetime.datetime.now())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    client = queries.fetch_one(cur, 'client.by_id_for_seller', (sale.client_id, g.user_id))
+    cur.close()
+    conn.close()
+    if client is None:
+        return jsonify({'error': 'client not found'}), 404
+
+    invoice_id = sales.save(sale)
+    if invoice_id is None:
+        return jsonify({'error': 'raffle is not open for sales'}), 409
+    return jsonify({'invoice_id': invoice_id}), 201
+
+
+# Sales per /api/mobile/sales/batch request (the offline queue uploads in chunks).
+SALES_BATCH_MAX = 200
+
+
+@bp.route('/api/mobile/sales/batch', methods=['POST'])
+@mobile_auth_required
+def mobile_create_sales():
+    """Uploads queued offline sales; one result per sale, in order.
+
+    Each result has the status the sale would get from /api/mobile/sales
+    (201, 400, 404 or 409) and its client_ref. The valid sales are saved in one
+    transaction; a sale already saved under its client_ref returns that invoice.
+    """
+    body = request.get_json(silent=True)
+    entries = body.get('sales') if isinstance(body, dict) else None
+    if not isinstance(entries, list) or not 0 < len(entries) <= SALES_BATCH_MAX:
+        return jsonify({'error': f'sales must be a list of 1 to {SALES_BATCH_MAX} sales'}), 400
+
+    now = datetime.datetime.now()
+    results = [None] * len(entries)
+    parsed = []
+    for n, entry in enumerate(entries):
+        try:
+            parsed.append((n, sales.sale_from_json(entry if isinstance(entry, dict) else {}, g.user_id, now)))
+        except ValueError as e:
+            results[n] = {'status': 400, 'error': str(e)}
+
+    client_ids = sorted({sale.client_id for _, sale in parsed})
+    own_clients = set()
+    if client_ids:
+        conn = get_db_connection()
+        cur = get_cursor(conn)
+        queries.execute_sql(cur, f"SELECT id FROM clients WHERE seller_id = %s "
+                                 f"AND id IN ({', '.join(['%s'] * len(client_ids))})", [g.user_id] + client_ids)
+        own_clients = {row.id for row in cur.fetchall()}
+        cur.close()
+        conn.close()
+
+    jobs = []
+    for n, sale in parsed:
+        if sale.client_id in own_clients:
+            jobs.append((n, sale))
+        else:
+            results[n] = {'status': 404, 'error': 'client not found'}
+    if jobs:
+        invoice_ids = sales.save(lambda cur: sales.insert_sales(cur, [sale for _, sale in jobs]))
+        for (n, _), invoice_id in zip(jobs, invoice_ids):
+            results[n] = ({'status': 201, 'invoice_id': invoice_id} if invoice_id is not None
+                          else {'status': 409, 'error': 'raffle is not open for sales'})
+
+    for entry, result in zip(entries, results):
+        result['client_ref'] = entry.get('client_ref') if isinstance(entry, dict) else None
+    return jsonify({'results': results})
+
+
+@bp.route('/api/mobile/sync')
+@mobile_auth_required
+def mobile_sync():
+    """Clients, raffles and invoices of the seller changed after ?since=<version> (see sync.py)."""
+    since = request.args.get('since', 0, type=int)
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    changes = sync.changes(cur, g.user_id, since)
+    cur.close()
+    conn.close()
+    response = jsonify(changes)
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
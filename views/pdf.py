@@ -0,0 +1,116 @@
+"""Invoice PDFs, rendered with ReportLab."""
+import importlib
+from io import BytesIO
+
+from flask import Blueprint, flash, redirect, url_for
+
+import data_access
+import instrumentation
+from security import current_seller_id, login_required
+
+bp = Blueprint('pdf', __name__)
+
+TEMPLATES = ()
+
+
+def prewarm():
+    # Only processes that serve PDFs pay for ReportLab, and they pay before the first request.
+    importlib.import_module('reportlab.pdfgen.canvas')
+    data_access.prewarm_snapshots()
+
+
+@bp.route('/sales/<int:invoice_id>/pdf')
+@login_required
+def invoice_pdf(invoice_id):
+    # Generate a simple PDF invoice on the server and return it as a response
+    invoice, items = data_access.invoice_with_items(invoice_id, current_seller_id())
+    if invoice is None:
+        flash('Factura no encontrada o sin permiso para verla.', 'danger')
+        return redirect(url_for('sales.list_sales'))
+
+    with instrumentation.timed('pdf'):
+        # ReportLab takes longer to import than the rest of the app, so it is
+        # loaded on the first PDF instead of at startup.
+        from reportlab.lib.units import inch
+        from reportlab.pdfgen import canvas
+
+        # Prepare PDF in memory
+        # Half-letter size in points: 5.5in x 8.5in
+        half_letter = (5.5 * inch, 8.5 * inch)
+        buffer = BytesIO()
+        p = canvas.Canvas(buffer, pagesize=half_letter)
+        width, height = half_letter
+
+        # Margins and column math so everything fits on the half-letter width
+        left_margin = 40
+        right_margin = width - 40
+        usable_width = right_margin - left_margin
+
+        y = height - 50
+        p.setFont('Helvetica-Bold', 14)
+        p.drawString(left_margin, y, f'Factura #{invoice.id}')
+        y -= 24
+        p.setFont('Helvetica', 9)
+        p.drawString(left_margin, y, f'Fecha Sorteo: {str(invoice.raffle_date)}')
+        y -= 16
+        p.drawString(left_margin, y, f'Vendedor: {invoice.seller_name}')
+        y -= 16
+        client_name = f"{invoice.client_name} {invoice.client_last_name or ''}"
+        p.drawString(left_margin, y, f'Cliente: {client_name}')
+        y -= 22
+
+        # Column positions (tightened): Numero | Cantidad | Subtotal
+        col_num_x = left_margin
+        col_qty_right = left_margin + int(usable_width * 0.55)
+        col_sub_right = right_margin
+
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(col_num_x, y, 'Numero')
+        p.drawRightString(col_qty_right, y, 'Cantidad')
+        p.drawRightString(col_sub_right, y, 'Subtotal')
+        y -= 12
+        p.line(left_margin, y, right_margin, y)
+        y -= 12
+        p.setFont('Helvetica', 9)
+
+        for item in items:
+            if y < 60:
+                p.showPage()
+                y = height - 50
+                p.setFont('Helvetica-Bold', 10)
+                p.drawString(col_num_x, y, 'Numero')
+                p.drawRightString(col_qty_right, y, 'Cantidad')
+                p.drawRightString(col_sub_right, y, 'Subtotal')
+                y -= 12
+                p.line(left_margin, y, right_margin, y)
+                y -= 12
+                p.setFont('Helvetica', 9)
+
+            p.drawString(col_num_x, y, str(item.number))
+            p.drawRightString(col_qty_right, y, str(item.quantity))
+            p.drawRightString(col_sub_right, y, f"${float(item.sub_total or 0):.2f}")
+            y -= 14
+
+        y -= 6
+        p.setFont('Helvetica-Bold', 11)
+        p.drawRightString(col_sub_right, y, f"Total: ${float(invoice.total_amount):.2f}")
+
+        p.showPage()
+        p.save()
+
+        buffer.seek(0)
+
+    # Build filename: raffledate_invoiceid.pdf
+    raffle_date_str = invoice.raffle_date.strftime('%Y-%m-%d')
+    filename = f"factura_{raffle_date_str}_{invoice_id}.pdf"
+
+    return (buffer.getvalue(), 200, {
+        'Content-Type': 'application/pdf',
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
+@bp.route('/sales/<int:invoice_id>/printpdf')
+@login_required
+def printpdf(invoice_id):
+    # Return the PDF and let client handle printing / sharing
+    return invoice_pdf(invoice_id)
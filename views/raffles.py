@@ -0,0 +1,153 @@
+"""Raffles, their results and winners."""
+import datetime
+
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, session, url_for
+
+import data_access
+import queries
+import raffle_snapshots
+import sync
+from database import create_raffle_partitions, get_cursor, get_db_connection, write
+from security import admin_required, login_required, seller_required
+
+bp = Blueprint('raffles', __name__)
+
+TEMPLATES = ('raffles.html', 'raffle_form.html', 'raffle_results_form.html', 'winners.html', 'pagos_ganadores.html')
+
+
+def prewarm():
+    data_access.resource_versions.reload()
+    data_access.prewarm_prize_tables()
+    data_access.prewarm_snapshots()
+
+
+# --- Admin: Raffle Management ---
+@bp.route('/admin/raffles')
+@admin_required
+def list_raffles():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    raffles = queries.fetch_all(cur, 'raffle.list')
+    cur.close()
+    conn.close()
+    return render_template('raffles.html', raffles=raffles)
+
+@bp.route('/admin/raffles/new', methods=['GET', 'POST'])
+@admin_required
+def create_raffle():
+    if request.method == 'POST':
+        raffle_date_str = request.form['raffle_date']
+        
+        if not raffle_date_str:
+            flash('La fecha y hora del sorteo son requeridas.', 'danger')
+            return render_template('raffle_form.html')
+
+        raffle_date = datetime.datetime.fromisoformat(raffle_date_str)
+
+        def save(cur):
+            raffle_id = queries.fetch_one(cur, 'raffle.insert', (raffle_date, sync.next_seq(cur))).id
+            create_raffle_partitions(cur, raffle_id)
+            data_access.resource_versions.bump(cur, 'raffles')
+
+        write(save)
+        data_access.data_cache.invalidate('raffles:pending')
+        flash('Sorteo creado exitosamente.', 'success')
+        return redirect(url_for('raffles.list_raffles'))
+
+    return render_template('raffle_form.html')
+
+@bp.route('/admin/raffles/<int:raffle_id>/results', methods=['GET', 'POST'])
+@admin_required
+def enter_raffle_results(raffle_id):
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    raffle = queries.fetch_one(cur, 'raffle.by_id', (raffle_id,))
+    cur.close()
+    conn.close()
+
+    if raffle is None:
+        flash('Sorteo no encontrado.', 'danger')
+        return redirect(url_for('raffles.list_raffles'))
+
+    # ?corregir=1 re-enters the results of a raffle after a typo; only the
+    # winners whose payouts change are rewritten.
+    correcting = bool(raffle.results_entered) and request.args.get('corregir') == '1'
+    if raffle.results_entered and not correcting:
+        flash('Los resultados para este sorteo ya fueron ingresados.', 'info')
+        return redirect(url_for('raffles.list_winners', raffle_id=raffle_id))
+
+    if request.method == 'POST':
+        p1 = request.form['first_prize']
+        p2 = request.form['second_prize']
+        p3 = request.form['third_prize']
+
+        if not (p1.isdigit() and len(p1) == 4 and p2.isdigit() and len(p2) in [2, 4] and p3.isdigit() and len(p3) in [2, 4]):
+            flash('El 1er premio debe ser de 4 cifras. El 2do y 3ro deben ser de 2 o 4 cifras.', 'danger')
+            return render_template('raffle_results_form.html', raffle=raffle, correcting=correcting)
+        
+        data_access.calculate_winners_for_raffle(raffle_id, p1, p2, p3)
+        data_access.data_cache.invalidate('raffles:pending')
+        if correcting:
+            flash('Resultados corregidos y ganadores actualizados.', 'success')
+        else:
+            flash('Ganadores calculados y registrados exitosamente!', 'success')
+        return redirect(url_for('raffles.list_winners', raffle_id=raffle_id))
+
+    return render_template('raffle_results_form.html', raffle=raffle, correcting=correcting)
+
+@bp.route('/winners')
+@login_required
+def list_winners():
+    raffle_id = request.args.get('raffle_id', type=int)
+    conn = get_db_connection(raffle_id)
+    cur = get_cursor(conn)
+    
+    raffles_with_results = queries.fetch_all(cur, 'raffle.with_results')
+
+    winners = []
+    selected_raffle = None
+    if raffle_id:
+        selected_raffle = queries.fetch_one(cur, 'raffle.by_id', (raffle_id,))
+        snapshot = raffle_snapshots.store.get(raffle_id)
+        if snapshot is not None:
+            winners = snapshot.winners(session['user_id'] if session['user_role'] == 'seller' else None,
+                                       data_access.snapshot_names(raffle_id))
+        elif session['user_role'] == 'seller':
+            winners = queries.fetch_all(cur, 'winner.list_for_seller', (raffle_id, session['user_id']))
+        else: # Admin
+            winners = queries.fetch_all(cur, 'winner.list', (raffle_id,))
+
+    cur.close()
+    conn.close()
+    
+    return render_template('winners.html', winners=winners, raffles=raffles_with_results, selected_raffle=selected_raffle)
+
+@bp.route('/seller/winner-payments')
+@seller_required
+def winner_payments():
+    return render_template('pagos_ganadores.html')
+
+@bp.route('/api/sorteos')
+@seller_required
+@data_access.versioned(data_access.sorteos_etag)
+def get_sorteos():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    rows = queries.fetch_all(cur, 'raffle.options')
+    # Normalize to YYYY-MM-DD string
+    sorteos = [{'id': row.id, 'date': row.raffle_date.strftime('%Y-%m-%d') if row.raffle_date else ''} for row in rows]
+    cur.close()
+    conn.close()
+    return jsonify(sorteos)
+
+@bp.route('/api/winner-payments')
+@seller_required
+@data_access.versioned(lambda: data_access.winner_payments_etag(session.get('user_id')))
+def api_winner_payments():
+    sorteo_id = request.args.get('sorteo_id')
+    if not sorteo_id:
+        return jsonify({'error': 'sorteo_id is required'}), 400
+
+    # If the current user is a seller, restrict results to their own sales
+    seller_id = session.get('user_id') if session.get('user_role') == 'seller' else None
+    return jsonify(data_access.winner_payments(sorteo_id, seller_id))
@@ -0,0 +1,159 @@
+"""Commission reports for the admin and for each seller, and the raffle totals."""
+import datetime
+
+from flask import Blueprint, jsonify, render_template, request, session
+
+import data_access
+import queries
+import raffle_stats
+from database import get_cursor, get_db_connection
+from security import admin_required, seller_required
+
+bp = Blueprint('reports', __name__)
+
+TEMPLATES = ('commissions.html', 'my_commissions.html')
+
+
+def prewarm():
+    data_access.snapshot_archived_raffles()
+    data_access.prewarm_snapshots()
+
+
+@bp.route('/admin/commissions')
+@admin_required
+def commissions_report():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    
+    sellers = queries.fetch_all(cur, 'seller.options')
+    raffles = queries.fetch_all(cur, 'raffle.options')
+
+    selected_seller_id = request.args.get('seller_id', default='all')
+    selected_raffle_id = request.args.get('raffle_id', default='all')
+
+    query = '''
+        SELECT 
+            u.id as seller_id, u.name as seller_name, u.commission_percentage, 
+            r.id as raffle_id, r.raffle_date, 
+            COALESCE(SUM(i.total_amount), 0) as total_sales,
+            (SELECT COALESCE(SUM(w.total_payout), 0) FROM winners w WHERE w.seller_id = u.id AND w.raffle_id = r.id) as total_winnings
+        FROM users u
+        LEFT JOIN invoices i ON u.id = i.seller_id
+        LEFT JOIN raffles r ON i.raffle_id = r.id
+        WHERE u.role = \'seller\'
+    '''
+    params = []
+
+    if selected_seller_id != 'all':
+        query += ' AND u.id = %s'
+        params.append(int(selected_seller_id))
+    
+    if selected_raffle_id != 'all':
+        query += ' AND r.id = %s'
+        params.append(int(selected_raffle_id))
+
+    # Closed raffles with a snapshot, and archived ones, are summed outside SQL.
+    closed_ids = set()
+    closed_rows = []
+    closed = [totals for totals in data_access.closed_raffle_totals()
+              if selected_raffle_id == 'all' or totals[0] == int(selected_raffle_id)]
+    if closed:
+        rates = queries.fetch_all(cur, 'seller.commission_rates')
+        for raffle_id, raffle_date, seller_totals in closed:
+            closed_ids.add(raffle_id)
+            for seller in rates:
+                if selected_seller_id != 'all' and seller.id != int(selected_seller_id):
+                    continue
+                totals = seller_totals.get(seller.id)
+                if totals is not None:
+                    closed_rows.append({'seller_id': seller.id, 'seller_name': seller.name,
+                                          'commission_percentage': seller.commission_percentage,
+                                          'raffle_id': raffle_id, 'raffle_date': raffle_date,
+                                          'total_sales': totals[0], 'total_winnings': totals[1]})
+    if closed_ids:
+        query += f" AND (r.id IS NULL OR r.id NOT IN ({', '.join(['%s'] * len(closed_ids))}))"
+        params.extend(sorted(closed_ids))
+
+    query += ' GROUP BY u.id, r.id ORDER BY r.raffle_date DESC, u.name'
+
+    report_data = [row._asdict() for row in queries.execute_sql(cur, query, tuple(params)).fetchall()]
+    cur.close()
+    conn.close()
+    if closed_rows:
+        report_data.extend(closed_rows)
+        report_data.sort(key=lambda row: row['seller_name'] or '')
+        report_data.sort(key=lambda row: row['raffle_date'] or datetime.datetime.min, reverse=True)
+
+    processed_data = []
+    for row_dict in report_data:
+        commission_amount = row_dict['total_sales'] * (row_dict['commission_percentage'] / 100.0)
+        balance = row_dict['total_sales'] - commission_amount - row_dict['total_winnings']
+        row_dict['commission_amount'] = commission_amount
+        row_dict['balance'] = balance
+        processed_data.append(row_dict)
+
+    return render_template('commissions.html', 
+                           report_data=processed_data,
+                           sellers=sellers,
+                           raffles=raffles,
+                           selected_seller_id=selected_seller_id,
+                           selected_raffle_id=selected_raffle_id)
+
+# --- Seller: Commissions ---
+@bp.route('/my_commissions')
+@seller_required
+def my_commissions():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    seller_id = session['user_id']
+
+    user = queries.fetch_one(cur, 'user.commission_by_id', (seller_id,))
+    commission_percentage = user.commission_percentage if user else 0
+
+    # Closed raffles with a snapshot, and archived ones, are read outside SQL.
+    closed = data_access.closed_raffle_totals()
+    if closed:
+        marks = ', '.join(['%s'] * len(closed))
+        sql = queries.SELLER_COMMISSIONS_SQL.format(filter=f' AND r.id NOT IN ({marks})')
+        rows = queries.execute_sql(cur, sql, (seller_id, seller_id, *(totals[0] for totals in closed))).fetchall()
+    else:
+        rows = queries.fetch_all(cur, 'report.seller_commissions', (seller_id, seller_id))
+    cur.close()
+    conn.close()
+
+    report_data = [row._asdict() for row in rows]
+    for raffle_id, raffle_date, seller_totals in closed:
+        total_sales, total_winnings = seller_totals.get(seller_id, (0, 0))
+        report_data.append({'raffle_id': raffle_id, 'raffle_date': raffle_date,
+                            'total_sales': total_sales, 'total_winnings': total_winnings})
+    if closed:
+        report_data.sort(key=lambda row: row['raffle_date'], reverse=True)
+
+    processed_data = []
+    for row_dict in report_data:
+        commission_amount = row_dict['total_sales'] * (commission_percentage / 100.0)
+        balance = row_dict['total_sales'] - commission_amount - row_dict['total_winnings']
+        
+        row_dict['commission_amount'] = commission_amount
+        row_dict['balance'] = balance
+        processed_data.append(row_dict)
+
+    return render_template('my_commissions.html', report_data=processed_data)
+
+
+# --- Admin: Raffle totals (same figures as the dashboard) ---
+@bp.route('/api/raffle-stats')
+@admin_required
+def api_raffle_stats():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    stats = raffle_stats.summaries(cur)
+    cur.close()
+    conn.close()
+    money = ('sales_total', 'commissions', 'payouts_total', 'net')
+    for stat in stats:
+        stat['raffle_date'] = stat['raffle_date'].strftime('%Y-%m-%d %H:%M')
+        for key in money:
+            if stat[key] is not None:
+                stat[key] = round(stat[key], 2)
+    return jsonify(stats)
@@ -0,0 +1,420 @@
+"""Clients and sales: the seller's everyday pages (and the admin's sales list)."""
+import datetime
+
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, session, url_for
+
+import data_access
+import queries
+import raffle_stats
+import sales
+import sync
+from database import archived_raffle_ids, get_cursor, get_db_connection, is_archived, write
+from security import current_seller_id, login_required, seller_required
+
+bp = Blueprint('sales', __name__)
+
+TEMPLATES = ('clients.html', 'client_form.html', 'new_sale_form.html', 'sales.html', 'sale_detail.html',
+             'print_invoice.html', 'edit_sale_form.html')
+
+
+def prewarm():
+    data_access.open_raffles()
+    data_access.prewarm_client_indexes()
+    data_access.prewarm_snapshots()
+
+
+# --- Client Management (Admin & Seller) ---
+CLIENT_PAGE_SIZE = 50
+CLIENT_SEARCH_MAX = 50
+
+
+@bp.route('/clients')
+@login_required
+def list_clients():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    # Only the first page is rendered; the search box on the page loads the rest on demand.
+    if session['user_role'] == 'admin':
+        clients = queries.fetch_all(cur, 'client.list_all_page', (CLIENT_PAGE_SIZE,))
+    else: # Seller
+        seller_id = session['user_id']
+        clients = queries.fetch_all(cur, 'client.list_for_seller_page', (seller_id, CLIENT_PAGE_SIZE))
+    cur.close()
+    conn.close()
+    return render_template('clients.html', clients=clients, page_size=CLIENT_PAGE_SIZE)
+
+@bp.route('/api/clients/search')
+@login_required
+def api_client_search():
+    q = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int) or 10, CLIENT_SEARCH_MAX)
+    seller_id = None if session['user_role'] == 'admin' else session['user_id']
+    matches = data_access.client_index(seller_id).search(q, limit)
+    return jsonify([
+        {'id': c['id'], 'name': c['name'], 'last_name': c['last_name'], 'phone': c['phone'],
+         'address': c['address'], 'seller_name': c['seller_name']}
+        for c in matches
+    ])
+
+@bp.route('/clients/new', methods=['GET', 'POST'])
+@login_required
+def create_client():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    sellers = queries.fetch_all(cur, 'seller.options')
+    
+    if request.method == 'POST':
+        name = request.form['name']
+        last_name = request.form.get('last_name', '')
+        phone = request.form.get('phone', '')
+        address = request.form.get('address', '')
+        
+        if session['user_role'] == 'admin':
+            seller_id = request.form['seller_id']
+        else: # Seller
+            seller_id = session['user_id']
+
+        cur.close()
+        conn.close()
+
+        def save(cur):
+            client_id = queries.fetch_one(cur, 'client.insert',
+                                          (name, last_name, phone, address, seller_id, sync.next_seq(cur))).id
+            data_access.resource_versions.bump(cur, 'clients')
+            data_access.client_saved(cur, client_id)
+
+        write(save)
+        flash('Cliente creado exitosamente.', 'success')
+        return redirect(url_for('sales.list_clients'))
+
+    cur.close()
+    conn.close()
+    return render_template('client_form.html', form_action='create', sellers=sellers)
+
+@bp.route('/clients/edit/<int:client_id>', methods=['GET', 'POST'])
+@login_required
+def edit_client(client_id):
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    
+    if session['user_role'] == 'seller':
+        client = queries.fetch_one(cur, 'client.by_id_for_seller', (client_id, session['user_id']))
+    else: # Admin can edit any client
+        client = queries.fetch_one(cur, 'client.by_id', (client_id,))
+
+    if client is None:
+        flash('Cliente no encontrado o no tiene permiso para editarlo.', 'danger')
+        cur.close()
+        conn.close()
+        return redirect(url_for('sales.list_clients'))
+
+    sellers = queries.fetch_all(cur, 'seller.options')
+
+    if request.method == 'POST':
+        name = request.form['name']
+        last_name = request.form.get('last_name', '')
+        phone = request.form.get('phone', '')
+        address = request.form.get('address', '')
+        seller_id = request.form['seller_id'] if session['user_role'] == 'admin' else session['user_id']
+
+        cur.close()
+        conn.close()
+
+        def save(cur):
+            seq = sync.next_seq(cur)
+            queries.execute(cur, 'client.update', (name, last_name, phone, address, seller_id, seq, client_id))
+            if int(seller_id) != client.seller_id:
+                sync.record_deletion(cur, seq, 'clients', client_id, client.seller_id)
+            data_access.resource_versions.bump(cur, 'clients')
+            # The client may have moved to another seller: drop it from the old index.
+            data_access.client_saved(cur, client_id, old_seller_id=client.seller_id)
+
+        write(save)
+        flash('Cliente actualizado exitosamente.', 'success')
+        return redirect(url_for('sales.list_clients'))
+
+    cur.close()
+    conn.close()
+    return render_template('client_form.html', form_action='edit', client=client, sellers=sellers)
+
+# --- Sales Management ---
+@bp.route('/sales/new', methods=['GET', 'POST'])
+@seller_required
+def new_sale():
+    # Raffles come from the cache and clients are looked up by the form through
+    # /api/clients/search; the database is only touched to save a sale.
+    now = datetime.datetime.now()
+    raffles = data_access.open_raffles(now)
+
+    if request.method == 'POST':
+        raffle_id = request.form['raffle_id']
+        client_id = request.form['client_id']
+        seller_id = session['user_id']
+        numbers = request.form.getlist('number')
+        quantities = request.form.getlist('quantity')
+        items = []
+
+        for i in range(len(numbers)):
+            number = numbers[i]
+            quantity_str = quantities[i]
+            if number and quantity_str:
+                try:
+                    quantity = int(quantity_str)
+                    if not (number.isdigit() and len(number) in [2, 4] and quantity > 0):
+                        flash(f'Error en el ítem {i+1}: Verifique el número ({number}) y la cantidad ({quantity_str}). La cantidad debe ser un número entero positivo.', 'danger')
+                        return render_template('new_sale_form.html', raffles=raffles)
+                    
+                    item_type = 'billete' if len(number) == 4 else 'chance'
+                    price_per_unit = 1.0 if item_type == 'billete' else 0.25
+                    sub_total = quantity * price_per_unit
+                    items.append({'number': number, 'quantity': quantity, 'item_type': item_type, 'price_per_unit': price_per_unit, 'sub_total': sub_total})
+                except ValueError: # Catch error if quantity_str is not an integer
+                    flash(f'Error en el ítem {i+1}: La cantidad ({quantity_str}) debe ser un número entero.', 'danger')
+                    return render_template('new_sale_form.html', raffles=raffles)
+                except IndexError: # Keep existing IndexError catch
+                    flash(f'Error procesando el ítem {i+1}. Verifique los datos.', 'danger')
+                    return render_template('new_sale_form.html', raffles=raffles)
+
+        if not items:
+            flash('Debe agregar al menos un ítem a la venta.', 'danger')
+            return render_template('new_sale_form.html', raffles=raffles)
+
+        # Sales arriving together share one transaction and multi-row inserts (see sales.py).
+        if write(sales.SaleJob(raffle_id, client_id, seller_id, items, now)) is None:
+            flash('El sorteo seleccionado no es válido o ya no está disponible.', 'danger')
+            return redirect(url_for('sales.new_sale'))
+        flash('Venta registrada exitosamente.', 'success')
+        return redirect(url_for('sales.list_sales'))
+
+    return render_template('new_sale_form.html', raffles=raffles)
+
+@bp.route('/sales')
+@login_required
+def list_sales():
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+
+    # Fetch the most recent raffle ID
+    most_recent_raffle = queries.fetch_one(cur, 'raffle.latest_id')
+    most_recent_raffle_id = most_recent_raffle.id if most_recent_raffle else 'all'
+
+    selected_raffle_id = request.args.get('raffle_id', most_recent_raffle_id)
+    selected_client_id = request.args.get('client_id', 'all')
+    selected_seller_id = request.args.get('seller_id', 'all')
+
+    query = '''
+        SELECT i.id, r.raffle_date, r.results_entered, c.name as client_name, c.last_name as client_last_name, u.name as seller_name, i.total_amount,
+               i.creation_date
+        FROM invoices i
+        JOIN raffles r ON i.raffle_id = r.id
+        JOIN clients c ON i.client_id = c.id
+        JOIN users u ON i.seller_id = u.id
+    '''
+    params = []
+    where_clauses = []
+
+    if session['user_role'] == 'seller':
+        where_clauses.append('i.seller_id = %s')
+        params.append(session['user_id'])
+    elif selected_seller_id != 'all':
+        where_clauses.append('i.seller_id = %s')
+        params.append(int(selected_seller_id))
+
+    if selected_raffle_id != 'all':
+        where_clauses.append('i.raffle_id = %s')
+        params.append(int(selected_raffle_id))
+
+    if selected_client_id != 'all':
+        where_clauses.append('i.client_id = %s')
+        params.append(int(selected_client_id))
+
+    if where_clauses:
+        query += ' WHERE ' + ' AND '.join(where_clauses)
+    
+    query += ' ORDER BY i.creation_date DESC'
+
+    # Archived raffles are read from their archive files (see database.py).
+    if selected_raffle_id == 'all':
+        sales = queries.execute_sql(cur, query, tuple(params)).fetchall()
+        archive_ids = archived_raffle_ids()
+    elif is_archived(selected_raffle_id):
+        sales = []
+        archive_ids = [int(selected_raffle_id)]
+    else:
+        sales = queries.execute_sql(cur, query, tuple(params)).fetchall()
+        archive_ids = []
+    if archive_ids:
+        sales.extend(data_access.rows_from_archives(archive_ids, query, tuple(params)))
+        sales.sort(key=lambda row: row.creation_date, reverse=True)
+
+    raffles = queries.fetch_all(cur, 'raffle.options')
+    
+    clients = []
+    sellers = []
+    if session['user_role'] == 'admin':
+        clients = queries.fetch_all(cur, 'client.options_all')
+        sellers = queries.fetch_all(cur, 'seller.options')
+    else: # Seller
+        clients = queries.fetch_all(cur, 'client.options_for_seller', (session['user_id'],))
+
+    cur.close()
+    conn.close()
+    
+    return render_template('sales.html', 
+                           sales=sales, 
+                           now=datetime.datetime.now(),
+                           raffles=raffles,
+                           clients=clients,
+                           sellers=sellers,
+                           selected_raffle_id=selected_raffle_id,
+                           selected_client_id=selected_client_id,
+                           selected_seller_id=selected_seller_id
+                          )
+
+
+@bp.route('/sales/<int:invoice_id>')
+@login_required
+def sale_detail(invoice_id):
+    invoice, items = data_access.invoice_with_items(invoice_id, current_seller_id())
+    if invoice is None:
+        flash('Factura no encontrada o sin permiso para verla.', 'danger')
+        return redirect(url_for('sales.list_sales'))
+
+    return render_template('sale_detail.html', invoice=invoice, items=items)
+
+
+@bp.route('/sales/<int:invoice_id>/print')
+@login_required
+def print_invoice(invoice_id):
+    invoice, items = data_access.invoice_with_items(invoice_id, current_seller_id())
+    if invoice is None:
+        flash('Factura no encontrada o sin permiso para verla.', 'danger')
+        return redirect(url_for('sales.list_sales'))
+
+    return render_template('print_invoice.html', invoice=invoice, items=items)
+
+
+@bp.route('/factura/<int:invoice_id>')
+@login_required
+def factura_redirect(invoice_id):
+    # Backwards-compatible route: redirect old /factura/<id> links to /sales/<id>
+    return redirect(url_for('sales.sale_detail', invoice_id=invoice_id))
+
+
+@bp.route('/sales/delete/<int:invoice_id>', methods=['POST'])
+@seller_required
+def delete_sale(invoice_id):
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    
+    invoice = queries.fetch_one(cur, 'invoice.for_delete', (invoice_id,))
+
+    if invoice is None:
+        flash('Factura no encontrada.', 'danger')
+        cur.close()
+        conn.close()
+        return redirect(url_for('sales.list_sales'))
+
+    if invoice.seller_id != session['user_id']:
+        flash('No tiene permiso para borrar esta factura.', 'danger')
+        cur.close()
+        conn.close()
+        return redirect(url_for('sales.list_sales'))
+
+    raffle_datetime = invoice.raffle_date
+    if raffle_datetime < datetime.datetime.now() or invoice.results_entered:
+        flash('No se puede borrar una factura de un sorteo que ya ha pasado o cuyos ganadores ya han sido calculados.', 'danger')
+        cur.close()
+        conn.close()
+        return redirect(url_for('sales.list_sales'))
+    cur.close()
+    conn.close()
+
+    def delete(cur):
+        raffle_stats.remove_invoice(cur, invoice_id)
+        queries.execute(cur, 'invoice_item.delete_by_invoice', (invoice_id,))
+        queries.execute(cur, 'invoice.delete', (invoice_id,))
+        sync.record_deletion(cur, sync.next_seq(cur), 'invoices', invoice_id, invoice.seller_id)
+
+    write(delete)
+
+    flash('Factura borrada exitosamente.', 'success')
+    return redirect(url_for('sales.list_sales'))
+
+
+@bp.route('/sales/edit/<int:invoice_id>', methods=['GET', 'POST'])
+@seller_required
+def edit_sale(invoice_id):
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    
+    invoice = queries.fetch_one(cur, 'invoice.for_edit', (invoice_id, session['user_id']))
+
+    if invoice is None:
+        flash('Factura no encontrada o sin permiso para editar.', 'danger')
+        cur.close()
+        conn.close()
+        return redirect(url_for('sales.list_sales'))
+
+    raffle_datetime = invoice.raffle_date
+    if raffle_datetime < datetime.datetime.now() or invoice.results_entered:
+        flash('No se puede editar una factura de un sorteo que ya ha pasado o cuyos ganadores han sido calculados.', 'danger')
+        cur.close()
+        conn.close()
+        return redirect(url_for('sales.list_sales'))
+
+    if request.method == 'POST':
+        raffle_id = request.form['raffle_id']
+        client_id = request.form['client_id']
+        numbers = request.form.getlist('number')
+        quantities = request.form.getlist('quantity')
+        items = []
+        total_amount = 0
+        error = None
+        for i in range(len(numbers)):
+            number = numbers[i]
+            quantity_str = quantities[i]
+            if number and quantity_str:
+                # Same checks as new_sale; on PostgreSQL a non-numeric number
+                # would also fail the generated number_value column.
+                try:
+                    quantity = int(quantity_str)
+                except ValueError:
+                    error = f'Error en el ítem {i+1}: La cantidad ({quantity_str}) debe ser un número entero.'
+                    break
+                if not (number.isdigit() and len(number) in [2, 4] and quantity > 0):
+                    error = f'Error en el ítem {i+1}: Verifique el número ({number}) y la cantidad ({quantity_str}). La cantidad debe ser un número entero positivo.'
+                    break
+                item_type = 'billete' if len(number) == 4 else 'chance'
+                price_per_unit = 1.0 if item_type == 'billete' else 0.25
+                sub_total = quantity * price_per_unit
+                items.append({'number': number, 'quantity': quantity, 'item_type': item_type, 'price_per_unit': price_per_unit, 'sub_total': sub_total})
+                total_amount += sub_total
+
+        if error:
+            flash(error, 'danger')
+        elif not items:
+            flash('La factura debe tener al menos un ítem.', 'danger')
+        else:
+            cur.close()
+            conn.close()
+
+            def save(cur):
+                raffle_stats.remove_invoice(cur, invoice_id)
+                queries.execute(cur, 'invoice_item.delete_by_invoice', (invoice_id,))
+                queries.execute(cur, 'invoice.update', (raffle_id, client_id, total_amount, sync.next_seq(cur), invoice_id))
+                for item in items:
+                    queries.execute(cur, 'invoice_item.insert',
+                                    (invoice_id, raffle_id, invoice.seller_id, client_id, item['number'], item['item_type'], item['quantity'], item['price_per_unit'], item['sub_total']))
+                raffle_stats.add(cur, [raffle_stats.sale_delta(raffle_id, invoice.seller_id, total_amount, items)])
+
+            write(save)
+            flash('Factura actualizada exitosamente.', 'success')
+            return redirect(url_for('sales.list_sales'))
+
+    invoice_items = queries.fetch_all(cur, 'invoice_item.by_invoice', (invoice_id,))
+    cur.close()
+    conn.close()
+
+    raffles = data_access.open_raffles()
+    return render_template('edit_sale_form.html', invoice=invoice, items=invoice_items, raffles=raffles)